@@ -0,0 +1,172 @@
+import gzip
+import os
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+import orjson
+from fastapi import HTTPException, Request, Response
+from app.api.models import MessageBase
+from app.core.metrics import stage
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+# Messages as one array per field instead of one object per message
+COLUMNAR_MEDIA_TYPE = "application/vnd.chatlore.columnar+json"
+
+MESSAGE_FIELDS = tuple(MessageBase.model_fields)
+REQUIRED_FIELDS = {name for name, field in MessageBase.model_fields.items() if field.is_required()}
+FIELD_DEFAULTS = {name: field.default for name, field in MessageBase.model_fields.items() if not field.is_required()}
+# Low-cardinality fields sent as indexes into a per-payload dictionary
+DICTIONARY_FIELDS = ("sender", "message_type", "language")
+
+# Preferred first when the client accepts several
+CONTENT_ENCODINGS = ("zstd", "gzip") if zstandard else ("gzip",)
+MIN_COMPRESS_BYTES = 500
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+# Upper bound on a decompressed request body
+MAX_DECOMPRESSED_MB = int(os.getenv("MAX_DECOMPRESSED_MB", 512))
+
+
+def _seconds(delta: timedelta):
+    seconds = delta.days * 86400 + delta.seconds
+    return seconds + delta.microseconds / 1_000_000 if delta.microseconds else seconds
+
+
+def to_columnar(messages: Sequence[Any]) -> Dict:
+    """
+    Columnar form of messages (model instances): timestamps as seconds from
+    the first message, dictionary-coded senders, types and languages, and
+    optional columns left out when every message has the default value.
+    """
+    if not messages:
+        return {"count": 0, "epoch": None, "dictionaries": {}, "columns": {}}
+
+    epoch = messages[0].timestamp
+    columns: Dict[str, list] = {}
+    dictionaries: Dict[str, list] = {}
+    for field in MESSAGE_FIELDS:
+        column = [getattr(msg, field) for msg in messages]
+        if field == "timestamp":
+            column = [_seconds(timestamp - epoch) for timestamp in column]
+        elif field in DICTIONARY_FIELDS:
+            codes: Dict[str, int] = {}
+            column = [codes.setdefault(value, len(codes)) for value in column]
+            dictionaries[field] = list(codes)
+        elif field in FIELD_DEFAULTS:
+            default = FIELD_DEFAULTS[field]
+            if all(value == default for value in column):
+                continue
+            if isinstance(default, bool):
+                column = [int(value) for value in column]
+        columns[field] = column
+
+    return {
+        "count": len(messages),
+        "epoch": epoch.isoformat(),
+        "dictionaries": dictionaries,
+        "columns": columns
+    }
+
+
+def from_columnar(payload: Dict) -> List[Dict]:
+    """Message dicts from a columnar payload; raises ValueError when it is malformed"""
+    try:
+        count = payload["count"]
+        columns = payload["columns"]
+        dictionaries = payload.get("dictionaries", {})
+        if not count:
+            return []
+        epoch = datetime.fromisoformat(payload["epoch"])
+
+        values = []
+        for field in MESSAGE_FIELDS:
+            column = columns.get(field)
+            if column is None:
+                if field in REQUIRED_FIELDS:
+                    raise ValueError(f"missing column '{field}'")
+                values.append([FIELD_DEFAULTS[field]] * count)
+                continue
+            if len(column) != count:
+                raise ValueError(f"column '{field}' has {len(column)} values, expected {count}")
+            if field in dictionaries:
+                lookup = dictionaries[field]
+                column = [lookup[code] for code in column]
+            if field == "timestamp":
+                column = [epoch + timedelta(seconds=seconds) for seconds in column]
+            values.append(column)
+    except (KeyError, IndexError, TypeError, AttributeError) as e:
+        raise ValueError(f"malformed columnar messages: {e!r}")
+
+    return [dict(zip(MESSAGE_FIELDS, row)) for row in zip(*values)]
+
+
+def decode_body(body: bytes, content_encoding: Optional[str]) -> bytes:
+    """Decompress a request body according to its Content-Encoding"""
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "identity" or not body:
+        return body
+
+    limit = MAX_DECOMPRESSED_MB * 1024 * 1024
+    try:
+        if encoding == "gzip":
+            decompressor = zlib.decompressobj(wbits=31)
+            data = decompressor.decompress(body, limit)
+            truncated = bool(decompressor.unconsumed_tail)
+        elif encoding == "zstd" and zstandard:
+            chunks, size = [], 0
+            with zstandard.ZstdDecompressor().stream_reader(body) as reader:
+                while size <= limit:
+                    chunk = reader.read(1 << 20)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    size += len(chunk)
+            data = b"".join(chunks)
+            truncated = size > limit
+        else:
+            raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {encoding}")
+    except (zlib.error, getattr(zstandard, "ZstdError", zlib.error)) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid {encoding} body: {e}")
+
+    if truncated:
+        raise HTTPException(status_code=413, detail=f"Decompressed body exceeds {MAX_DECOMPRESSED_MB} MB")
+    return data
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The preferred content encoding the client accepts, or None"""
+    offered = set()
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.partition(";")
+        if params.replace(" ", "").rstrip("0.") == "q=":
+            # q=0 means "not acceptable"
+            continue
+        offered.add(token.strip().lower())
+    for encoding in CONTENT_ENCODINGS:
+        if encoding in offered:
+            return encoding
+    return None
+
+
+def accepts_columnar(request: Request) -> bool:
+    return COLUMNAR_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def encoded_response(request: Request, payload: Dict, media_type: str = "application/json") -> Response:
+    """Serialize payload, compressing it when the client accepts gzip or zstd"""
+    with stage("response_encode"):
+        body = orjson.dumps(payload)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    encoding = negotiate_encoding(request.headers.get("accept-encoding")) if len(body) >= MIN_COMPRESS_BYTES else None
+    if encoding:
+        with stage("response_compress"):
+            if encoding == "zstd":
+                body = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+            else:
+                body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -1,6 +1,17 @@
+from fastapi import HTTPException
 from app.core.whatsapp_parser import WhatsAppParser
 from typing import List
-from app.api.models import MessageBase
+from app.api.models import MessageBase, MessagesRequest
+from app.services.chat_sessions import load_session
+
+async def resolve_messages(request: MessagesRequest) -> List[MessageBase]:
+    """The request's messages, or the messages of its chat session when chat_id is set"""
+    if request.chat_id is None:
+        return request.messages
+    session = await load_session(request.chat_id)
+    if session is None:
+        raise HTTPException(status_code=410, detail="Chat session expired or not found; process the chat again")
+    return session.messages
 
 def create_parser_from_messages(messages: List[MessageBase]) -> WhatsAppParser:
     """Create a new WhatsApp parser instance from a list of messages (stateless approach)"""
@@ -0,0 +1,47 @@
+from typing import Any, Callable, Coroutine
+import orjson
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+from app.api.columnar import COLUMNAR_MEDIA_TYPE, decode_body, from_columnar
+from app.core.metrics import stage
+
+
+class FastJSONRequest(Request):
+    """
+    Request whose JSON body is decoded with orjson, after undoing any gzip or
+    zstd Content-Encoding. Columnar messages are expanded to message dicts
+    so request models validate them like the plain JSON form.
+    """
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_decoded_body"):
+            self._decoded_body = decode_body(await super().body(), self.headers.get("content-encoding"))
+        return self._decoded_body
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError, so
+            # malformed bodies still become 422 responses
+            raw = await self.body()
+            with stage("json_decode"):
+                body = orjson.loads(raw)
+                media_type = self.headers.get("content-type", "").split(";")[0].strip()
+                if media_type == COLUMNAR_MEDIA_TYPE and isinstance(body, dict) and isinstance(body.get("messages"), dict):
+                    try:
+                        body["messages"] = from_columnar(body["messages"])
+                    except ValueError as e:
+                        raise HTTPException(status_code=400, detail=str(e))
+            self._json = body
+        return self._json
+
+
+class FastJSONRoute(APIRoute):
+    """APIRoute that hands its endpoint a FastJSONRequest"""
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            return await handler(FastJSONRequest(request.scope, request.receive))
+
+        return route_handler
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional, Any
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Dict, Optional, Any, Literal
 from datetime import datetime
 
 # Message models
@@ -37,6 +37,21 @@ class Chat(ChatBase):
     class Config:
         from_attributes = True
 
+class MessagesRequest(BaseModel):
+    # Either the messages themselves or the chat_id returned by /api/chat/process
+    messages: List[MessageBase] = []
+    chat_id: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_message_source(self):
+        sent = ("messages" in self.model_fields_set) + (self.chat_id is not None)
+        if sent > 1:
+            raise ValueError("Send either messages or chat_id, not both")
+        # Requests that accept a state_id may name their chat by it alone
+        if sent == 0 and getattr(self, "state_id", None) is None:
+            raise ValueError("Send either messages or chat_id")
+        return self
+
 # Security models
 class SecurityFinding(BaseModel):
     type: str
@@ -99,38 +114,126 @@ class ConversationInsights(BaseModel):
     timestamp: str
 
 # Request models for stateless API
-class AnalyzeSecurityRequest(BaseModel):
-    messages: List[MessageBase]
+class AnalyzeSecurityRequest(MessagesRequest):
+    pass
 
-class GetSensitiveDataRequest(BaseModel):
-    messages: List[MessageBase]
+class IncrementalSecurityRequest(MessagesRequest):
+    # `messages` holds the messages appended since the last call (the whole
+    # chat on the first call); with a chat_id, the session messages the state
+    # has not seen yet are analyzed
+    # Omit to start a new state
+    state_id: Optional[str] = None
+    # Index of the first message in `messages`; checked against the state when set
+    offset: Optional[int] = None
+
+class IncrementalSecurityAnalysis(BaseModel):
+    state_id: str
+    message_count: int
+    security_score: float
+    total_findings: int
+    # Only the findings from messages added in this call
+    new_findings: List[SecurityFinding]
+    risk_levels: RiskLevels
+    recommendations: List[SecurityRecommendation]
 
-class GetRedactedMessagesRequest(BaseModel):
-    messages: List[MessageBase]
+class EntityIndexRequest(MessagesRequest):
+    # Or the state_id of an incremental analysis
+    state_id: Optional[str] = None
+    data_type: Optional[str] = None
+    min_count: int = 1
 
-class SemanticSearchRequest(BaseModel):
-    messages: List[MessageBase]
+class EntityLookupRequest(MessagesRequest):
+    state_id: Optional[str] = None
+    data_type: str
+    # Any spelling, e.g. "(555) 123-4567" finds "555-123-4567"
+    value: str
+
+class EntityOccurrence(BaseModel):
+    message_index: int
+    sender: str
+    timestamp: datetime
+
+class SensitiveEntity(BaseModel):
+    type: str
+    # Normalized value
+    value: str
+    variants: List[str]
+    # Number of exposures, and of distinct messages exposing it
+    count: int
+    message_count: int
+    senders: Dict[str, int]
+    first_seen: datetime
+    last_seen: datetime
+
+class SensitiveEntityDetail(SensitiveEntity):
+    occurrences: List[EntityOccurrence]
+
+class GetSensitiveDataRequest(MessagesRequest):
+    pass
+
+class GetRedactedMessagesRequest(MessagesRequest):
+    pass
+
+# "semantic": TF-IDF similarity, "fuzzy": typo-tolerant character trigram
+# match, "substring": case-insensitive substring match
+SearchMode = Literal["semantic", "fuzzy", "substring"]
+
+class SearchFilters(BaseModel):
+    # Every set predicate must match; lists match any of their values
+    senders: Optional[List[str]] = None
+    message_types: Optional[List[str]] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+
+class SemanticSearchRequest(MessagesRequest):
     query: str
     min_similarity: float = Field(0.3, ge=0, le=1)
     limit: int = Field(10, ge=1, le=50)
     with_explanation: bool = False
+    mode: SearchMode = "semantic"
+    filters: Optional[SearchFilters] = None
 
-class SimilarMessagesRequest(BaseModel):
-    messages: List[MessageBase]
+class SemanticSearchPageRequest(MessagesRequest):
+    # Either a new search (messages or chat_id + query) or a cursor from a previous page
+    query: Optional[str] = None
+    cursor: Optional[str] = None
+    min_similarity: float = Field(0.3, ge=0, le=1)
+    page_size: int = Field(50, ge=1, le=500)
+    with_explanation: bool = False
+    mode: SearchMode = "semantic"
+    filters: Optional[SearchFilters] = None
+
+class SearchResultPage(BaseModel):
+    results: List[SearchResult]
+    total: int
+    next_cursor: Optional[str] = None
+    # Counts over all matches: {"senders": {...}, "message_types": {...}, "months": {...}}
+    facets: Dict[str, Dict[str, int]] = {}
+    # Fuzzy mode only: more candidates than were verified, so matches may be missing
+    truncated: bool = False
+
+class SimilarMessagesRequest(MessagesRequest):
     message: str
     min_similarity: float = Field(0.3, ge=0, le=1)
     limit: int = Field(10, ge=1, le=50)
 
-class TopicClustersRequest(BaseModel):
-    messages: List[MessageBase]
+class DuplicateGroupsRequest(MessagesRequest):
+    min_similarity: float = Field(0.8, ge=0, le=1)
+    # Skip short messages ("ok", "haha") that are trivially identical
+    min_length: int = Field(20, ge=1)
 
-class ConversationInsightsRequest(BaseModel):
-    messages: List[MessageBase]
+class DuplicateGroup(BaseModel):
+    size: int
+    messages: List[Dict]
+
+class TopicClustersRequest(MessagesRequest):
+    pass
+
+class ConversationInsightsRequest(MessagesRequest):
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
 
-class AnswerQuestionRequest(BaseModel):
-    messages: List[MessageBase]
+class AnswerQuestionRequest(MessagesRequest):
     question: str
 
 class AnswerQuestionResponse(BaseModel):
@@ -146,6 +249,8 @@ class ChatUploadResponse(BaseModel):
     total_messages: int
     statistics: Dict
     messages: List[MessageBase]
+    # Pass as chat_id instead of re-sending the messages
+    chat_id: Optional[str] = None
 
 class SecurityInsightItem(BaseModel):
     title: str
@@ -184,8 +289,8 @@ class SecurityInsightsResponse(BaseModel):
     trends: List[SecurityTrend]
     recommendations: List[SecurityRecommendationDetail]
 
-class SecurityInsightsRequest(BaseModel):
-    messages: List[MessageBase]
+class SecurityInsightsRequest(MessagesRequest):
+    pass
 
 # Security Insights V2 models
 class SecurityInsight2(BaseModel):
@@ -216,6 +321,29 @@ class SecurityInsightsResponse2(BaseModel):
     trends: List[SecurityTrend2]
     recommendations: Optional[List[SecurityRecommendationDetail]] = None
 
-class SecurityInsightsRequest2(BaseModel):
-    messages: List[MessageBase]
-    compare_with_previous: bool = False 
\ No newline at end of file
+class SecurityInsightsRequest2(MessagesRequest):
+    compare_with_previous: bool = False
+    # Store this analysis as the chat's new baseline (the first analysis always is)
+    save_baseline: bool = False
+
+# Background jobs
+# "topic_clusters": /api/search/topics, "security_insights": /api/security/insights,
+# "summary": conversation summary built from per-chunk summaries
+JobKind = Literal["topic_clusters", "security_insights", "summary"]
+
+class JobRequest(MessagesRequest):
+    kind: JobKind
+
+class JobStatus(BaseModel):
+    job_id: str
+    kind: str
+    # queued, running, succeeded, failed or cancelled
+    status: str
+    progress: float
+    message: Optional[str] = None
+    partial_result: Optional[Any] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
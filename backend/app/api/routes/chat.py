@@ -1,8 +1,14 @@
-from fastapi import APIRouter, HTTPException, Body
-from typing import List, Dict
-from app.core.whatsapp_parser import WhatsAppParser
-from app.services.sensitive_data_detector import SensitiveDataDetector
+from fastapi import APIRouter, HTTPException, Body, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Iterator
+import orjson
+from app.core.whatsapp_parser import WhatsAppParser, ChatStatistics, Message
+from app.services.sensitive_data_detector import detector
 from app.api.models import MessageBase, ChatUploadResponse
+from app.api.fast_json import FastJSONRoute
+from app.api.columnar import COLUMNAR_MEDIA_TYPE, accepts_columnar, encoded_response, to_columnar
+from app.core.executors import offload
+from app.services.chat_sessions import create_session
 from pydantic import BaseModel
 import nltk
 
@@ -18,8 +24,11 @@ except LookupError:
     nltk.download('wordnet')
     nltk.download('averaged_perceptron_tagger')
 
-router = APIRouter()
-detector = SensitiveDataDetector()
+router = APIRouter(route_class=FastJSONRoute)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Messages per NDJSON line when /process streams its response
+STREAM_CHUNK_MESSAGES = 1000
 
 class ChatStats(BaseModel):
     total_messages: int
@@ -35,13 +44,54 @@ class UploadResponse(BaseModel):
     total_messages: int
     statistics: Dict
 
-@router.post("/process", response_model=ChatUploadResponse)
-async def process_chat_text(chat_text: str = Body(..., embed=True)):
+def _message_dict(msg: Message) -> Dict:
+    """A message in the format expected by the frontend"""
+    return {
+        "timestamp": msg.timestamp,
+        "sender": msg.sender,
+        "content": msg.content,
+        "message_type": msg.message_type,
+        "duration": msg.duration,
+        "url": msg.url,
+        "language": msg.language,
+        "is_system_message": msg.is_system_message
+    }
+
+def _stream_chat(chat_text: str, include_messages: bool) -> Iterator[bytes]:
     """
-    Process a WhatsApp chat text directly.
-    Returns basic statistics about the chat and the parsed messages.
-    This endpoint is designed for stateless operation.
+    NDJSON lines for /process: a header, the messages in chunks as they are
+    parsed, then the statistics and chat_id once the whole chat is parsed
     """
+    yield orjson.dumps({"type": "header", "chunk_size": STREAM_CHUNK_MESSAGES}) + b"\n"
+    try:
+        stats = ChatStatistics()
+        messages = []
+        chunk = []
+        for msg in WhatsAppParser().iter_messages(chat_text):
+            stats.add(msg)
+            messages.append(msg)
+            if include_messages:
+                chunk.append(_message_dict(msg))
+                if len(chunk) == STREAM_CHUNK_MESSAGES:
+                    yield orjson.dumps({"type": "messages", "messages": chunk}) + b"\n"
+                    chunk = []
+        if chunk:
+            yield orjson.dumps({"type": "messages", "messages": chunk}) + b"\n"
+
+        session = create_session(messages)
+        yield orjson.dumps({
+            "type": "summary",
+            "message": "Chat processed successfully",
+            "total_messages": len(messages),
+            "statistics": stats.to_dict(),
+            "chat_id": session.chat_id
+        }) + b"\n"
+    except Exception as e:
+        # The status line has already been sent
+        yield orjson.dumps({"type": "error", "detail": str(e)}) + b"\n"
+
+def _process_chat(request: Request, chat_text: str, include_messages: bool) -> Response:
+    """Parse a chat, start its session and encode the /process response"""
     try:
         # Parse messages
         local_parser = WhatsAppParser()
@@ -50,29 +100,48 @@ async def process_chat_text(chat_text: str = Body(..., embed=True)):
         # Get chat statistics
         stats = local_parser.get_statistics()
         
-        # Convert messages to the format expected by the frontend
-        message_list = [
-            {
-                "timestamp": msg.timestamp,
-                "sender": msg.sender,
-                "content": msg.content,
-                "message_type": msg.message_type,
-                "duration": msg.duration,
-                "url": msg.url,
-                "language": msg.language,
-                "is_system_message": msg.is_system_message
-            }
-            for msg in messages
-        ]
+        # Keep the parsed chat so later requests can reference it by chat_id
+        session = create_session(messages)
+        
+        # Convert messages to the format the client asked for
+        columnar = accepts_columnar(request)
+        if columnar:
+            message_list = to_columnar(messages if include_messages else [])
+        else:
+            message_list = [_message_dict(msg) for msg in messages] if include_messages else []
         
-        return ChatUploadResponse(
-            message="Chat processed successfully",
-            total_messages=len(messages),
-            statistics=stats,
-            messages=message_list
-        )
+        # Returned directly: re-validating every message through the
+        # response model would cost more than parsing the chat did
+        return encoded_response(request, {
+            "message": "Chat processed successfully",
+            "total_messages": len(messages),
+            "statistics": stats,
+            "messages": message_list,
+            "chat_id": session.chat_id
+        }, media_type=COLUMNAR_MEDIA_TYPE if columnar else "application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post(
+    "/process",
+    response_model=ChatUploadResponse,
+    responses={200: {"content": {COLUMNAR_MEDIA_TYPE: {}, NDJSON_MEDIA_TYPE: {}}}}
+)
+async def process_chat_text(
+    request: Request,
+    chat_text: str = Body(..., embed=True),
+    include_messages: bool = Body(True, embed=True)
+):
+    """
+    Process a WhatsApp chat text directly.
+    Returns basic statistics about the chat and the parsed messages, plus a
+    chat_id that other endpoints accept in place of the messages. Clients
+    that only use the chat_id can set include_messages to false.
+    Messages are returned in columnar form when the client accepts
+    application/vnd.chatlore.columnar+json, and streamed as NDJSON while
+    the chat is parsed when it accepts application/x-ndjson.
+    """
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return StreamingResponse(_stream_chat(chat_text, include_messages), media_type=NDJSON_MEDIA_TYPE)
 
-
+    return await offload("parsing", _process_chat, request, chat_text, include_messages)
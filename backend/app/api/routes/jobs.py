@@ -0,0 +1,129 @@
+import os
+import zlib
+from typing import List, Sequence
+import orjson
+from fastapi import APIRouter, HTTPException
+from pydantic import TypeAdapter
+from app.api.columnar import from_columnar, to_columnar
+from app.api.dependencies import resolve_messages
+from app.api.fast_json import FastJSONRoute
+from app.api.models import JobRequest, JobStatus, TopicCluster
+from app.core.executors import offload
+from app.core.whatsapp_parser import Message
+from app.services.jobs import JobContext, job_queue
+from app.services.search_service import SearchService
+from app.services.security_insights import security_insights
+from app.services.sensitive_data_detector import SecurityReport, detector
+
+# Messages scanned between two progress updates of a security job; chunks
+# with fewer text messages than PARALLEL_DETECTION_THRESHOLD are scanned serially
+JOB_SCAN_CHUNK_MESSAGES = int(os.getenv("JOB_SCAN_CHUNK_MESSAGES", 20000))
+# Messages per partial summary of a summary job
+JOB_SUMMARY_CHUNK_MESSAGES = int(os.getenv("JOB_SUMMARY_CHUNK_MESSAGES", 2000))
+
+router = APIRouter(route_class=FastJSONRoute)
+
+_message_list = TypeAdapter(List[Message])
+
+def encode_messages(messages: Sequence) -> bytes:
+    """Compact job payload: zlib-compressed columnar JSON"""
+    return zlib.compress(orjson.dumps(to_columnar(messages)), 1)
+
+def decode_messages(payload: bytes) -> List[Message]:
+    return _message_list.validate_python(from_columnar(orjson.loads(zlib.decompress(payload))))
+
+@job_queue.handler("security_insights")
+async def security_insights_job(context: JobContext, params: dict, payload: bytes):
+    messages = await offload("parsing", decode_messages, payload)
+
+    # One report is extended chunk by chunk, so progress comes from the
+    # report itself and the insights need no second pass
+    report = SecurityReport(detector)
+    for start in range(0, len(messages), JOB_SCAN_CHUNK_MESSAGES):
+        await offload("detection", detector.update_report, report, messages[start:start + JOB_SCAN_CHUNK_MESSAGES])
+        await context.progress(
+            90 * report.message_count / len(messages),
+            f"Scanned {report.message_count} of {len(messages)} messages",
+            partial={"messages_scanned": report.message_count, "sensitive_data_counts": dict(report.type_counts)}
+        )
+
+    await context.progress(90, "Building insights")
+    return security_insights(report)
+
+@job_queue.handler("topic_clusters")
+async def topic_clusters_job(context: JobContext, params: dict, payload: bytes):
+    messages = await offload("parsing", decode_messages, payload)
+    service = SearchService()
+    await service.initialize(messages)
+    await context.progress(20, "Clustering messages")
+    clusters = await service.get_topic_clusters()
+    await context.progress(40, f"Summarizing {len(clusters)} topics")
+
+    topics = []
+    summaries = []
+    for topic_id, message_indices in clusters.items():
+        cluster_messages = [messages[idx] for idx in message_indices]
+        summary = await service.summarize_cluster(cluster_messages)
+        topics.append(TopicCluster(
+            topic_id=topic_id,
+            messages=[msg.model_dump(mode="json") for msg in cluster_messages],
+            summary=summary
+        ).model_dump(mode="json"))
+        summaries.append({"topic_id": topic_id, "message_count": len(cluster_messages), "summary": summary})
+        await context.progress(
+            40 + 60 * len(topics) / len(clusters), f"Summarized {len(topics)} of {len(clusters)} topics",
+            partial=summaries
+        )
+    return topics
+
+@job_queue.handler("summary")
+async def summary_job(context: JobContext, params: dict, payload: bytes):
+    messages = await offload("parsing", decode_messages, payload)
+    service = SearchService()
+    chunks = [messages[i:i + JOB_SUMMARY_CHUNK_MESSAGES] for i in range(0, len(messages), JOB_SUMMARY_CHUNK_MESSAGES)]
+
+    summaries = []
+    for chunk in chunks:
+        summaries.append(await service.get_conversation_summary(chunk))
+        await context.progress(
+            90 * len(summaries) / len(chunks), f"Summarized {len(summaries)} of {len(chunks)} parts",
+            partial={"part_summaries": summaries}
+        )
+
+    if len(summaries) == 1:
+        summary = summaries[0]
+    else:
+        # Summarize the part summaries as a conversation of their own
+        parts = [
+            Message(timestamp=chunk[-1].timestamp, sender=f"Part {i + 1}", content=text, message_type="text")
+            for i, (chunk, text) in enumerate(zip(chunks, summaries))
+        ]
+        summary = await service.get_conversation_summary(parts)
+    return {"summary": summary, "part_summaries": summaries, "message_count": len(messages)}
+
+@router.post("", response_model=JobStatus, status_code=202)
+async def submit_job(request: JobRequest):
+    """
+    Queue a long-running analysis of the request's messages (or chat session).
+    Poll GET /api/jobs/{job_id} for progress, partial results and the result.
+    """
+    messages = await resolve_messages(request)
+    if not messages:
+        raise HTTPException(status_code=400, detail="No messages to analyze")
+    payload = await offload("parsing", encode_messages, messages)
+    return await job_queue.submit(request.kind, {}, payload)
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.delete("/{job_id}", response_model=JobStatus)
+async def cancel_job(job_id: str):
+    """Cancel a job; a running job stops at its next progress checkpoint"""
+    job = await job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -1,14 +1,14 @@
 from fastapi import APIRouter, HTTPException, Query, Body
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
 from collections import Counter
 import math
 from typing import List, Dict, Optional
 from app.core.whatsapp_parser import WhatsAppParser, Message
+from app.core.text_analysis import analyze_text
+from app.api.dependencies import resolve_messages
+from app.api.fast_json import FastJSONRoute
+from app.core.executors import offload
 
-from app.services.search_service import SearchService
+from app.services.search_service import SearchService, InvalidCursorError
 from datetime import datetime, timedelta
 from app.api.models import (
     MessageBase,
@@ -19,36 +19,24 @@ from app.api.models import (
     TopicCluster,
     ConversationInsights,
     SemanticSearchRequest,
+    SemanticSearchPageRequest,
+    SearchResultPage,
     SimilarMessagesRequest,
+    DuplicateGroupsRequest,
+    DuplicateGroup,
     TopicClustersRequest,
     ConversationInsightsRequest,
     AnswerQuestionRequest,
     AnswerQuestionResponse
 )
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 search_service = SearchService()
 
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
-    nltk.download('wordnet')
-
-lemmatizer = WordNetLemmatizer()
-stop_words = set(stopwords.words('english'))
-
 def preprocess_text(text: str) -> List[str]:
     """Preprocess text for similarity comparison"""
-    # Tokenize and convert to lowercase
-    tokens = word_tokenize(text.lower())
-    # Remove stopwords and lemmatize
-    tokens = [lemmatizer.lemmatize(token) for token in tokens if token.isalnum() and token not in stop_words]
-    return tokens
+    # Shared, cached tokenize/stopword/lemmatize pipeline (same terms as SearchService)
+    return list(analyze_text(text))
 
 def get_tf_idf_vector(text: str, idf_dict: Dict[str, float]) -> Dict[str, float]:
     """Calculate TF-IDF vector for a text"""
@@ -110,64 +98,130 @@ def calculate_idf(messages: List[Message]) -> Dict[str, float]:
     
     return idf_dict
 
+def to_search_result(result) -> SearchResult:
+    """Convert a SearchService result into the API response model"""
+    return SearchResult(
+        message=result.message.dict(),
+        similarity=result.similarity,
+        context=MessageContext(**result.context),
+        explanation=result.explanation or None
+    )
+
 @router.post("/semantic", response_model=List[SearchResult])
 async def semantic_search_stateless(request: SemanticSearchRequest):
     """
     Perform semantic search on messages using Gemini.
     Returns messages ranked by relevance to the query.
+    Set mode to "fuzzy" or "substring" for typo-tolerant or exact substring
+    matching over a character trigram index.
     (Stateless approach)
     """
     # Create a temporary search service
     temp_search_service = SearchService()
     
-    # Create a parser from the provided messages
-    parser = request.messages
+    # Get the messages from the request or its chat session
+    messages = await resolve_messages(request)
     
-    # Initialize the search service
-    await temp_search_service.initialize(parser)
+    # Initialize the search service (the TF-IDF index is only needed for semantic mode)
+    await temp_search_service.initialize(messages, build_tfidf=request.mode == "semantic")
     
     # Perform semantic search
     results = await temp_search_service.semantic_search(
         query=request.query,
         min_similarity=request.min_similarity,
         limit=request.limit,
-        with_explanation=request.with_explanation
+        with_explanation=request.with_explanation,
+        mode=request.mode,
+        filters=request.filters.dict() if request.filters else None
     )
     
-    return results
+    return [to_search_result(result) for result in results]
+
+@router.post("/semantic/page", response_model=SearchResultPage)
+async def semantic_search_page(request: SemanticSearchPageRequest):
+    """
+    Paginated semantic search.
+    The first call (messages + query) ranks every message once and returns a
+    cursor; passing that cursor back serves the next page from the cached
+    ranking without re-scoring.
+    """
+    if request.cursor:
+        try:
+            results, ranking, next_cursor = await SearchService.next_page(
+                request.cursor,
+                page_size=request.page_size,
+                with_explanation=request.with_explanation
+            )
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=410, detail=str(e))
+    else:
+        if not request.query:
+            raise HTTPException(status_code=400, detail="Either query or cursor is required")
+        temp_search_service = SearchService()
+        await temp_search_service.initialize(await resolve_messages(request), build_tfidf=request.mode == "semantic")
+        results, ranking, next_cursor = await temp_search_service.search_page(
+            query=request.query,
+            min_similarity=request.min_similarity,
+            page_size=request.page_size,
+            with_explanation=request.with_explanation,
+            mode=request.mode,
+            filters=request.filters.dict() if request.filters else None
+        )
+
+    return SearchResultPage(
+        results=[to_search_result(result) for result in results],
+        total=len(ranking),
+        next_cursor=next_cursor,
+        facets=ranking.facets,
+        truncated=ranking.truncated
+    )
 
 @router.post("/similar", response_model=List[SearchResult])
 async def get_similar_messages_stateless(request: SimilarMessagesRequest):
     """
     Find messages similar to a specific message.
+    Uses a MinHash/LSH index over character shingles that is built once per
+    chat, so repeated lookups only touch the query's LSH buckets.
     (Stateless approach)
     """
     # Create a temporary search service
     temp_search_service = SearchService()
     
-    # Get the messages from the request
-    messages = request.messages
-    
-    # Initialize the search service
-    await temp_search_service.initialize(messages)
+    # Get the messages from the request or its chat session (no TF-IDF index needed)
+    await temp_search_service.initialize(await resolve_messages(request), build_tfidf=False)
     
-    # Perform semantic search using the message content directly
-    results = await temp_search_service.semantic_search(
-        query=request.message,
+    results = await temp_search_service.get_similar_messages(
+        message=request.message,
         min_similarity=request.min_similarity,
-        limit=request.limit,
-        with_explanation=True   
+        limit=request.limit
     )
     
+    return [to_search_result(result) for result in results]
+
+@router.post("/duplicates", response_model=List[DuplicateGroup])
+async def get_duplicate_groups_stateless(request: DuplicateGroupsRequest):
+    """
+    Find groups of near-duplicate messages (forwarded chains, repeated pastes).
+    Returns groups largest first.
+    (Stateless approach)
+    """
+    messages = await resolve_messages(request)
+    temp_search_service = SearchService()
+    await temp_search_service.initialize(messages, build_tfidf=False)
+
+    groups = await offload(
+        "search",
+        temp_search_service.get_duplicate_groups,
+        min_similarity=request.min_similarity,
+        min_length=request.min_length
+    )
+
     return [
-        SearchResult(
-            message=result.message.dict(),
-            similarity=result.similarity,
-            context=MessageContext(**result.context),
-            explanation=None
+        DuplicateGroup(
+            size=len(group),
+            messages=[messages[idx].dict() for idx in group]
         )
-        for result in results
-        if result.message.dict()["content"] != request.message  # Exclude the query message if it matches exactly
+        for group in groups
     ]
 
 @router.post("/topics", response_model=List[TopicCluster])
@@ -179,11 +233,11 @@ async def get_topic_clusters_stateless(request: TopicClustersRequest):
     # Create a temporary search service
     temp_search_service = SearchService()
     
-    # Create a parser from the provided messages
-    parser = request.messages
+    # Get the messages from the request or its chat session
+    messages = await resolve_messages(request)
     
     # Initialize the search service
-    await temp_search_service.initialize(parser)
+    await temp_search_service.initialize(messages)
     
     # Get topic clusters
     clusters = await temp_search_service.get_topic_clusters()
@@ -191,26 +245,8 @@ async def get_topic_clusters_stateless(request: TopicClustersRequest):
     # Generate summaries for each cluster
     topic_clusters = []
     for topic_id, message_indices in clusters.items():
-        cluster_messages = [parser.messages[idx] for idx in message_indices]
-        
-        # Generate summary for cluster with error handling
-        try:
-            insights = await temp_search_service.get_conversation_insights(cluster_messages)
-            summary = insights.get("insights", "No insights available")
-        except Exception as e:
-            print(f"Error generating cluster summary: {e}")
-            # Provide a fallback summary that doesn't rely on the API
-            summary = f"Cluster with {len(cluster_messages)} messages"
-            if len(cluster_messages) > 0:
-                # Include the most common words or phrases if possible
-                try:
-                    words = " ".join([msg.content for msg in cluster_messages]).split()
-                    word_counts = Counter(words)
-                    common_words = ", ".join([word for word, _ in word_counts.most_common(5)])
-                    summary = f"Cluster with {len(cluster_messages)} messages. Common terms: {common_words}"
-                except Exception:
-                    pass
-        
+        cluster_messages = [messages[idx] for idx in message_indices]
+        summary = await temp_search_service.summarize_cluster(cluster_messages)
         topic_clusters.append(TopicCluster(
             topic_id=topic_id,
             messages=[msg.dict() for msg in cluster_messages],
@@ -228,14 +264,13 @@ async def get_conversation_insights_stateless(request: ConversationInsightsReque
     # Create a temporary search service
     temp_search_service = SearchService()
     
-    # Create a parser from the provided messages
-    parser = create_parser_from_messages(request.messages)
+    # Get the messages from the request or its chat session
+    messages = await resolve_messages(request)
     
     # Initialize the search service
-    await temp_search_service.initialize(parser.messages)
+    await temp_search_service.initialize(messages)
     
     # Filter messages by date range if specified
-    messages = parser.messages
     if request.start_date or request.end_date:
         if request.start_date and request.end_date:
             messages = [msg for msg in messages if request.start_date <= msg.timestamp <= request.end_date]
@@ -263,14 +298,14 @@ async def answer_question_stateless(request: AnswerQuestionRequest):
     # Create a temporary search service
     temp_search_service = SearchService()
     
-    # Create a parser from the provided messages
-    parser = request.messages
+    # Get the messages from the request or its chat session
+    messages = await resolve_messages(request)
     
     # Initialize the search     
-    await temp_search_service.initialize(parser)
+    await temp_search_service.initialize(messages)
     
     # Answer the question
-    response = await temp_search_service.answer_question(request.question, parser)
+    response = await temp_search_service.answer_question(request.question, messages)
     
     # Extract just the answer string from the response dictionary
     if isinstance(response, dict) and "answer" in response:
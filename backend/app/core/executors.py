@@ -0,0 +1,133 @@
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from app.core.metrics import CallbackMetric
+from app.core.profiling import track_thread
+
+# Workload classes with their own pools, so a burst of one kind of request
+# (e.g. large security scans) cannot starve the others
+WORKLOADS = ("parsing", "detection", "search")
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_QUEUE_SIZE = 32
+
+
+class ExecutorSaturated(Exception):
+    """Raised when a workload's pool and queue are both full"""
+
+    def __init__(self, workload: str, retry_after: int):
+        super().__init__(f"Too many {workload} requests in progress; retry in {retry_after}s")
+        self.workload = workload
+        self.retry_after = retry_after
+
+
+class WorkloadExecutor:
+    """
+    Thread pool for one workload class with a bounded queue.
+    Submissions beyond workers + queue_size are rejected with
+    ExecutorSaturated instead of waiting; context variables of the caller
+    are visible to the task.
+    """
+
+    def __init__(self, name: str, workers: int, queue_size: int):
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-worker")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        # Moving average of task duration, for Retry-After
+        self.average_seconds = 0.0
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        backlog = (self.queued + self.running) / self.workers
+        return max(1, math.ceil(backlog * self.average_seconds))
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            if self.queued + self.running >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise ExecutorSaturated(self.name, self.retry_after())
+            self.queued += 1
+
+        context = contextvars.copy_context()
+        future = self._pool.submit(context.run, self._call, func, args, kwargs)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # A task cancelled before it started never reaches _call
+            if future.cancelled():
+                with self._lock:
+                    self.queued -= 1
+            raise
+
+    def _call(self, func: Callable, args: tuple, kwargs: dict) -> Any:
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        started = time.perf_counter()
+        try:
+            with track_thread():
+                return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.average_seconds = elapsed if not self.average_seconds else 0.8 * self.average_seconds + 0.2 * elapsed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "running": self.running,
+                "queued": self.queued,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "average_seconds": round(self.average_seconds, 6)
+            }
+
+
+def _setting(workload: str, name: str, default: int) -> int:
+    return int(os.getenv(f"EXECUTOR_{workload.upper()}_{name}", default))
+
+
+executors: Dict[str, WorkloadExecutor] = {
+    workload: WorkloadExecutor(
+        workload,
+        _setting(workload, "WORKERS", DEFAULT_WORKERS),
+        _setting(workload, "QUEUE_SIZE", DEFAULT_QUEUE_SIZE)
+    )
+    for workload in WORKLOADS
+}
+
+
+async def offload(workload: str, func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking call on the workload's pool instead of the event loop"""
+    return await executors[workload].run(func, *args, **kwargs)
+
+
+def executor_stats() -> Dict[str, Dict]:
+    return {workload: executor.stats() for workload, executor in executors.items()}
+
+
+def _executor_metric(key: str):
+    return lambda: {(workload,): stats[key] for workload, stats in executor_stats().items()}
+
+
+CallbackMetric("chatlore_executor_running", "Tasks running per workload pool", ("workload",), _executor_metric("running"))
+CallbackMetric("chatlore_executor_queued", "Tasks waiting per workload pool", ("workload",), _executor_metric("queued"))
+CallbackMetric("chatlore_executor_completed_total", "Tasks completed per workload pool", ("workload",),
+               _executor_metric("completed"), type="counter")
+CallbackMetric("chatlore_executor_rejected_total", "Submissions rejected because the pool was saturated", ("workload",),
+               _executor_metric("rejected"), type="counter")
@@ -0,0 +1,258 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Upper bounds (bytes) of the request payload size classes
+PAYLOAD_SIZE_BUCKETS = (10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+PAYLOAD_SIZE_LABELS = ("<10KB", "<100KB", "<1MB", "<10MB", "<100MB", ">=100MB")
+# Upper bounds (milliseconds) of the latency histogram buckets
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1_000, 2_500, 5_000, 10_000, 30_000)
+# Finer buckets (seconds) for pipeline stages, which are often sub-millisecond
+STAGE_BUCKETS_SECONDS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def payload_size_label(size: int) -> str:
+    return PAYLOAD_SIZE_LABELS[bisect_left(PAYLOAD_SIZE_BUCKETS, size)]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# Every metric rendered by /metrics, in registration order
+registry: List["Metric"] = []
+
+
+class Metric:
+    """Base of the Prometheus metric types; rendered by /metrics unless register is False"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), register: bool = True):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        if register:
+            registry.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}", *self.samples()]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), register: bool = True):
+        super().__init__(name, documentation, labelnames, register)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in values]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = STAGE_BUCKETS_SECONDS, register: bool = True):
+        super().__init__(name, documentation, labelnames, register)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(labels)
+            if counts is None:
+                counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+                self._sums[labels] = 0.0
+            counts[bucket] += 1
+            self._sums[labels] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def collect(self) -> List[Tuple[Tuple[str, ...], List[int], float]]:
+        """(labels, cumulative bucket counts, sum) per label set"""
+        with self._lock:
+            items = [(labels, list(counts), self._sums[labels]) for labels, counts in self._counts.items()]
+        result = []
+        for labels, counts, total in items:
+            cumulative = 0
+            for i, count in enumerate(counts):
+                cumulative += count
+                counts[i] = cumulative
+            result.append((labels, counts, total))
+        return result
+
+    def samples(self) -> List[str]:
+        lines = []
+        bounds = [_number(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, counts, total in self.collect():
+            for bound, count in zip(bounds, counts):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {counts[-1]}")
+        return lines
+
+
+class CallbackMetric(Metric):
+    """A metric whose values are read from a callback at scrape time"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 collect: Callable[[], Dict[Tuple[str, ...], float]], type: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self.collect = collect
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in self.collect().items()]
+
+
+class LatencyHistogram(Histogram):
+    """Request latency histograms per (route, payload size class)"""
+
+    def __init__(self, name: str = "chatlore_request_duration_seconds",
+                 documentation: str = "Request latency by route and request payload size class", register: bool = True):
+        super().__init__(name, documentation, ("route", "payload_size"),
+                         buckets=[bound / 1000 for bound in LATENCY_BUCKETS_MS], register=register)
+
+    def observe_request(self, route: str, payload_bytes: int, seconds: float) -> None:
+        self.observe(seconds, route, payload_size_label(payload_bytes))
+
+payload_latency = LatencyHistogram()
+requests_total = Counter("chatlore_requests_total", "Requests by route, method and status", ("route", "method", "status"))
+request_bytes = Histogram("chatlore_request_bytes", "Request body size by route", ("route",), buckets=PAYLOAD_SIZE_BUCKETS)
+response_bytes = Histogram("chatlore_response_bytes", "Response body size by route", ("route",), buckets=PAYLOAD_SIZE_BUCKETS)
+stage_duration = Histogram("chatlore_stage_duration_seconds", "Time spent per pipeline stage", ("stage",))
+llm_duration = Histogram("chatlore_llm_request_duration_seconds", "Gemini call latency by operation and outcome",
+                         ("operation", "outcome"))
+llm_tokens = Counter("chatlore_llm_tokens_total", "Gemini tokens by operation and kind (prompt, completion)",
+                     ("operation", "kind"))
+
+
+# (stage, seconds) of the current request, for the Server-Timing header;
+# executor tasks run in a copy of the request context and append to the same list
+request_stages: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_stages", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time one pipeline stage (also usable as a decorator)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_duration.observe(elapsed, name)
+        stages = request_stages.get()
+        if stages is not None:
+            stages.append((name, elapsed))
+
+
+# name -> object with a stats() dict holding hits, misses, size and bytes
+_caches: Dict[str, object] = {}
+
+
+def register_cache(name: str, cache) -> None:
+    """Export an LRUCache's hit/miss counters and size"""
+    _caches[name] = cache
+
+
+def _cache_stat(key: str) -> Callable[[], Dict[Tuple[str, ...], float]]:
+    return lambda: {(name,): cache.stats()[key] for name, cache in list(_caches.items())}
+
+
+CallbackMetric("chatlore_cache_hits_total", "Cache hits by cache", ("cache",), _cache_stat("hits"), type="counter")
+CallbackMetric("chatlore_cache_misses_total", "Cache misses by cache", ("cache",), _cache_stat("misses"), type="counter")
+CallbackMetric("chatlore_cache_entries", "Entries held by cache", ("cache",), _cache_stat("size"))
+CallbackMetric("chatlore_cache_bytes", "Approximate bytes held by size-bounded caches", ("cache",), _cache_stat("bytes"))
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in list(registry):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def content_length(scope) -> int:
+    """Declared request body size; 0 when the header is missing or malformed"""
+    for name, value in scope.get("headers", ()):
+        if name == b"content-length":
+            try:
+                return max(0, int(value))
+            except ValueError:
+                return 0
+    return 0
+
+
+class PayloadLatencyMiddleware:
+    """
+    ASGI middleware recording each request's latency, status and body
+    sizes by route template and request payload size class
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        payload_bytes = content_length(scope)
+        status = "500"
+        sent_bytes = 0
+
+        async def send_wrapper(message):
+            nonlocal status, sent_bytes
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif message["type"] == "http.response.body":
+                sent_bytes += len(message.get("body", b""))
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Label by route template so path parameters don't split the histogram
+            route = getattr(scope.get("route"), "path", "unmatched")
+            payload_latency.observe_request(route, payload_bytes, time.perf_counter() - started)
+            requests_total.inc(route, scope["method"], status)
+            request_bytes.observe(payload_bytes, route)
+            response_bytes.observe(sent_bytes, route)
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs
+from app.core.metrics import content_length, payload_size_label, request_stages
+
+# Profiling must be switched on by the operator; clients can only ask for it
+PROFILING_ENABLED = os.getenv("REQUEST_PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+# When set, the flag has to carry this value instead of "1"
+PROFILING_TOKEN = os.getenv("REQUEST_PROFILING_TOKEN")
+PROFILE_DIR = os.getenv("REQUEST_PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("REQUEST_PROFILE_INTERVAL_MS", 2))
+# Profiled requests beyond this many at once run unprofiled
+PROFILE_MAX_CONCURRENT = int(os.getenv("REQUEST_PROFILE_MAX_CONCURRENT", 1))
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "1").lower() in ("1", "true", "yes")
+
+PROFILE_HEADER = b"x-chatlore-profile"
+PROFILE_QUERY_PARAM = "profile"
+
+_profile_slots = threading.BoundedSemaphore(PROFILE_MAX_CONCURRENT)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of a set of threads at a fixed interval and counts
+    them in the folded format flamegraph.pl, speedscope and inferno read.
+    Threads join while they work on the profiled request (see track_thread).
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def add_thread(self, ident: int, name: str) -> None:
+        with self._lock:
+            self._threads[ident] = name
+
+    def remove_thread(self, ident: int) -> None:
+        with self._lock:
+            self._threads.pop(ident, None)
+
+    def start(self) -> None:
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._sampler.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                threads = list(self._threads.items())
+            for ident, name in threads:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    stack.append(name)
+                    self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+_active_profiler: ContextVar[Optional[SamplingProfiler]] = ContextVar("active_profiler", default=None)
+
+
+@contextmanager
+def track_thread() -> Iterator[None]:
+    """Include the current thread in the request's profile while the block runs"""
+    profiler = _active_profiler.get()
+    if profiler is None:
+        yield
+        return
+    ident = threading.get_ident()
+    profiler.add_thread(ident, threading.current_thread().name)
+    try:
+        yield
+    finally:
+        profiler.remove_thread(ident)
+
+
+def _profile_requested(scope) -> bool:
+    expected = PROFILING_TOKEN or "1"
+    for name, value in scope.get("headers", ()):
+        if name == PROFILE_HEADER:
+            return secrets.compare_digest(value.decode("latin-1"), expected)
+    values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get(PROFILE_QUERY_PARAM)
+    return bool(values) and secrets.compare_digest(values[0], expected)
+
+
+def server_timing(stages: List[Tuple[str, float]], total: float) -> str:
+    """Server-Timing header value with the summed duration of each stage, in milliseconds"""
+    durations: Dict[str, float] = {}
+    for name, seconds in stages:
+        durations[name] = durations.get(name, 0.0) + seconds
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in durations.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+def write_profile(profiler: SamplingProfiler, profile_id: str, scope, route: str, payload_bytes: int,
+                  status: str, seconds: float, directory: str = PROFILE_DIR) -> str:
+    """
+    Write <time>_<method>_<route>_<size class>_<id>.folded and a .json with
+    the request details next to it. Returns the path of the folded stacks.
+    """
+    route_tag = re.sub(r"[^A-Za-z0-9]+", "-", route).strip("-") or "root"
+    size_tag = payload_size_label(payload_bytes).replace(">=", "ge").replace("<", "lt")
+    stem = os.path.join(directory, f"{datetime.now():%Y%m%dT%H%M%S}_{scope['method']}_{route_tag}_{size_tag}_{profile_id}")
+
+    os.makedirs(directory, exist_ok=True)
+    with open(stem + ".folded", "w") as f:
+        f.write(profiler.folded())
+    with open(stem + ".json", "w") as f:
+        json.dump({
+            "id": profile_id,
+            "route": route,
+            "path": scope["path"],
+            "method": scope["method"],
+            "status": status,
+            "payload_bytes": payload_bytes,
+            "payload_size": payload_size_label(payload_bytes),
+            "seconds": round(seconds, 6),
+            "samples": profiler.samples,
+            "interval_ms": profiler.interval * 1000,
+        }, f, indent=2)
+    return stem + ".folded"
+
+
+class RequestProfilingMiddleware:
+    """
+    ASGI middleware adding a Server-Timing header with the pipeline stages
+    of each request and, when enabled by configuration, profiling requests
+    that ask for it with the X-ChatLore-Profile header or ?profile= flag.
+
+    The profile covers the event loop thread (shared with concurrent
+    requests) and the executor threads while they run this request's tasks.
+    The response's X-Profile-Id is the suffix of the written profile's name.
+    """
+
+    def __init__(self, app, enabled: bool = PROFILING_ENABLED, directory: str = PROFILE_DIR,
+                 server_timing_enabled: bool = SERVER_TIMING_ENABLED):
+        self.app = app
+        self.enabled = enabled
+        self.directory = directory
+        self.server_timing_enabled = server_timing_enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profiler = None
+        if self.enabled and _profile_requested(scope) and _profile_slots.acquire(blocking=False):
+            profiler = SamplingProfiler()
+            profiler.add_thread(threading.get_ident(), "event-loop")
+        profile_id = secrets.token_hex(4) if profiler else None
+
+        stages: List[Tuple[str, float]] = []
+        stages_token = request_stages.set(stages)
+        profiler_token = _active_profiler.set(profiler)
+        started = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                headers = list(message.get("headers", []))
+                if self.server_timing_enabled:
+                    headers.append((b"server-timing", server_timing(stages, time.perf_counter() - started).encode()))
+                if profile_id:
+                    headers.append((b"x-profile-id", profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        if profiler:
+            profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stages.reset(stages_token)
+            _active_profiler.reset(profiler_token)
+            if profiler:
+                profiler.stop()
+                _profile_slots.release()
+                payload_bytes = content_length(scope)
+                route = getattr(scope.get("route"), "path", "unmatched")
+                # File I/O stays off the event loop
+                await asyncio.to_thread(write_profile, profiler, profile_id, scope, route, payload_bytes, status,
+                                        time.perf_counter() - started, self.directory)
@@ -0,0 +1,249 @@
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+from typing import Dict, Optional, Tuple
+import numpy as np
+from app.core.metrics import CallbackMetric
+
+
+def _default_directory() -> str:
+    # tmpfs when available, so entries live in memory rather than on disk
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "chatlore-store")
+
+
+SHARED_STORE_DIR = os.getenv("SHARED_STORE_DIR") or _default_directory()
+SHARED_STORE_MB = int(os.getenv("SHARED_STORE_MB", 2048))
+SHARED_STORE_TTL_SECONDS = int(os.getenv("SHARED_STORE_TTL_SECONDS", 3600))
+# Only worth the extra write when several uvicorn workers serve the app
+SHARED_STORE_ENABLED = int(os.getenv("WEB_CONCURRENCY", 1)) > 1 or bool(os.getenv("SHARED_STORE_DIR"))
+
+_MAGIC = b"CLSTORE1"
+_ALIGNMENT = 64
+
+
+def _aligned(size: int) -> int:
+    return -(-size // _ALIGNMENT) * _ALIGNMENT
+
+
+def write_arrays(path: str, arrays: Dict[str, np.ndarray], meta: Dict) -> int:
+    """
+    Write arrays and a JSON-serializable meta dict to one file: magic, header
+    length, JSON header (meta, dtypes, shapes, offsets), then the aligned
+    array data. The file appears atomically. Returns its size.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += _aligned(array.nbytes)
+    header = json.dumps({"meta": meta, "arrays": layout}).encode()
+    data_start = _aligned(len(_MAGIC) + 8 + len(header))
+
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(_MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.reshape(-1).view(np.uint8).data)
+        f.truncate(data_start + offset)
+    os.replace(temporary, path)
+    return data_start + offset
+
+
+def read_arrays(path: str) -> Tuple[np.memmap, Dict[str, np.ndarray], Dict]:
+    """
+    Map a file written by write_arrays. The arrays are read-only views into
+    the mapping, so nothing is copied; the mapping stays open while any of
+    them is alive. Returns (mapping, arrays, meta).
+    """
+    buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(buffer[:len(_MAGIC)]) != _MAGIC:
+        raise ValueError(f"{path} is not a shared store entry")
+    header_start = len(_MAGIC) + 8
+    header_length = int.from_bytes(bytes(buffer[len(_MAGIC):header_start]), "little")
+    header = json.loads(bytes(buffer[header_start:header_start + header_length]))
+    data_start = _aligned(header_start + header_length)
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        start = data_start + spec["offset"]
+        nbytes = int(np.prod(spec["shape"], dtype=np.int64)) * dtype.itemsize
+        arrays[name] = buffer[start:start + nbytes].view(dtype).reshape(spec["shape"])
+    return buffer, arrays, header["meta"]
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedStore:
+    """
+    Read-only array entries shared by every worker process on the host.
+    Each entry is one memory-mapped file; a small sqlite registry next to
+    the files tracks expiry, last access and how many mappings of each file
+    every process holds. Replaced or evicted entries stop being served at
+    once, and their file is deleted when the last holder releases it.
+    """
+
+    def __init__(self, directory: str = SHARED_STORE_DIR, max_bytes: int = SHARED_STORE_MB * 1024 * 1024,
+                 ttl: float = SHARED_STORE_TTL_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        # Releases queued by garbage collection, applied on the next call;
+        # finalizers can run while this process already holds _lock
+        self._released: collections.deque = collections.deque()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(self.directory, exist_ok=True)
+            connection = sqlite3.connect(
+                os.path.join(self.directory, "registry.db"), timeout=30,
+                check_same_thread=False, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "path TEXT PRIMARY KEY, key TEXT NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL, retired INTEGER NOT NULL DEFAULT 0)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_key ON entries (key, retired)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS holders ("
+                "path TEXT NOT NULL, pid INTEGER NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (path, pid))"
+            )
+            self._connection = connection
+        return self._connection
+
+    def _transaction(self, statements) -> list:
+        """Run (sql, params) pairs in one write transaction; returns the rows of each"""
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            results = [connection.execute(sql, params).fetchall() for sql, params in statements]
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return results
+
+    def _apply_releases(self) -> None:
+        """Apply queued releases; called with _lock held"""
+        while self._released:
+            path, pid = self._released.popleft()
+            self._transaction([
+                ("UPDATE holders SET count = count - 1 WHERE path = ? AND pid = ?", (path, pid)),
+                ("DELETE FROM holders WHERE count <= 0", ()),
+            ])
+
+    def put(self, key: str, arrays: Dict[str, np.ndarray], meta: Optional[Dict] = None,
+            ttl: Optional[float] = None) -> None:
+        """Store arrays under key, replacing any previous entry"""
+        now = time.time()
+        # A new file per version, so holders of the previous one are unaffected
+        digest = hashlib.blake2b(f"{key}\x1f{now}\x1f{os.getpid()}".encode(), digest_size=16).hexdigest()
+        path = os.path.join(self.directory, digest + ".bin")
+        with self._lock:
+            self._connect()
+            size = write_arrays(path, arrays, meta or {})
+            self._transaction([
+                ("UPDATE entries SET retired = 1 WHERE key = ?", (key,)),
+                ("INSERT INTO entries (path, key, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                 (path, key, size, now + (ttl or self.ttl), now)),
+            ])
+        self.evict()
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, np.ndarray], Dict]]:
+        """Zero-copy views of the arrays stored under key, and its meta, or None"""
+        pid = os.getpid()
+        now = time.time()
+        with self._lock:
+            self._apply_releases()
+            rows = self._transaction([
+                ("SELECT path FROM entries WHERE key = ? AND retired = 0 AND expires_at > ?", (key, now)),
+                ("UPDATE entries SET last_access = ? WHERE key = ? AND retired = 0", (now, key)),
+                ("INSERT INTO holders (path, pid, count) "
+                 "SELECT path, ?, 1 FROM entries WHERE key = ? AND retired = 0 AND expires_at > ? "
+                 "ON CONFLICT (path, pid) DO UPDATE SET count = count + 1", (pid, key, now)),
+            ])[0]
+        if not rows:
+            return None
+
+        path = rows[0][0]
+        try:
+            buffer, arrays, meta = read_arrays(path)
+        except (OSError, ValueError):
+            self._released.append((path, pid))
+            return None
+        # Released once every view into the mapping has been garbage collected
+        weakref.finalize(buffer, self._released.append, (path, pid))
+        return arrays, meta
+
+    def evict(self) -> None:
+        """
+        Retire expired entries and the least recently used entries that no
+        longer fit the byte budget, then delete retired files nobody holds
+        """
+        with self._lock:
+            self._apply_releases()
+            connection = self._connect()
+            # Holders that exited without releasing (killed workers)
+            dead = [(pid,) for pid, in connection.execute("SELECT DISTINCT pid FROM holders").fetchall() if not _alive(pid)]
+            statements = [("DELETE FROM holders WHERE pid = ?", params) for params in dead]
+            statements.append(("UPDATE entries SET retired = 1 WHERE expires_at <= ?", (time.time(),)))
+            total = 0
+            for path, size in connection.execute(
+                "SELECT path, size FROM entries WHERE retired = 0 ORDER BY last_access DESC"
+            ).fetchall():
+                if total + size > self.max_bytes:
+                    statements.append(("UPDATE entries SET retired = 1 WHERE path = ?", (path,)))
+                else:
+                    total += size
+            self._transaction(statements)
+
+            unheld = connection.execute(
+                "SELECT path FROM entries WHERE retired = 1 AND path NOT IN (SELECT path FROM holders)"
+            ).fetchall()
+            for path, in unheld:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._transaction([("DELETE FROM entries WHERE path = ?", row) for row in unheld])
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._apply_releases()
+            connection = self._connect()
+            entries, size = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE retired = 0"
+            ).fetchone()
+            retired = connection.execute("SELECT COUNT(*) FROM entries WHERE retired = 1").fetchone()[0]
+            holders = connection.execute("SELECT COALESCE(SUM(count), 0) FROM holders").fetchone()[0]
+        return {"entries": entries, "bytes": size, "retired": retired, "holders": holders}
+
+
+shared_store: Optional[SharedStore] = SharedStore() if SHARED_STORE_ENABLED else None
+
+if shared_store is not None:
+    CallbackMetric("chatlore_shared_store", "Shared store entries, bytes, retired files and mappings held", ("stat",),
+                   lambda: {(name,): value for name, value in shared_store.stats().items()})
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import re
+from functools import lru_cache
+from typing import List, Tuple
+import nltk
+from nltk.corpus import stopwords
+from nltk.stem import WordNetLemmatizer
+from app.core.cache import LRUCache
+from app.core.metrics import register_cache
+
+# Download required NLTK data
+try:
+    nltk.data.find('corpora/stopwords')
+    nltk.data.find('corpora/wordnet')
+except LookupError:
+    nltk.download('stopwords')
+    nltk.download('wordnet')
+
+# Runs of two or more letters/digits, like TfidfVectorizer's default pattern;
+# Devanagari vowel signs are kept inside the word so Hindi tokens are not
+# split apart at every matra. Punctuation always splits: "don't" gives "don"
+# (then dropped as a stopword) and "10:30" gives "10" and "30".
+TOKEN_PATTERN = re.compile(r"(?:[^\W_]|[\u0900-\u097F]){2,}")
+
+LEMMA_CACHE_SIZE = int(os.getenv("LEMMA_CACHE_SIZE", 100_000))
+TOKEN_STREAM_CACHE_SIZE = int(os.getenv("TOKEN_STREAM_CACHE_SIZE", 200_000))
+TOKEN_STREAM_CACHE_MB = int(os.getenv("TOKEN_STREAM_CACHE_MB", 128))
+
+stop_words = frozenset(stopwords.words('english'))
+_lemmatizer = WordNetLemmatizer()
+
+try:
+    _lemmatizer.lemmatize("messages")
+    _wordnet_available = True
+except LookupError:
+    # Without the WordNet corpus tokens are indexed unlemmatized
+    _wordnet_available = False
+
+def _stream_bytes(tokens: Tuple[str, ...]) -> int:
+    """Rough footprint of a cached token stream (tuple, strings and key)"""
+    return 120 + sum(50 + len(token) for token in tokens) + 8 * len(tokens)
+
+
+# Analyzed token streams keyed by a digest of the text, shared by every index build
+token_stream_cache = LRUCache(
+    maxsize=TOKEN_STREAM_CACHE_SIZE,
+    max_bytes=TOKEN_STREAM_CACHE_MB * 1024 * 1024,
+    sizeof=_stream_bytes
+)
+register_cache("token_stream", token_stream_cache)
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(token: str) -> str:
+    """Lemmatize a single lowercase token (memoized per token)"""
+    if not _wordnet_available:
+        return token
+    return _lemmatizer.lemmatize(token)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric tokens of two or more characters"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def analyze_text(text: str) -> Tuple[str, ...]:
+    """
+    Tokenize, drop stopwords and lemmatize text.
+    This is the single analysis pipeline shared by the TF-IDF index and the
+    similarity helpers, so queries and messages always produce the same terms.
+    """
+    key = text_key(text)
+    tokens = token_stream_cache.get(key)
+    if tokens is None:
+        tokens = tuple(lemmatize(token) for token in tokenize(text) if token not in stop_words)
+        token_stream_cache.set(key, tokens)
+    return tokens
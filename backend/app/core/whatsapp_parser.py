@@ -1,10 +1,11 @@
 import re
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional
 from pydantic import BaseModel
 import emoji
 import pytz
 import nltk
+from app.core.metrics import stage
 
 # Download required NLTK data
 try:
@@ -29,6 +30,76 @@ class Message(BaseModel):
     language: str = "en"  # Default to English
     is_system_message: bool = False
 
+def _lines(text: str) -> Iterator[str]:
+    """Lines of text, as text.split('\\n') would return them, without building the list"""
+    start = 0
+    while True:
+        end = text.find("\n", start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+class ChatStatistics:
+    """Chat statistics accumulated one message at a time"""
+
+    def __init__(self):
+        self.message_count = 0
+        self.media_count = 0
+        self.start: Optional[datetime] = None
+        self.end: Optional[datetime] = None
+        self.activity_by_hour: Dict[str, int] = {}
+        self.activity_by_date: Dict[str, int] = {}
+        self.participant_stats: Dict[str, Dict[str, int]] = {}
+
+    def add(self, msg: Message) -> None:
+        self.message_count += 1
+        if msg.message_type != "text":
+            self.media_count += 1
+        if self.start is None or msg.timestamp < self.start:
+            self.start = msg.timestamp
+        if self.end is None or msg.timestamp > self.end:
+            self.end = msg.timestamp
+
+        # Activity by hour and by date
+        hour = f"{msg.timestamp.hour:02d}"
+        self.activity_by_hour[hour] = self.activity_by_hour.get(hour, 0) + 1
+        date = msg.timestamp.date().isoformat()
+        self.activity_by_date[date] = self.activity_by_date.get(date, 0) + 1
+
+        # Participant statistics
+        if not msg.is_system_message:
+            participant_stats = self.participant_stats.get(msg.sender)
+            if participant_stats is None:
+                participant_stats = self.participant_stats[msg.sender] = {
+                    "message_count": 0,
+                    "media_count": 0,
+                    "urls_shared": 0
+                }
+            participant_stats["message_count"] += 1
+            if msg.message_type != "text":
+                participant_stats["media_count"] += 1
+            if msg.url:
+                participant_stats["urls_shared"] += 1
+
+    def to_dict(self) -> Dict:
+        if not self.message_count:
+            return {}
+        return {
+            "participants": list(self.participant_stats),
+            "message_count": self.message_count,
+            "total_messages": self.message_count,
+            "media_count": self.media_count,
+            "date_range": {
+                "start": str(self.start),
+                "end": str(self.end)
+            },
+            "activity_by_hour": self.activity_by_hour,
+            "activity_by_date": self.activity_by_date,
+            "participant_stats": self.participant_stats
+        }
+
 class WhatsAppParser:
     def __init__(self):
         # Regular expressions for parsing
@@ -153,23 +224,19 @@ class WhatsAppParser:
 
         return message
 
-    def parse_chat(self, chat_text: str) -> List[Message]:
-        """Parse entire WhatsApp chat export"""
-        self.messages = []
+    def iter_messages(self, chat_text: str) -> Iterator[Message]:
+        """Parse a WhatsApp chat export lazily, yielding one message at a time"""
         self.participants = set()
-        
-        # Split into lines and parse each line
-        lines = chat_text.split('\n')
         current_message = []
         
-        for line in lines:
+        for line in _lines(chat_text):
             # Check if line starts a new message
             if re.match(self.timestamp_pattern, line):
                 # Process previous message if exists
                 if current_message:
                     message = self.parse_line('\n'.join(current_message))
                     if message:
-                        self.messages.append(message)
+                        yield message
                 current_message = [line]
             else:
                 # Append to current message (handles multi-line messages)
@@ -180,10 +247,16 @@ class WhatsAppParser:
         if current_message:
             message = self.parse_line('\n'.join(current_message))
             if message:
-                self.messages.append(message)
+                yield message
+
+    def parse_chat(self, chat_text: str) -> List[Message]:
+        """Parse entire WhatsApp chat export"""
+        with stage("parse"):
+            self.messages = list(self.iter_messages(chat_text))
         
         # Update statistics
-        self._update_statistics()
+        with stage("chat_statistics"):
+            self._update_statistics()
         
         return self.messages
 
@@ -192,47 +265,10 @@ class WhatsAppParser:
         if not self.messages:
             return
 
-        # Initialize statistics
-        stats = {
-            "participants": list(self.participants),
-            "message_count": len(self.messages),
-            "media_count": sum(1 for msg in self.messages if msg.message_type != "text"),
-            "date_range": {
-                "start": str(min(msg.timestamp for msg in self.messages)),
-                "end": str(max(msg.timestamp for msg in self.messages))
-            },
-            "activity_by_hour": {},
-            "activity_by_date": {},
-            "participant_stats": {
-                participant: {
-                    "message_count": 0,
-                    "media_count": 0,
-                    "urls_shared": 0
-                }
-                for participant in self.participants
-            }
-        }
-
-        # Calculate detailed statistics
+        stats = ChatStatistics()
         for msg in self.messages:
-            # Activity by hour
-            hour = msg.timestamp.strftime("%H")
-            stats["activity_by_hour"][hour] = stats["activity_by_hour"].get(hour, 0) + 1
-
-            # Activity by date
-            date = msg.timestamp.strftime("%Y-%m-%d")
-            stats["activity_by_date"][date] = stats["activity_by_date"].get(date, 0) + 1
-
-            # Participant statistics
-            if not msg.is_system_message:
-                participant_stats = stats["participant_stats"][msg.sender]
-                participant_stats["message_count"] += 1
-                if msg.message_type != "text":
-                    participant_stats["media_count"] += 1
-                if msg.url:
-                    participant_stats["urls_shared"] += 1
-
-        self.statistics = stats
+            stats.add(msg)
+        self.statistics = stats.to_dict()
 
     def get_statistics(self) -> Dict:
         """Get chat statistics"""
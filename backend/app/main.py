@@ -1,12 +1,27 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import chat, security, search
+from fastapi.responses import ORJSONResponse, Response
+from app.api.routes import chat, jobs, security, search
+from app.core.executors import ExecutorSaturated
+from app.core.metrics import PayloadLatencyMiddleware, render_metrics
+from app.core.profiling import RequestProfilingMiddleware
+from app.services.jobs import job_queue
 import os
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background job workers run for the lifetime of the process
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+
 app = FastAPI(
     title="ChatLore API",
     description="AI-powered WhatsApp chat analysis API (Stateless)",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Get allowed origins from environment or use default
@@ -23,12 +38,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Id"],
 )
 
+# Record request latency by route and payload size
+app.add_middleware(PayloadLatencyMiddleware)
+
+# Server-Timing headers, and profiles of flagged requests when REQUEST_PROFILING_ENABLED is set
+app.add_middleware(RequestProfilingMiddleware)
+
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    # Shed load instead of queueing without bound
+    return ORJSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Include routers
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
 app.include_router(security.router, prefix="/api/security", tags=["security"])
 app.include_router(search.router, prefix="/api/search", tags=["search"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
 
 @app.get("/")
 async def root():
@@ -36,4 +68,9 @@ async def root():
         "message": "Welcome to ChatLore API (Stateless)",
         "docs_url": "/docs",
         "redoc_url": "/redoc"
-    } 
\ No newline at end of file
+    }
+
+@app.get("/metrics", response_class=Response)
+async def prometheus_metrics():
+    """Stage latencies, payload sizes, cache hit rates and LLM usage in the Prometheus text format"""
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,147 @@
+import os
+import secrets
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from pydantic import TypeAdapter
+from app.core.cache import LRUCache
+from app.core.executors import offload
+from app.core.metrics import register_cache
+from app.core.shared_store import shared_store
+from app.core.whatsapp_parser import Message
+
+CHAT_SESSION_TTL_SECONDS = int(os.getenv("CHAT_SESSION_TTL_SECONDS", 3600))
+CHAT_SESSION_CACHE_MB = int(os.getenv("CHAT_SESSION_CACHE_MB", 1024))
+CHAT_SESSION_MAX_CHATS = int(os.getenv("CHAT_SESSION_MAX_CHATS", 1000))
+
+# Approximate size of a parsed message besides its content (model instance,
+# field dict, timestamp and the short string fields)
+MESSAGE_OVERHEAD_BYTES = 600
+
+_message_list = TypeAdapter(List[Message])
+
+
+class ChatSession:
+    """A parsed chat uploaded once and referenced by chat_id afterwards"""
+
+    def __init__(self, messages: List[Message], chat_id: Optional[str] = None):
+        self.chat_id = chat_id or secrets.token_urlsafe(16)
+        self.messages = messages
+        self.created_at = time.time()
+        self.estimated_bytes = sum(sys.getsizeof(msg.content) for msg in messages) + MESSAGE_OVERHEAD_BYTES * len(messages)
+
+
+# Least recently used chats are evicted once the byte budget is exceeded
+chat_sessions = LRUCache(
+    maxsize=CHAT_SESSION_MAX_CHATS,
+    ttl=CHAT_SESSION_TTL_SECONDS,
+    max_bytes=CHAT_SESSION_CACHE_MB * 1024 * 1024,
+    sizeof=lambda session: session.estimated_bytes
+)
+register_cache("chat_session", chat_sessions)
+
+
+def _pack_strings(values: Sequence[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """UTF-8 bytes of the concatenated values and the character offset of each (None packs as "")"""
+    values = [value or "" for value in values]
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter((len(value) for value in values), dtype=np.int64, count=len(values)), out=offsets[1:])
+    return np.frombuffer("".join(values).encode(), dtype=np.uint8), offsets
+
+
+def _unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    joined = blob.tobytes().decode()
+    bounds = offsets.tolist()
+    return [joined[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def _codes(values: Sequence[str]) -> Tuple[np.ndarray, List[str]]:
+    """Dictionary encoding: one int32 code per value and the distinct values"""
+    dictionary: Dict[str, int] = {}
+    codes = np.fromiter((dictionary.setdefault(value, len(dictionary)) for value in values), dtype=np.int32, count=len(values))
+    return codes, list(dictionary)
+
+
+def messages_to_arrays(messages: Sequence[Message]) -> Optional[Tuple[Dict[str, np.ndarray], Dict]]:
+    """
+    Columnar arrays of a parsed chat for the shared store, or None when it
+    cannot be stored losslessly (timezone-aware timestamps)
+    """
+    if any(msg.timestamp.tzinfo is not None for msg in messages):
+        return None
+    arrays: Dict[str, np.ndarray] = {
+        "timestamp": np.array([msg.timestamp for msg in messages], dtype="datetime64[us]"),
+        "is_system_message": np.fromiter((msg.is_system_message for msg in messages), dtype=bool, count=len(messages)),
+    }
+    meta: Dict[str, List[str]] = {}
+    for field in ("sender", "message_type", "language"):
+        arrays[field], meta[field] = _codes([getattr(msg, field) for msg in messages])
+    for field in ("content", "duration", "url"):
+        values = [getattr(msg, field) for msg in messages]
+        arrays[field], arrays[f"{field}_offsets"] = _pack_strings(values)
+        if field != "content":
+            arrays[f"{field}_present"] = np.fromiter((value is not None for value in values), dtype=bool, count=len(values))
+    return arrays, meta
+
+
+def messages_from_arrays(arrays: Dict[str, np.ndarray], meta: Dict) -> List[Message]:
+    """
+    Rebuild the Message list from stored arrays. This decodes and copies
+    every column into new objects; the views themselves are not kept.
+    """
+    columns = {
+        "timestamp": arrays["timestamp"].tolist(),
+        "is_system_message": arrays["is_system_message"].tolist(),
+    }
+    for field in ("sender", "message_type", "language"):
+        dictionary = meta[field]
+        columns[field] = [dictionary[code] for code in arrays[field].tolist()]
+    for field in ("content", "duration", "url"):
+        values = _unpack_strings(arrays[field], arrays[f"{field}_offsets"])
+        if field != "content":
+            values = [value if present else None for value, present in zip(values, arrays[f"{field}_present"].tolist())]
+        columns[field] = values
+    names = list(columns)
+    return _message_list.validate_python([dict(zip(names, row)) for row in zip(*columns.values())])
+
+
+def create_session(messages: List[Message]) -> ChatSession:
+    session = ChatSession(messages)
+    chat_sessions.set(session.chat_id, session)
+    if shared_store is not None:
+        # Other workers can resolve this chat_id from the store, though each
+        # rebuilds its own Message list from the columns
+        stored = messages_to_arrays(messages)
+        if stored is not None:
+            shared_store.put(f"chat:{session.chat_id}", *stored, ttl=CHAT_SESSION_TTL_SECONDS)
+    return session
+
+
+def _load_shared_session(chat_id: str) -> Optional[ChatSession]:
+    """
+    Materialize a chat another worker stored, caching it locally. Only the
+    columnar bytes are shared; the Message objects (and any TF-IDF index
+    fitted over them) belong to this worker.
+    """
+    stored = shared_store.get(f"chat:{chat_id}")
+    if stored is None:
+        return None
+    session = ChatSession(messages_from_arrays(*stored), chat_id=chat_id)
+    chat_sessions.set(chat_id, session)
+    return session
+
+
+def get_session(chat_id: str) -> Optional[ChatSession]:
+    session = chat_sessions.get(chat_id)
+    if session is None and shared_store is not None:
+        session = _load_shared_session(chat_id)
+    return session
+
+
+async def load_session(chat_id: str) -> Optional[ChatSession]:
+    """get_session for the event loop: rebuilding the messages of a shared chat runs on the parsing pool"""
+    session = chat_sessions.get(chat_id)
+    if session is None and shared_store is not None:
+        session = await offload("parsing", _load_shared_session, chat_id)
+    return session
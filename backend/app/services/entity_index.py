@@ -0,0 +1,106 @@
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+_NON_DIGITS = re.compile(r"\D")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_entity(data_type: str, value: str) -> str:
+    """
+    Canonical form of a detected value, so every spelling of the same
+    entity shares one index key
+    """
+    if data_type in ("phone", "credit_card"):
+        # "(555) 123-4567" and "555.123.4567" are the same number
+        return _NON_DIGITS.sub("", value)
+    if data_type in ("email", "url"):
+        return value.lower()
+    if data_type == "date":
+        return value.replace("-", "/")
+    # address, location: case and spacing differences only
+    return _WHITESPACE.sub(" ", value).strip(" ,").casefold()
+
+
+class SensitiveEntity:
+    """One normalized entity and every place it was exposed"""
+
+    __slots__ = ("type", "value", "variants", "occurrences")
+
+    def __init__(self, data_type: str, value: str):
+        self.type = data_type
+        self.value = value
+        # Raw spellings in first-seen order
+        self.variants: Dict[str, None] = {}
+        # (message index, sender, timestamp), one per exposure
+        self.occurrences: List[Tuple[int, str, datetime]] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.occurrences)
+
+    def summary(self) -> Dict:
+        senders: Dict[str, int] = {}
+        for _, sender, _ in self.occurrences:
+            senders[sender] = senders.get(sender, 0) + 1
+        timestamps = [timestamp for _, _, timestamp in self.occurrences]
+        return {
+            "type": self.type,
+            "value": self.value,
+            "variants": list(self.variants),
+            "count": self.count,
+            "message_count": len({idx for idx, _, _ in self.occurrences}),
+            "senders": senders,
+            "first_seen": min(timestamps),
+            "last_seen": max(timestamps),
+        }
+
+    def detail(self) -> Dict:
+        return {
+            **self.summary(),
+            "occurrences": [
+                {"message_index": idx, "sender": sender, "timestamp": timestamp}
+                for idx, sender, timestamp in self.occurrences
+            ]
+        }
+
+
+class EntityIndex:
+    """
+    Inverted index from normalized (type, value) to the messages exposing it.
+    Fed from SecurityReport entries, so building it never rescans a chat, and
+    it only consumes entries added since the last update.
+    """
+
+    def __init__(self):
+        self.entities: Dict[Tuple[str, str], SensitiveEntity] = {}
+        self._consumed = 0
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def update(self, entries: Sequence[tuple]) -> "EntityIndex":
+        """Index the (message index, message, spans, risk level) entries not seen yet"""
+        for idx, msg, spans, _ in entries[self._consumed:]:
+            for span in spans:
+                key = (span.type, normalize_entity(span.type, span.value))
+                entity = self.entities.get(key)
+                if entity is None:
+                    entity = self.entities[key] = SensitiveEntity(*key)
+                entity.variants[span.value] = None
+                entity.occurrences.append((idx, msg.sender, msg.timestamp))
+        self._consumed = len(entries)
+        return self
+
+    def lookup(self, data_type: str, value: str) -> Optional[SensitiveEntity]:
+        """The entity for a raw or normalized value, or None"""
+        return self.entities.get((data_type, normalize_entity(data_type, value)))
+
+    def top(self, data_type: Optional[str] = None, min_count: int = 1) -> List[SensitiveEntity]:
+        """Entities by exposure count, most exposed first"""
+        entities = [
+            entity for entity in self.entities.values()
+            if (data_type is None or entity.type == data_type) and entity.count >= min_count
+        ]
+        entities.sort(key=lambda entity: -entity.count)
+        return entities
@@ -0,0 +1,101 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from app.core.whatsapp_parser import Message
+
+
+def to_datetime64(value: datetime) -> np.datetime64:
+    """Convert a (possibly timezone-aware) datetime to a naive UTC datetime64"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(value, "us")
+
+
+class FacetIndex:
+    """
+    Columnar filter index over a message list.
+    Senders and message types are dictionary-encoded, with one boolean
+    bitmap per value (built on first use); timestamps are kept as a
+    datetime64 column for range masks.
+    """
+
+    def __init__(self, messages: Sequence[Message]):
+        self.size = len(messages)
+        self.sender_values, self.sender_codes = self._encode([msg.sender for msg in messages])
+        self.type_values, self.type_codes = self._encode([msg.message_type for msg in messages])
+        self.timestamps = np.array([to_datetime64(msg.timestamp) for msg in messages], dtype="datetime64[us]")
+        # Chats are almost always chronological; then date ranges are a binary search
+        self.timestamps_sorted = bool(np.all(self.timestamps[1:] >= self.timestamps[:-1]))
+        self._bitmaps: Dict[tuple, np.ndarray] = {}
+
+    @staticmethod
+    def _encode(values: List[str]):
+        lookup: Dict[str, int] = {}
+        codes = np.fromiter((lookup.setdefault(v, len(lookup)) for v in values), dtype=np.int32, count=len(values))
+        return list(lookup), codes
+
+    def _bitmap(self, column: str, value: str) -> np.ndarray:
+        key = (column, value)
+        bitmap = self._bitmaps.get(key)
+        if bitmap is None:
+            values, codes = (
+                (self.sender_values, self.sender_codes) if column == "sender"
+                else (self.type_values, self.type_codes)
+            )
+            if value in values:
+                bitmap = codes == values.index(value)
+            else:
+                bitmap = np.zeros(self.size, dtype=bool)
+            self._bitmaps[key] = bitmap
+        return bitmap
+
+    def _union(self, column: str, values: Sequence[str]) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        for value in values:
+            mask |= self._bitmap(column, value)
+        return mask
+
+    def mask(
+        self,
+        senders: Optional[Sequence[str]] = None,
+        message_types: Optional[Sequence[str]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Optional[np.ndarray]:
+        """
+        Boolean mask of messages matching every given predicate,
+        or None when no filter is set
+        """
+        mask = None
+        if senders:
+            mask = self._union("sender", senders)
+        if message_types:
+            type_mask = self._union("type", message_types)
+            mask = type_mask if mask is None else mask & type_mask
+
+        if start_date is not None or end_date is not None:
+            if self.timestamps_sorted:
+                lo = 0 if start_date is None else np.searchsorted(self.timestamps, to_datetime64(start_date), "left")
+                hi = self.size if end_date is None else np.searchsorted(self.timestamps, to_datetime64(end_date), "right")
+                range_mask = np.zeros(self.size, dtype=bool)
+                range_mask[lo:hi] = True
+            else:
+                range_mask = np.ones(self.size, dtype=bool)
+                if start_date is not None:
+                    range_mask &= self.timestamps >= to_datetime64(start_date)
+                if end_date is not None:
+                    range_mask &= self.timestamps <= to_datetime64(end_date)
+            mask = range_mask if mask is None else mask & range_mask
+
+        return mask
+
+    def facets(self, indices: np.ndarray) -> Dict[str, Dict[str, int]]:
+        """Per-sender, per-type and per-month counts over the given message indices"""
+        sender_counts = np.bincount(self.sender_codes[indices], minlength=len(self.sender_values))
+        type_counts = np.bincount(self.type_codes[indices], minlength=len(self.type_values))
+        months, month_counts = np.unique(self.timestamps[indices].astype("datetime64[M]"), return_counts=True)
+        return {
+            "senders": {v: int(c) for v, c in zip(self.sender_values, sender_counts) if c},
+            "message_types": {v: int(c) for v, c in zip(self.type_values, type_counts) if c},
+            "months": {str(m): int(c) for m, c in zip(months, month_counts)}
+        }
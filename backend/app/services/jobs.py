@@ -0,0 +1,286 @@
+import asyncio
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from app.core.executors import ExecutorSaturated
+
+JOBS_DB = os.getenv("JOBS_DB", os.path.join("data", "jobs.db"))
+# Jobs run concurrently per process; their CPU-bound steps still go through the workload executors
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+# Finished jobs (and their results) are kept this long
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", 24 * 3600))
+# How often idle workers look for jobs submitted by other processes
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 1.0))
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation was requested"""
+
+
+class JobContext:
+    """Handed to a job handler for reporting progress and partial results"""
+
+    def __init__(self, queue: "JobQueue", job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+
+    async def progress(self, percent: float, message: Optional[str] = None, partial: Any = None) -> None:
+        """
+        Record progress (0-100) and, optionally, a JSON-serializable partial
+        result. Raises JobCancelled when the job was cancelled meanwhile, so
+        handlers stop at their next checkpoint.
+        """
+        if await asyncio.to_thread(self.queue._update_progress, self.job_id, percent, message, partial):
+            raise JobCancelled(self.job_id)
+
+
+# kind -> async handler(context, params, payload) returning the JSON-serializable result
+JobHandler = Callable[[JobContext, Dict, bytes], Awaitable[Any]]
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobQueue:
+    """
+    Persistent queue of background analyses in a local sqlite database.
+    Each process runs JOB_WORKERS asyncio workers that claim queued jobs;
+    jobs left running by a process that died are queued again on startup.
+    The sqlite calls block (a claim may wait on another process's write
+    lock), so the async methods run them in threads.
+    """
+
+    def __init__(self, path: str = JOBS_DB):
+        self.path = path
+        self.handlers: Dict[str, JobHandler] = {}
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._workers: list = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def handler(self, kind: str) -> Callable[[JobHandler], JobHandler]:
+        """Register the handler for a job kind"""
+        def register(func: JobHandler) -> JobHandler:
+            self.handlers[kind] = func
+            return func
+        return register
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, params TEXT NOT NULL, "
+                "payload BLOB, progress REAL NOT NULL DEFAULT 0, message TEXT, partial_result TEXT, "
+                "result TEXT, error TEXT, cancel_requested INTEGER NOT NULL DEFAULT 0, worker_pid INTEGER, "
+                "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, created_at)")
+            self._connection = connection
+        return self._connection
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    async def submit(self, kind: str, params: Dict, payload: bytes) -> Dict:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = secrets.token_urlsafe(12)
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO jobs (id, kind, status, params, payload, created_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+            (job_id, kind, json.dumps(params), payload, time.time())
+        )
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return await self.get(job_id)
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    def _get(self, job_id: str) -> Optional[Dict]:
+        rows = self._execute(
+            "SELECT id, kind, status, progress, message, partial_result, result, error, "
+            "created_at, started_at, finished_at FROM jobs WHERE id = ?", (job_id,)
+        )
+        if not rows:
+            return None
+        (job_id, kind, status, progress, message, partial, result, error,
+         created_at, started_at, finished_at) = rows[0]
+        return {
+            "job_id": job_id,
+            "kind": kind,
+            "status": status,
+            "progress": round(progress, 1),
+            "message": message,
+            "partial_result": json.loads(partial) if partial else None,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+        }
+
+    async def cancel(self, job_id: str) -> Optional[Dict]:
+        """Cancel a queued job at once; ask a running one to stop at its next checkpoint"""
+        await asyncio.to_thread(self._request_cancel, job_id)
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        return await self.get(job_id)
+
+    def _request_cancel(self, job_id: str) -> None:
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, payload = NULL "
+                "WHERE id = ? AND status = 'queued'", (now, job_id)
+            )
+            connection.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+
+    def _update_progress(self, job_id: str, percent: float, message: Optional[str], partial: Any) -> bool:
+        """Store progress; returns whether cancellation was requested"""
+        assignments = "progress = ?" + (", message = ?" if message is not None else "")
+        params = [max(0.0, min(100.0, percent))] + ([message] if message is not None else [])
+        if partial is not None:
+            assignments += ", partial_result = ?"
+            params.append(json.dumps(partial))
+        with self._lock:
+            connection = self._connect()
+            connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*params, job_id))
+            row = connection.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        rows = self._execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,))
+        return bool(rows and rows[0][0])
+
+    def _claim(self) -> Optional[tuple]:
+        """Atomically move the oldest queued job to running; returns (id, kind, params, payload)"""
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT id, kind, params, payload FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    connection.execute(
+                        "UPDATE jobs SET status = 'running', worker_pid = ?, started_at = ? WHERE id = ?",
+                        (os.getpid(), time.time(), row[0])
+                    )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return row
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, payload = NULL, "
+            "progress = CASE WHEN ? = 'succeeded' THEN 100 ELSE progress END WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, time.time(), status, job_id)
+        )
+
+    def _requeue(self, job_id: str) -> None:
+        self._execute(
+            "UPDATE jobs SET status = 'queued', worker_pid = NULL, started_at = NULL WHERE id = ? AND status = 'running'",
+            (job_id,)
+        )
+
+    def recover(self) -> None:
+        """Queue again the jobs of dead processes and drop expired finished jobs"""
+        for job_id, pid in self._execute("SELECT id, worker_pid FROM jobs WHERE status = 'running'"):
+            if pid is None or pid == os.getpid() or not _alive(pid):
+                self._requeue(job_id)
+        self._execute(
+            f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED_STATUSES))}) AND finished_at < ?",
+            (*FINISHED_STATUSES, time.time() - JOB_RETENTION_SECONDS)
+        )
+
+    async def _run(self, job_id: str, kind: str, params: Dict, payload: bytes) -> None:
+        handler = self.handlers.get(kind)
+        if handler is None:
+            await asyncio.to_thread(self._finish, job_id, "failed", error=f"Unknown job kind: {kind}")
+            return
+        try:
+            result = await handler(JobContext(self, job_id), params, payload)
+        except (JobCancelled, asyncio.CancelledError):
+            if not await asyncio.to_thread(self._cancel_requested, job_id):
+                # Shutting down rather than cancelled: leave it for the next start
+                await asyncio.to_thread(self._requeue, job_id)
+                raise
+            await asyncio.to_thread(self._finish, job_id, "cancelled")
+        except ExecutorSaturated as e:
+            await asyncio.to_thread(self._requeue, job_id)
+            await asyncio.sleep(e.retry_after)
+        except Exception as e:
+            await asyncio.to_thread(self._finish, job_id, "failed", error=str(e) or type(e).__name__)
+        else:
+            await asyncio.to_thread(self._finish, job_id, "succeeded", result=result)
+
+    async def _worker(self) -> None:
+        while True:
+            claim = asyncio.ensure_future(asyncio.to_thread(self._claim))
+            try:
+                job = await asyncio.shield(claim)
+            except asyncio.CancelledError:
+                # Shutting down mid-claim: hand a claimed job back to the queue
+                job = await claim
+                if job is not None:
+                    await asyncio.to_thread(self._requeue, job[0])
+                raise
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            job_id, kind, params, payload = job
+            task = asyncio.ensure_future(self._run(job_id, kind, json.loads(params), payload))
+            self._running[job_id] = task
+            try:
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.done():
+                    # Worker shutdown: stop the job too
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    raise
+            finally:
+                self._running.pop(job_id, None)
+
+    async def start(self, workers: int = JOB_WORKERS) -> None:
+        await asyncio.to_thread(self.recover)
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(workers)]
+
+    async def stop(self) -> None:
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+job_queue = JobQueue()
@@ -0,0 +1,173 @@
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from app.services.ngram_index import normalize
+
+# 64 hash permutations split into 32 bands of 2 rows. A pair with Jaccard
+# similarity s shares at least one band with probability 1 - (1 - s^2)^32,
+# which is ~0.95 at s = 0.3 (the default min_similarity for /similar)
+NUM_PERM = 64
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_rng = np.random.RandomState(1)
+# a, b < 2^32 and shingle hashes < 2^32, so a * h + b never overflows uint64
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_ROLLING_BASE = np.uint64(1_000_003)
+_BAND_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+# Messages per vectorized signature batch
+_BATCH_SIZE = 20_000
+
+
+def _shingle_hashes(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    32-bit rolling hashes of every character shingle of every text, computed
+    over the concatenated code points in one vectorized pass.
+    Returns (hashes, start offset of each text's hashes).
+    """
+    # Pad short texts so every text has at least one shingle
+    texts = [text.ljust(SHINGLE_SIZE, "\0") for text in texts]
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    codepoints = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+
+    n_windows = len(codepoints) - SHINGLE_SIZE + 1
+    hashes = np.zeros(n_windows, dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        hashes = (hashes * _ROLLING_BASE + codepoints[offset:offset + n_windows]) & _MAX_HASH
+
+    # Keep only windows that don't cross a text boundary
+    text_ids = np.repeat(np.arange(len(texts)), lengths)
+    valid = text_ids[:n_windows] == text_ids[SHINGLE_SIZE - 1:]
+    hashes = hashes[valid]
+    counts = lengths - SHINGLE_SIZE + 1
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return hashes, starts
+
+
+def compute_signatures(texts: Sequence[str]) -> np.ndarray:
+    """MinHash signatures (len(texts) x NUM_PERM) of normalized texts"""
+    signatures = np.empty((len(texts), NUM_PERM), dtype=np.uint64)
+    for batch_start in range(0, len(texts), _BATCH_SIZE):
+        batch = texts[batch_start:batch_start + _BATCH_SIZE]
+        hashes, starts = _shingle_hashes(batch)
+        for perm in range(NUM_PERM):
+            permuted = (_PERM_A[perm] * hashes + _PERM_B[perm]) % _MERSENNE_PRIME
+            signatures[batch_start:batch_start + len(batch), perm] = np.minimum.reduceat(permuted, starts)
+    return signatures
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """One uint64 bucket key per (row, band)"""
+    banded = signatures.reshape(len(signatures), BANDS, ROWS)
+    keys = np.zeros((len(signatures), BANDS), dtype=np.uint64)
+    for row in range(ROWS):
+        keys = keys * _BAND_MIX + banded[:, :, row]
+    return keys
+
+
+class MinHashIndex:
+    """
+    MinHash signatures with LSH banding over character shingles.
+    Each band keeps its bucket keys sorted, so finding a query's buckets is a
+    binary search per band instead of a scan over all messages.
+    """
+
+    # Everything the index needs, as arrays (see to_arrays)
+    ARRAYS = ("message_indices", "text_lengths", "signatures", "band_rows", "band_sorted_keys")
+
+    def __init__(self, texts: Sequence[str], message_indices: Sequence[int]):
+        texts = [normalize(text) for text in texts]
+        self.message_indices = np.asarray(message_indices, dtype=np.int64)
+        self.text_lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+        self.signatures = compute_signatures(texts)
+
+        keys = band_keys(self.signatures)
+        # Per band: rows sorted by bucket key, plus the sorted keys themselves
+        self.band_rows = np.argsort(keys, axis=0, kind="stable").T
+        self.band_sorted_keys = np.take_along_axis(keys, self.band_rows.T, axis=0).T
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "MinHashIndex":
+        """An index over existing arrays (e.g. shared memory views), without copying them"""
+        index = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(index, name, arrays[name])
+        return index
+
+    def __len__(self) -> int:
+        return len(self.message_indices)
+
+    def _bucket(self, band: int, key: np.uint64) -> np.ndarray:
+        sorted_keys = self.band_sorted_keys[band]
+        lo = np.searchsorted(sorted_keys, key, "left")
+        hi = np.searchsorted(sorted_keys, key, "right")
+        return self.band_rows[band, lo:hi]
+
+    def query(self, text: str, min_similarity: float = 0.3) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows whose estimated Jaccard similarity to text is at least
+        min_similarity. Returns (rows, similarities), best first.
+        """
+        if not len(self):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        signature = compute_signatures([normalize(text)])
+        keys = band_keys(signature)[0]
+        buckets = [self._bucket(band, keys[band]) for band in range(BANDS)]
+        candidates = np.unique(np.concatenate(buckets))
+        if not len(candidates):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        similarities = np.mean(self.signatures[candidates] == signature[0], axis=1)
+        keep = similarities >= min_similarity
+        rows, similarities = candidates[keep], similarities[keep]
+        order = np.lexsort((rows, -similarities))
+        return rows[order], similarities[order]
+
+    def duplicate_groups(self, min_similarity: float = 0.8, min_length: int = 20) -> List[List[int]]:
+        """
+        Groups of near-duplicate rows (forwards, repeated pastes), largest first.
+        Rows sharing an LSH bucket are joined when their estimated similarity
+        to the bucket's first row reaches min_similarity.
+        """
+        parent = np.arange(len(self))
+
+        def find(row: int) -> int:
+            while parent[row] != row:
+                parent[row] = parent[parent[row]]
+                row = parent[row]
+            return row
+
+        eligible = self.text_lengths >= min_length
+        for band in range(BANDS):
+            rows = self.band_rows[band]
+            keys = self.band_sorted_keys[band]
+            # Bucket boundaries in the sorted key array; singletons are skipped
+            boundaries = np.flatnonzero(np.diff(keys)) + 1
+            starts = np.concatenate(([0], boundaries))
+            ends = np.concatenate((boundaries, [len(keys)]))
+            for bucket_index in np.flatnonzero(ends - starts > 1):
+                bucket = rows[starts[bucket_index]:ends[bucket_index]]
+                bucket = bucket[eligible[bucket]]
+                if len(bucket) < 2:
+                    continue
+                head = bucket[0]
+                similar = np.mean(self.signatures[bucket[1:]] == self.signatures[head], axis=1) >= min_similarity
+                root = find(head)
+                for row in bucket[1:][similar]:
+                    other = find(row)
+                    if other != root:
+                        parent[other] = root
+
+        groups: Dict[int, List[int]] = {}
+        for row in np.flatnonzero(eligible):
+            groups.setdefault(find(row), []).append(int(row))
+        result = [rows for rows in groups.values() if len(rows) > 1]
+        result.sort(key=lambda rows: (-len(rows), rows[0]))
+        return result
@@ -0,0 +1,151 @@
+import re
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Fuzzy candidates verified with edit distance per round (see fuzzy_search)
+MAX_FUZZY_CANDIDATES = 500
+
+
+def normalize(text: str) -> str:
+    """Lowercase and collapse whitespace so trigrams are comparable"""
+    return _WHITESPACE.sub(" ", text.lower()).strip()
+
+
+def trigrams(text: str) -> Set[str]:
+    """Distinct character trigrams of an already normalized text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def substring_edit_distance(pattern: str, text: str) -> int:
+    """
+    Smallest edit distance between pattern and any substring of text
+    (Sellers' algorithm: free start and end positions in text)
+    """
+    if pattern in text:
+        return 0
+    m = len(pattern)
+    previous = list(range(m + 1))
+    best = m
+    for ch in text:
+        current = [0]
+        for i in range(1, m + 1):
+            cost = 0 if pattern[i - 1] == ch else 1
+            current.append(min(previous[i - 1] + cost, previous[i] + 1, current[i - 1] + 1))
+        if current[m] < best:
+            best = current[m]
+        previous = current
+    return best
+
+
+class TrigramIndex:
+    """Inverted index from character trigrams to rows, for substring and typo-tolerant search"""
+
+    def __init__(self, texts: Sequence[str]):
+        self.texts: List[str] = [normalize(text) for text in texts]
+
+        postings: Dict[str, List[int]] = {}
+        for row, text in enumerate(self.texts):
+            for gram in trigrams(text):
+                postings.setdefault(gram, []).append(row)
+        # Rows are appended in order, so every posting list is sorted and unique
+        self.postings: Dict[str, np.ndarray] = {
+            gram: np.asarray(rows, dtype=np.int32) for gram, rows in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def substring_search(self, query: str, row_mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Rows containing query as a case-insensitive substring, in row order.
+        row_mask restricts the search to rows where it is True.
+        """
+        query = normalize(query)
+        if not query:
+            return np.empty(0, dtype=np.int64)
+
+        grams = trigrams(query)
+        if grams:
+            # Intersect posting lists, rarest first
+            posting_lists = []
+            for gram in grams:
+                rows = self.postings.get(gram)
+                if rows is None:
+                    return np.empty(0, dtype=np.int64)
+                posting_lists.append(rows)
+            posting_lists.sort(key=len)
+            candidates = posting_lists[0]
+            for rows in posting_lists[1:]:
+                candidates = np.intersect1d(candidates, rows, assume_unique=True)
+                if not len(candidates):
+                    break
+        else:
+            # Queries shorter than a trigram can only be checked directly
+            candidates = np.arange(len(self.texts))
+
+        if row_mask is not None:
+            candidates = candidates[row_mask[candidates]]
+
+        # Trigram overlap is necessary but not sufficient - verify each candidate
+        return np.asarray([row for row in candidates if query in self.texts[row]], dtype=np.int64)
+
+    def fuzzy_search(
+        self,
+        query: str,
+        min_similarity: float = 0.3,
+        row_mask: Optional[np.ndarray] = None,
+        limit: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray, bool]:
+        """
+        Rows approximately containing query, with similarity
+        1 - edit_distance / len(query). Returns (rows, similarities, truncated),
+        unsorted.
+        Candidates are verified with edit distance in rounds of
+        MAX_FUZZY_CANDIDATES, most shared trigrams first. With a limit, rounds
+        continue until no unverified candidate can enter the best limit
+        matches; without one, only the first round is verified and truncated
+        tells whether candidates were left unverified.
+        """
+        query = normalize(query)
+        grams = trigrams(query)
+        if not grams:
+            rows = self.substring_search(query, row_mask)
+            return rows, np.ones(len(rows)), False
+
+        posting_lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not posting_lists:
+            return np.empty(0, dtype=np.int64), np.empty(0), False
+
+        # Number of query trigrams each row shares
+        overlap = np.bincount(np.concatenate(posting_lists), minlength=len(self.texts))
+        if row_mask is not None:
+            overlap[~row_mask] = 0
+
+        # Each edit destroys at most three query trigrams, so a match within
+        # max_edits must still share this many (q-gram lemma)
+        max_edits = int((1 - min_similarity) * len(query))
+        min_overlap = max(1, len(grams) - 3 * max_edits)
+        candidates = np.flatnonzero(overlap >= min_overlap)
+        candidates = candidates[np.argsort(-overlap[candidates], kind="stable")]
+        # The same lemma bounds the similarity of each candidate from above
+        # (non-increasing along candidates)
+        bounds = 1 - np.ceil((len(grams) - overlap[candidates]) / 3) / len(query)
+
+        rows = []
+        similarities = []
+        verified = 0
+        while verified < len(candidates):
+            if verified and (limit is None or (
+                    len(similarities) >= limit and np.partition(similarities, -limit)[-limit] > bounds[verified])):
+                break
+            for row in candidates[verified:verified + MAX_FUZZY_CANDIDATES]:
+                distance = substring_edit_distance(query, self.texts[row])
+                similarity = 1 - distance / len(query)
+                if similarity >= min_similarity:
+                    rows.append(row)
+                    similarities.append(similarity)
+            verified += MAX_FUZZY_CANDIDATES
+        truncated = limit is None and verified < len(candidates)
+        return np.asarray(rows, dtype=np.int64), np.asarray(similarities), truncated
@@ -1,13 +1,26 @@
-from typing import List, Dict, Optional
+from collections import Counter
+from typing import List, Dict, Optional, Tuple
 import google.generativeai as genai
 from google.generativeai.types import GenerateContentResponse
 from app.core.whatsapp_parser import Message
+from app.core.text_analysis import analyze_text
+from app.core.cache import LRUCache, fingerprint_messages
+from app.core.executors import offload
+from app.core.metrics import llm_duration, llm_tokens, register_cache, stage
+from app.core.shared_store import shared_store
+from app.services.ngram_index import TrigramIndex
+from app.services.facet_index import FacetIndex
+from app.services.minhash_index import MinHashIndex
 from datetime import datetime, timedelta
 import numpy as np
+from scipy.sparse import csr_matrix
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.feature_extraction.text import TfidfVectorizer
 import os
 from dotenv import load_dotenv
+import base64
+import binascii
+import secrets
 import time
 import random
 
@@ -18,6 +31,23 @@ print(os.getenv("GEMINI_API_KEY"))
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 model = genai.GenerativeModel('gemini-1.5-flash')
 
+
+async def _generate(operation: str, prompt: str) -> GenerateContentResponse:
+    """Call Gemini, recording latency and token usage for /metrics"""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        response = await model.generate_content_async(prompt)
+        outcome = "success"
+    finally:
+        llm_duration.observe(time.perf_counter() - started, operation, outcome)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        llm_tokens.inc(operation, "prompt", amount=getattr(usage, "prompt_token_count", 0) or 0)
+        llm_tokens.inc(operation, "completion", amount=getattr(usage, "candidates_token_count", 0) or 0)
+    return response
+
+
 class SearchResult:
     def __init__(self, message: Message, similarity: float, context: Dict[str, List[str]], explanation: str = ""):
         self.message = message
@@ -25,37 +55,148 @@ class SearchResult:
         self.context = context
         self.explanation = explanation
 
+class RankedResults:
+    """A full ranking for one query, kept so later pages can be sliced from it"""
+    def __init__(self, messages: List[Message], query: str, indices: np.ndarray, scores: np.ndarray):
+        self.messages = messages
+        self.query = query
+        self.indices = indices
+        self.scores = scores
+        # Sender/type/month counts over the whole ranking (filtered searches only)
+        self.facets: Dict[str, Dict[str, int]] = {}
+        # Set when a fuzzy search left candidates unverified (see TrigramIndex.fuzzy_search)
+        self.truncated = False
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def estimated_bytes(self) -> int:
+        """Rough memory footprint, used to cap the ranking cache"""
+        # The message list is usually shared with the caller, but once the
+        # request is gone the cache is what keeps it alive
+        message_bytes = sum(len(msg.content) + 200 for msg in self.messages)
+        return self.indices.nbytes + self.scores.nbytes + message_bytes
+
+
+# Full rankings behind search cursors
+SEARCH_CURSOR_TTL_SECONDS = int(os.getenv("SEARCH_CURSOR_TTL_SECONDS", 600))
+SEARCH_CURSOR_CACHE_MB = int(os.getenv("SEARCH_CURSOR_CACHE_MB", 256))
+ranking_cache = LRUCache(
+    maxsize=1000,
+    ttl=SEARCH_CURSOR_TTL_SECONDS,
+    max_bytes=SEARCH_CURSOR_CACHE_MB * 1024 * 1024,
+    sizeof=RankedResults.estimated_bytes
+)
+
+
+# MinHash/LSH indexes are built once per chat (keyed by content fingerprint)
+minhash_index_cache = LRUCache(maxsize=int(os.getenv("MINHASH_INDEX_CACHE_SIZE", 16)))
+register_cache("search_ranking", ranking_cache)
+register_cache("minhash_index", minhash_index_cache)
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a search cursor is malformed or its ranking has expired"""
+
+
+def encode_cursor(ranking_id: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{ranking_id}:{offset}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        ranking_id, offset = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return ranking_id, int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursorError("Malformed search cursor") from e
+
+
 class SearchService:
     def __init__(self):
         self.messages: List[Message] = []
-        self.embeddings: Dict[int, np.ndarray] = {}
+        # One sparse TF-IDF row per text message, rows are L2-normalized
+        self.tfidf_matrix: Optional[csr_matrix] = None
+        self.row_message_indices: np.ndarray = np.empty(0, dtype=np.int64)
         self.last_query_embedding: Optional[np.ndarray] = None
         self.vectorizer: Optional[TfidfVectorizer] = None
-
-    async def initialize(self, messages: List[Message]):
-        """Initialize the search service with messages"""
+        # Character trigram index for fuzzy/substring modes, built on first use
+        self.ngram_index: Optional[TrigramIndex] = None
+        self.ngram_message_indices: np.ndarray = np.empty(0, dtype=np.int64)
+        # Sender/type/date bitmaps, built on first use
+        self.facet_index: Optional[FacetIndex] = None
+        # Near-duplicate index, shared between requests for the same chat
+        self.minhash_index: Optional[MinHashIndex] = None
+
+    async def initialize(self, messages: List[Message], build_tfidf: bool = True):
+        """
+        Initialize the search service with messages.
+        Fuzzy and substring searches don't need the TF-IDF index, so callers
+        that only use those modes can skip building it.
+        """
         self.messages = messages
-        # Generate embeddings for all messages
-        await self._generate_embeddings()
+        if build_tfidf:
+            # Generate embeddings for all messages
+            await self._generate_embeddings()
+
+    def _get_facet_index(self) -> FacetIndex:
+        if self.facet_index is None:
+            self.facet_index = FacetIndex(self.messages)
+        return self.facet_index
+
+    def _get_minhash_index(self) -> MinHashIndex:
+        """Get the chat's MinHash/LSH index, building it only the first time the chat is seen"""
+        if self.minhash_index is None:
+            key = fingerprint_messages(self.messages)
+            index = minhash_index_cache.get(key)
+            if index is None and shared_store is not None:
+                # Built by another worker: map its arrays instead of rebuilding
+                stored = shared_store.get(f"minhash:{key}")
+                if stored is not None:
+                    index = MinHashIndex.from_arrays(stored[0])
+            if index is None:
+                indices = [i for i, msg in enumerate(self.messages) if msg.message_type == "text"]
+                with stage("minhash_build"):
+                    index = MinHashIndex([self.messages[i].content for i in indices], indices)
+                if shared_store is not None:
+                    shared_store.put(f"minhash:{key}", index.to_arrays())
+            minhash_index_cache.set(key, index)
+            self.minhash_index = index
+        return self.minhash_index
+
+    def _get_ngram_index(self) -> TrigramIndex:
+        """Build the trigram index over text messages on first use"""
+        if self.ngram_index is None:
+            indices = [i for i, msg in enumerate(self.messages) if msg.message_type == "text"]
+            self.ngram_index = TrigramIndex([self.messages[i].content for i in indices])
+            self.ngram_message_indices = np.asarray(indices, dtype=np.int64)
+        return self.ngram_index
 
     async def _generate_embeddings(self):
         """Generate embeddings for all messages using TF-IDF"""
+        # Fitting is CPU-bound; keep it off the event loop
+        await offload("search", self._fit_embeddings)
+
+    def _fit_embeddings(self):
         # Get all text messages
-        texts = [msg.content for msg in self.messages if msg.message_type == "text"]
+        row_message_indices = [i for i, msg in enumerate(self.messages) if msg.message_type == "text"]
+        texts = [self.messages[i].content for i in row_message_indices]
         
         if not texts:
             return
         
-        # Create and fit TF-IDF vectorizer
-        self.vectorizer = TfidfVectorizer()
-        tfidf_matrix = self.vectorizer.fit_transform(texts)
+        # Create and fit TF-IDF vectorizer on the shared (cached) analysis pipeline
+        self.vectorizer = TfidfVectorizer(analyzer=analyze_text)
+        try:
+            with stage("tfidf_fit"):
+                tfidf_matrix = self.vectorizer.fit_transform(texts)
+        except ValueError:
+            # Every message was stopwords only - nothing to index
+            self.vectorizer = None
+            return
         
-        # Store embeddings
-        idx = 0
-        for i, msg in enumerate(self.messages):
-            if msg.message_type == "text":
-                self.embeddings[i] = tfidf_matrix[idx].toarray()[0]
-                idx += 1
+        # Keep the matrix sparse; row i belongs to message row_message_indices[i]
+        self.tfidf_matrix = tfidf_matrix.tocsr()
+        self.row_message_indices = np.asarray(row_message_indices, dtype=np.int64)
 
     async def _get_embedding(self, text: str) -> np.ndarray:
         """Get embedding for a text using TF-IDF"""
@@ -108,7 +249,7 @@ class SearchService:
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                response = await model.generate_content_async(prompt)
+                response = await _generate("explanation", prompt)
                 return response.text
             except Exception as e:
                 print(f"Error generating explanation (attempt {attempt+1}/{max_retries}): {e}")
@@ -126,55 +267,158 @@ class SearchService:
                     else:
                         return "Explanation generation failed. Please ensure you have a valid Gemini API key."
 
+    @stage("rank")
+    def rank(
+        self,
+        query: str,
+        min_similarity: float = 0.3,
+        mode: str = "semantic",
+        filters: Optional[Dict] = None,
+        limit: Optional[int] = None
+    ) -> RankedResults:
+        """
+        Score every text message against the query and return the full
+        ranking (best first, ties in message order).
+        mode is "semantic" (TF-IDF cosine), "fuzzy" (typo-tolerant trigram
+        match) or "substring" (case-insensitive substring).
+        filters (senders, message_types, start_date, end_date) are applied
+        as a bitmap before scoring, so filtered-out messages are never scored.
+        With a limit, fuzzy mode only guarantees the first limit entries.
+        """
+        message_mask = self._get_facet_index().mask(**filters) if filters else None
+
+        if mode in ("substring", "fuzzy"):
+            index = self._get_ngram_index()
+            row_mask = None if message_mask is None else message_mask[self.ngram_message_indices]
+            if mode == "substring":
+                rows = index.substring_search(query, row_mask)
+                scores = np.ones(len(rows))
+            else:
+                rows, scores, truncated = index.fuzzy_search(query, min_similarity, row_mask, limit)
+                order = np.lexsort((rows, -scores))
+                rows, scores = rows[order], scores[order]
+                ranking = self._ranking(query, self.ngram_message_indices[rows], scores)
+                ranking.truncated = truncated
+                return ranking
+            return self._ranking(query, self.ngram_message_indices[rows], scores)
+
+        empty = self._ranking(query, np.empty(0, dtype=np.int64), np.empty(0))
+        if self.vectorizer is None or self.tfidf_matrix is None:
+            return empty
+
+        query_vector = self.vectorizer.transform([query])
+        self.last_query_embedding = query_vector.toarray()[0]
+        if query_vector.nnz == 0:
+            return empty
+
+        # Messages with an all-zero vector never match
+        candidate_mask = np.diff(self.tfidf_matrix.indptr) > 0
+        if message_mask is not None:
+            candidate_mask &= message_mask[self.row_message_indices]
+        rows = np.flatnonzero(candidate_mask)
+
+        # Rows are L2-normalized, so the dot product is the cosine similarity
+        scores = np.asarray((self.tfidf_matrix[rows] @ query_vector.T).todense()).ravel()
+
+        keep = scores >= min_similarity
+        rows, scores = rows[keep], scores[keep]
+        order = np.lexsort((rows, -scores))
+        return self._ranking(query, self.row_message_indices[rows[order]], scores[order])
+
+    def _ranking(self, query: str, indices: np.ndarray, scores: np.ndarray) -> RankedResults:
+        ranking = RankedResults(self.messages, query, indices, scores)
+        if self.facet_index is not None:
+            ranking.facets = self.facet_index.facets(indices)
+        return ranking
+
+    async def build_results(
+        self,
+        ranking: RankedResults,
+        start: int,
+        stop: int,
+        with_explanation: bool = False
+    ) -> List[SearchResult]:
+        """Materialize results (context and optional explanation) for a slice of a ranking"""
+        results = []
+        for idx, similarity in zip(ranking.indices[start:stop], ranking.scores[start:stop]):
+            idx = int(idx)
+            msg = ranking.messages[idx]
+            context = await self._get_context(idx)
+
+            # Generate explanation if requested
+            explanation = ""
+            if with_explanation:
+                explanation = await self._generate_explanation(ranking.query, msg, context)
+
+            results.append(SearchResult(
+                message=msg,
+                similarity=float(similarity),
+                context=context,
+                explanation=explanation
+            ))
+        return results
+
     async def semantic_search(
         self,
         query: str,
         min_similarity: float = 0.3,
         limit: int = 10,
-        with_explanation: bool = False
+        with_explanation: bool = False,
+        mode: str = "semantic",
+        filters: Optional[Dict] = None
     ) -> List[SearchResult]:
         """
         Perform semantic search on messages using TF-IDF and cosine similarity
+        (or a fuzzy/substring trigram search, see rank())
         """
-        if self.vectorizer is None:
-            return []
-            
-        # Generate embedding for query
-        query_embedding = await self._get_embedding(query)
-        self.last_query_embedding = query_embedding
-
-        results = []
-        for idx, msg in enumerate(self.messages):
-            if msg.message_type != "text":
-                continue
-
-            # Get message embedding
-            message_embedding = self.embeddings.get(idx)
-            if message_embedding is None or not any(message_embedding):  # Check if embedding exists and is non-zero
-                continue
-
-            # Calculate similarity
-            similarity = self._calculate_similarity(query_embedding, message_embedding)
-            
-            if similarity >= min_similarity:
-                # Get context
-                context = await self._get_context(idx)
-                
-                # Generate explanation if requested
-                explanation = ""
-                if with_explanation:
-                    explanation = await self._generate_explanation(query, msg, context)
-                
-                results.append(SearchResult(
-                    message=msg,
-                    similarity=similarity,
-                    context=context,
-                    explanation=explanation
-                ))
+        ranking = await offload("search", self.rank, query, min_similarity, mode, filters, limit)
+        return await self.build_results(ranking, 0, limit, with_explanation)
 
-        # Sort by similarity
-        results.sort(key=lambda x: x.similarity, reverse=True)
-        return results[:limit]
+    async def search_page(
+        self,
+        query: str,
+        min_similarity: float = 0.3,
+        page_size: int = 50,
+        with_explanation: bool = False,
+        mode: str = "semantic",
+        filters: Optional[Dict] = None
+    ) -> Tuple[List[SearchResult], RankedResults, Optional[str]]:
+        """
+        Rank all messages once, cache the full ranking and return the first page.
+        Returns (results, full ranking, cursor for the next page or None).
+        Facets are always computed for paged searches.
+        """
+        await offload("search", self._get_facet_index)
+        ranking = await offload("search", self.rank, query, min_similarity, mode, filters)
+        results = await self.build_results(ranking, 0, page_size, with_explanation)
+        next_cursor = None
+        if len(ranking) > page_size:
+            ranking_id = secrets.token_urlsafe(12)
+            ranking_cache.set(ranking_id, ranking)
+            next_cursor = encode_cursor(ranking_id, page_size)
+        return results, ranking, next_cursor
+
+    @classmethod
+    async def next_page(
+        cls,
+        cursor: str,
+        page_size: int = 50,
+        with_explanation: bool = False
+    ) -> Tuple[List[SearchResult], RankedResults, Optional[str]]:
+        """Serve a later page by slicing a cached ranking (no re-scoring)"""
+        ranking_id, offset = decode_cursor(cursor)
+        ranking = ranking_cache.get(ranking_id)
+        if ranking is None:
+            raise InvalidCursorError("Search cursor has expired")
+        if not 0 <= offset <= len(ranking):
+            raise InvalidCursorError("Search cursor is out of range")
+
+        service = cls()
+        service.messages = ranking.messages
+        results = await service.build_results(ranking, offset, offset + page_size, with_explanation)
+        next_offset = offset + page_size
+        next_cursor = encode_cursor(ranking_id, next_offset) if next_offset < len(ranking) else None
+        return results, ranking, next_cursor
 
     async def get_similar_messages(
         self,
@@ -182,18 +426,37 @@ class SearchService:
         min_similarity: float = 0.3,
         limit: int = 10
     ) -> List[SearchResult]:
-        """Find messages similar to a specific message"""
-        
+        """
+        Find messages similar to a specific message using the MinHash/LSH
+        index. Similarity is the estimated Jaccard similarity of character
+        shingles; the message itself (exact same content) is excluded.
+        """
+        index = await offload("search", self._get_minhash_index)
+        with stage("minhash_query"):
+            rows, similarities = await offload("search", index.query, message, min_similarity)
 
-        target_message = message
-        if target_message.message_type != "text":
-            return []
-        # Use the target message as query
-        return await self.semantic_search(
-            target_message.content,
-            min_similarity=min_similarity,
-            limit=limit + 1  # Add 1 to account for the message itself
-        )
+        results = []
+        for row, similarity in zip(rows, similarities):
+            idx = int(index.message_indices[row])
+            msg = self.messages[idx]
+            if msg.content == message:
+                continue
+            results.append(SearchResult(
+                message=msg,
+                similarity=float(similarity),
+                context=await self._get_context(idx)
+            ))
+            if len(results) >= limit:
+                break
+        return results
+
+    def get_duplicate_groups(self, min_similarity: float = 0.8, min_length: int = 20) -> List[List[int]]:
+        """Groups of near-duplicate message indices (forwarded chains, repeated pastes), largest first"""
+        index = self._get_minhash_index()
+        return [
+            [int(index.message_indices[row]) for row in group]
+            for group in index.duplicate_groups(min_similarity, min_length)
+        ]
 
     async def get_conversation_insights(self, messages: List[Message]) -> Dict:
         """Generate AI insights about a conversation using Gemini"""
@@ -231,7 +494,7 @@ class SearchService:
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                response = await model.generate_content_async(prompt)
+                response = await _generate("insights", prompt)
                 return {
                     "insights": response.text,
                     "timestamp": datetime.now().isoformat()
@@ -261,25 +524,38 @@ class SearchService:
                             "timestamp": datetime.now().isoformat()
                         }
 
+    async def summarize_cluster(self, cluster_messages: List[Message]) -> str:
+        """Summary of a topic cluster, falling back to its most common terms"""
+        # Generate summary for cluster with error handling
+        try:
+            insights = await self.get_conversation_insights(cluster_messages)
+            return insights.get("insights", "No insights available")
+        except Exception as e:
+            print(f"Error generating cluster summary: {e}")
+            # Provide a fallback summary that doesn't rely on the API
+            summary = f"Cluster with {len(cluster_messages)} messages"
+            if len(cluster_messages) > 0:
+                # Include the most common words or phrases if possible
+                try:
+                    words = " ".join([msg.content for msg in cluster_messages]).split()
+                    word_counts = Counter(words)
+                    common_words = ", ".join([word for word, _ in word_counts.most_common(5)])
+                    summary = f"Cluster with {len(cluster_messages)} messages. Common terms: {common_words}"
+                except Exception:
+                    pass
+            return summary
+
     async def get_topic_clusters(self) -> Dict[str, List[int]]:
         """Group messages into topic clusters using TF-IDF and DBSCAN"""
         from sklearn.cluster import DBSCAN
         
-        # Collect all text message embeddings
-        embeddings_list = []
-        message_indices = []
-        
-        for idx, msg in enumerate(self.messages):
-            if msg.message_type == "text" and idx in self.embeddings:
-                embeddings_list.append(self.embeddings[idx])
-                message_indices.append(idx)
-
-        if not embeddings_list:
+        if self.tfidf_matrix is None:
             return {}
+        message_indices = self.row_message_indices
 
-        # Perform clustering
-        embeddings_array = np.array(embeddings_list)
-        clustering = DBSCAN(eps=0.3, min_samples=2).fit(embeddings_array)
+        # Perform clustering (DBSCAN accepts the sparse matrix directly)
+        with stage("clustering"):
+            clustering = await offload("search", DBSCAN(eps=0.3, min_samples=2).fit, self.tfidf_matrix)
         
         # Group messages by cluster
         clusters = {}
@@ -288,7 +564,7 @@ class SearchService:
                 cluster_name = f"topic_{label}"
                 if cluster_name not in clusters:
                     clusters[cluster_name] = []
-                clusters[cluster_name].append(message_indices[idx])
+                clusters[cluster_name].append(int(message_indices[idx]))
 
         return clusters
     
@@ -325,7 +601,7 @@ class SearchService:
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                response = await model.generate_content_async(prompt)
+                response = await _generate("question", prompt)
                 return {
                     "answer": response.text,
                     "status": "success",
@@ -382,7 +658,7 @@ class SearchService:
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                response = await model.generate_content_async(prompt)
+                response = await _generate("summary", prompt)
                 return response.text
             except Exception as e:
                 print(f"Error generating summary (attempt {attempt+1}/{max_retries}): {e}")
@@ -0,0 +1,352 @@
+from typing import Dict, List
+
+
+def empty_security_insights() -> Dict:
+    """Insights of a chat without messages"""
+    return {
+        "insights": [],
+        "metrics": {
+            "securityScore": 100,
+            "totalFindings": 0,
+            "criticalCount": 0,
+            "highCount": 0,
+            "sensitiveDataCount": 0
+        },
+        "sensitiveData": {},
+        "trends": [],
+        "recommendations": []
+    }
+
+
+def empty_security_insights_v2() -> Dict:
+    """Version 2 insights of a chat without messages"""
+    return {
+        "metrics": {
+            "overallScore": 100,
+            "totalRisks": 0,
+            "riskLevel": "low",
+            "highRiskCount": 0,
+            "mediumRiskCount": 0,
+            "lowRiskCount": 0,
+            "sensitiveDataByType": {}
+        },
+        "insights": [],
+        "trends": []
+    }
+
+
+def security_insights(report) -> Dict:
+    """
+    Insights, metrics, sensitive data, trends and recommendations projected
+    from a SecurityReport, as a SecurityInsightsResponse-shaped dict
+    """
+    all_sensitive_data = report.examples
+    sensitive_data_count = report.sensitive_data_count
+    
+    # Generate insights based on findings
+    insights = []
+    
+    # Email insight
+    if "email" in all_sensitive_data and len(all_sensitive_data["email"]) > 0:
+        insights.append({
+            "title": "Email Address Exposure",
+            "description": "Email addresses were found in the conversation",
+            "severity": "high",
+            "impact": "Email addresses can be used for phishing attacks, spam, or identity theft",
+            "recommendations": [
+                "Remove email addresses when sharing conversations",
+                "Use secure channels for sharing email addresses",
+                "Consider using masked or temporary email addresses"
+            ],
+            "examples": all_sensitive_data["email"]  # Show all emails
+        })
+    
+    # Phone number insight
+    if "phone" in all_sensitive_data and len(all_sensitive_data["phone"]) > 0:
+        insights.append({
+            "title": "Phone Number Exposure",
+            "description": "Phone numbers were found in the conversation",
+            "severity": "high",
+            "impact": "Phone numbers can be used for unwanted calls, SMS phishing, or identity verification attacks",
+            "recommendations": [
+                "Remove phone numbers when sharing conversations",
+                "Use messaging apps that don't require phone number sharing",
+                "Consider using temporary phone numbers for sensitive communications"
+            ],
+            "examples": all_sensitive_data["phone"]  # Show all phone numbers
+        })
+    
+    # Credit card insight
+    if "credit_card" in all_sensitive_data and len(all_sensitive_data["credit_card"]) > 0:
+        insights.append({
+            "title": "Credit Card Information Exposure",
+            "description": "Credit card numbers were found in the conversation",
+            "severity": "critical",
+            "impact": "Credit card information can be used for financial fraud and unauthorized transactions",
+            "recommendations": [
+                "Immediately remove all credit card numbers from the conversation",
+                "Never share credit card details through chat",
+                "Use secure payment methods instead of sharing card details"
+            ],
+            "examples": all_sensitive_data["credit_card"]  # Show all credit card info
+        })
+    
+    # Location insight
+    if ("location" in all_sensitive_data or "address" in all_sensitive_data) and \
+       (len(all_sensitive_data.get("location", [])) > 0 or len(all_sensitive_data.get("address", [])) > 0):
+        location_examples = all_sensitive_data.get("location", []) + all_sensitive_data.get("address", [])  # Show all locations
+        insights.append({
+            "title": "Location Information Exposure",
+            "description": "Location details were found in the conversation",
+            "severity": "medium",
+            "impact": "Location information can compromise physical security and privacy",
+            "recommendations": [
+                "Avoid sharing precise location information in chats",
+                "Use general area names instead of specific addresses",
+                "Be cautious about sharing meeting locations publicly"
+            ],
+            "examples": location_examples  # Show all locations
+        })
+    
+    # URL insight
+    if "url" in all_sensitive_data and len(all_sensitive_data["url"]) > 0:
+        insights.append({
+            "title": "URL Sharing",
+            "description": "URLs were shared in the conversation",
+            "severity": "low",
+            "impact": "Malicious URLs can lead to phishing, malware, or data theft",
+            "recommendations": [
+                "Verify all URLs before clicking",
+                "Use URL preview features to check destinations",
+                "Be cautious with shortened URLs"
+            ],
+            "examples": all_sensitive_data["url"]  # Show all URLs
+        })
+    
+    # Prepare sensitive data for response
+    sensitive_data_response = {}
+    for data_type, values in all_sensitive_data.items():
+        sensitive_data_response[data_type] = {
+            "count": len(values),
+            "examples": values  # Show all values instead of limiting to 3
+        }
+    
+    # Calculate metrics
+    critical_count = sum(1 for insight in insights if insight["severity"] == "critical")
+    high_count = sum(1 for insight in insights if insight["severity"] == "high")
+    
+    # Generate security trends
+    trends = [
+        {"category": "Critical", "count": critical_count},
+        {"category": "High", "count": high_count},
+        {"category": "Medium", "count": sum(1 for insight in insights if insight["severity"] == "medium")},
+        {"category": "Low", "count": sum(1 for insight in insights if insight["severity"] == "low")}
+    ]
+    
+    # Add data type trends
+    for data_type, values in all_sensitive_data.items():
+        if len(values) > 0:
+            trends.append({
+                "category": data_type.capitalize(),
+                "count": len(values)
+            })
+    
+    # Generate detailed recommendations
+    recommendations = []
+    
+    if critical_count > 0 or high_count > 0:
+        recommendations.append({
+            "title": "Secure Sensitive Information",
+            "description": "Remove or secure highly sensitive information found in your conversations",
+            "impact": "Reduces risk of identity theft, financial fraud, and privacy violations",
+            "priority": "high",
+            "steps": [
+                "Review all conversations for sensitive data like credit cards and phone numbers",
+                "Delete or redact sensitive information",
+                "Use secure channels for sharing necessary sensitive information",
+                "Consider using encryption for highly sensitive communications"
+            ]
+        })
+    
+    if "location" in all_sensitive_data or "address" in all_sensitive_data:
+        recommendations.append({
+            "title": "Protect Location Privacy",
+            "description": "Minimize sharing of location information in conversations",
+            "impact": "Enhances physical security and reduces stalking or tracking risks",
+            "priority": "medium",
+            "steps": [
+                "Use general area names instead of specific addresses",
+                "Remove exact addresses from shared conversation history",
+                "Consider using private channels for coordinating meetings",
+                "Be aware of location metadata in shared images"
+            ]
+        })
+    
+    recommendations.append({
+        "title": "Implement Regular Security Reviews",
+        "description": "Regularly review conversation history for security issues",
+        "impact": "Proactively identifies and addresses security concerns before they lead to incidents",
+        "priority": "medium",
+        "steps": [
+            "Schedule monthly reviews of conversation security",
+            "Use this security insights tool to scan conversations",
+            "Educate group members about secure communication practices",
+            "Establish guidelines for what information should not be shared in chat"
+        ]
+    })
+    
+    # Calculate security score
+    # Base score of 100, deduct points based on findings
+    security_score = 100
+    if critical_count > 0:
+        security_score -= 30 * min(critical_count, 3)  # Max deduction of 90 for critical
+    if high_count > 0:
+        security_score -= 15 * min(high_count, 4)      # Max deduction of 60 for high
+    
+    # Ensure score is between 0-100
+    security_score = max(0, min(100, security_score))
+    
+    return {
+        "insights": insights,
+        "metrics": {
+            "securityScore": security_score,
+            "totalFindings": len(insights),
+            "criticalCount": critical_count,
+            "highCount": high_count,
+            "sensitiveDataCount": sensitive_data_count
+        },
+        "sensitiveData": sensitive_data_response,
+        "trends": trends,
+        "recommendations": recommendations
+    }
+
+
+def security_insights_v2(report, trends: List[Dict]) -> Dict:
+    """
+    Metrics and insights projected from a SecurityReport, together with the
+    given trends, as a SecurityInsightsResponse2-shaped dict
+    """
+    all_sensitive_data = report.examples
+    sensitive_data_counts = dict(report.type_counts)
+    
+    # Generate insights based on findings
+    insights = []
+    
+    # Email insight
+    if "email" in all_sensitive_data and len(all_sensitive_data["email"]) > 0:
+        insights.append({
+            "title": "Email Address Exposure",
+            "description": f"Found {sensitive_data_counts['email']} email addresses in the conversation that could be used for phishing attacks or identity theft.",
+            "severity": "high",
+            "recommendations": [
+                "Remove email addresses when sharing conversations",
+                "Use secure channels for sharing email addresses",
+                "Consider using masked or temporary email addresses"
+            ]
+        })
+    
+    # Phone number insight
+    if "phone" in all_sensitive_data and len(all_sensitive_data["phone"]) > 0:
+        insights.append({
+            "title": "Phone Number Exposure",
+            "description": f"Found {sensitive_data_counts['phone']} phone numbers that could be used for unwanted calls or SMS phishing.",
+            "severity": "high",
+            "recommendations": [
+                "Remove phone numbers when sharing conversations",
+                "Use messaging apps that don't require phone number sharing",
+                "Consider using temporary phone numbers for sensitive communications"
+            ]
+        })
+    
+    # Credit card insight
+    if "credit_card" in all_sensitive_data and len(all_sensitive_data["credit_card"]) > 0:
+        insights.append({
+            "title": "Credit Card Information Exposure",
+            "description": f"Found {sensitive_data_counts['credit_card']} credit card numbers that pose a serious financial security risk.",
+            "severity": "high",
+            "recommendations": [
+                "Immediately remove all credit card numbers from the conversation",
+                "Never share credit card details through chat",
+                "Use secure payment methods instead of sharing card details"
+            ]
+        })
+    
+    # Location insight
+    if ("location" in all_sensitive_data or "address" in all_sensitive_data):
+        location_count = sensitive_data_counts.get("location", 0) + sensitive_data_counts.get("address", 0)
+        insights.append({
+            "title": "Location Information Exposure",
+            "description": f"Found {location_count} location references that could compromise physical security and privacy.",
+            "severity": "medium",
+            "recommendations": [
+                "Avoid sharing precise location information in chats",
+                "Use general area names instead of specific addresses",
+                "Be cautious about sharing meeting locations publicly"
+            ]
+        })
+    
+    # URL insight
+    if "url" in all_sensitive_data and len(all_sensitive_data["url"]) > 0:
+        insights.append({
+            "title": "URL Sharing",
+            "description": f"Found {sensitive_data_counts['url']} URLs that could potentially lead to phishing or malware sites.",
+            "severity": "low",
+            "recommendations": [
+                "Verify all URLs before clicking",
+                "Use URL preview features to check destinations",
+                "Be cautious with shortened URLs"
+            ]
+        })
+    
+    # Date insight
+    if "date" in all_sensitive_data and len(all_sensitive_data["date"]) > 0:
+        insights.append({
+            "title": "Date Information Sharing",
+            "description": f"Found {sensitive_data_counts['date']} dates that could reveal patterns or schedules.",
+            "severity": "low",
+            "recommendations": [
+                "Be cautious about sharing specific dates for future events",
+                "Consider the context when sharing date information",
+                "Avoid sharing recurring schedule information"
+            ]
+        })
+    
+    # Calculate risk counts
+    high_risk_count = sum(1 for insight in insights if insight["severity"] == "high")
+    medium_risk_count = sum(1 for insight in insights if insight["severity"] == "medium")
+    low_risk_count = sum(1 for insight in insights if insight["severity"] == "low")
+    total_risks = high_risk_count + medium_risk_count + low_risk_count
+    
+    # Determine overall risk level
+    risk_level = "low"
+    if high_risk_count > 0:
+        risk_level = "high"
+    elif medium_risk_count > 0:
+        risk_level = "medium"
+    
+    # Calculate overall score
+    # Base score of 100, deduct points based on findings
+    overall_score = 100
+    if high_risk_count > 0:
+        overall_score -= 25 * min(high_risk_count, 3)  # Max deduction of 75 for high
+    if medium_risk_count > 0:
+        overall_score -= 10 * min(medium_risk_count, 3)  # Max deduction of 30 for medium
+    if low_risk_count > 0:
+        overall_score -= 5 * min(low_risk_count, 3)  # Max deduction of 15 for low
+    
+    # Ensure score is between 0-100
+    overall_score = max(0, min(100, overall_score))
+    
+    return {
+        "metrics": {
+            "overallScore": round(overall_score, 1),
+            "totalRisks": total_risks,
+            "riskLevel": risk_level,
+            "highRiskCount": high_risk_count,
+            "mediumRiskCount": medium_risk_count,
+            "lowRiskCount": low_risk_count,
+            "sensitiveDataByType": sensitive_data_counts
+        },
+        "insights": insights,
+        "trends": trends
+    }
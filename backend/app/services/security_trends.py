@@ -0,0 +1,323 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.cache import LRUCache, fingerprint_messages
+from app.core.metrics import register_cache
+from app.core.whatsapp_parser import Message
+from app.services.facet_index import to_datetime64
+
+RISK_LEVELS = ("high", "medium", "low")
+
+# Relative changes smaller than this (in percent) are reported as stable
+STABLE_CHANGE_PERCENTAGE = 5.0
+
+SECURITY_BASELINE_DB = os.getenv("SECURITY_BASELINE_DB", os.path.join("data", "security_baselines.db"))
+# Snapshots kept per chat; older ones are pruned on save
+MAX_BASELINES_PER_CHAT = 10
+SECURITY_ROLLUP_CACHE_SIZE = int(os.getenv("SECURITY_ROLLUP_CACHE_SIZE", 256))
+SECURITY_ROLLUP_TTL_SECONDS = int(os.getenv("SECURITY_ROLLUP_TTL_SECONDS", 3600))
+
+
+class SecurityRollup:
+    """
+    Per-day security counters of a chat: text messages, findings per risk
+    level and sensitive data occurrences per type. Every trend window is a
+    slice of these columns, so no window needs a rescan of the messages.
+    """
+
+    def __init__(self, days: np.ndarray, messages: np.ndarray,
+                 risks: Dict[str, np.ndarray], data_types: Dict[str, np.ndarray]):
+        self.days = days
+        self.messages = messages
+        self.risks = risks
+        self.data_types = data_types
+
+    @classmethod
+    def from_report(cls, report, messages: Sequence[Message]) -> "SecurityRollup":
+        """
+        Bucket a SecurityReport of `messages` by day.
+        All counting is vectorized over the message timestamps.
+        """
+        all_days = np.array([to_datetime64(msg.timestamp) for msg in messages], dtype="datetime64[us]")
+        days, day_of_message = np.unique(all_days.astype("datetime64[D]"), return_inverse=True)
+        is_text = np.fromiter((msg.message_type == "text" for msg in messages), dtype=bool, count=len(messages))
+        message_counts = np.bincount(day_of_message[is_text], minlength=len(days))
+
+        entry_days = day_of_message[np.fromiter((entry[0] for entry in report.entries), dtype=np.int64, count=len(report.entries))]
+        entry_risks = np.array([entry[3] for entry in report.entries], dtype="U6")
+        risks = {
+            level: np.bincount(entry_days[entry_risks == level], minlength=len(days))
+            for level in RISK_LEVELS
+        }
+
+        # One row per detected span: (day, type code)
+        type_names = list(report.type_counts)
+        type_codes = {name: code for code, name in enumerate(type_names)}
+        span_counts = np.fromiter((len(entry[2]) for entry in report.entries), dtype=np.int64, count=len(report.entries))
+        span_days = np.repeat(entry_days, span_counts)
+        span_types = np.fromiter(
+            (type_codes[span.type] for entry in report.entries for span in entry[2]),
+            dtype=np.int64, count=int(span_counts.sum())
+        )
+        per_type = np.bincount(span_days * len(type_names) + span_types, minlength=len(days) * len(type_names))
+        per_type = per_type.reshape(len(days), len(type_names)) if type_names else np.zeros((len(days), 0), dtype=np.int64)
+        data_types = {name: per_type[:, code] for code, name in enumerate(type_names)}
+
+        return cls(days, message_counts, risks, data_types)
+
+    @property
+    def findings(self) -> np.ndarray:
+        return self.risks["high"] + self.risks["medium"] + self.risks["low"]
+
+    @property
+    def occurrences(self) -> np.ndarray:
+        if not self.data_types:
+            return np.zeros(len(self.days), dtype=np.int64)
+        return sum(self.data_types.values())
+
+    def weekly(self) -> "SecurityRollup":
+        """The same counters bucketed by week (numpy weeks start on Thursday)"""
+        weeks, week_of_day = np.unique(self.days.astype("datetime64[W]"), return_inverse=True)
+
+        def rebucket(column: np.ndarray) -> np.ndarray:
+            return np.bincount(week_of_day, weights=column, minlength=len(weeks)).astype(np.int64)
+
+        return SecurityRollup(
+            weeks,
+            rebucket(self.messages),
+            {level: rebucket(column) for level, column in self.risks.items()},
+            {name: rebucket(column) for name, column in self.data_types.items()}
+        )
+
+    def window(self, start: np.datetime64, end: np.datetime64) -> Dict[str, int]:
+        """Totals over the buckets in [start, end)"""
+        lo, hi = np.searchsorted(self.days, [start, end])
+        return {
+            "messages": int(self.messages[lo:hi].sum()),
+            "findings": int(self.findings[lo:hi].sum()),
+            "high": int(self.risks["high"][lo:hi].sum()),
+            "occurrences": int(self.occurrences[lo:hi].sum()),
+        }
+
+    def snapshot(self) -> Dict:
+        """Compact totals stored as a baseline"""
+        return {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "first_day": str(self.days[0]) if len(self.days) else None,
+            "last_day": str(self.days[-1]) if len(self.days) else None,
+            "messages": int(self.messages.sum()),
+            "findings": int(self.findings.sum()),
+            "risk_levels": {level: int(column.sum()) for level, column in self.risks.items()},
+            "data_types": {name: int(column.sum()) for name, column in self.data_types.items()},
+        }
+
+
+def chat_key(messages: Sequence[Message]) -> Optional[str]:
+    """
+    Stable identity of a chat for baselines: a re-exported chat keeps its
+    first message while new messages are appended
+    """
+    if not messages:
+        return None
+    first = messages[0]
+    return hashlib.blake2b(
+        f"{first.timestamp}\x1f{first.sender}\x1f{first.content}".encode(), digest_size=16
+    ).hexdigest()
+
+
+# chat_key -> (fingerprint, SecurityReport, SecurityRollup) of the chat's last analyzed version
+security_rollups = LRUCache(maxsize=SECURITY_ROLLUP_CACHE_SIZE, ttl=SECURITY_ROLLUP_TTL_SECONDS)
+register_cache("security_rollup", security_rollups)
+
+
+def analyze_chat(detector, messages: Sequence[Message]) -> Tuple[object, SecurityRollup]:
+    """
+    The SecurityReport and rollup of a chat, reused until the chat changes.
+    A grown or edited chat is analyzed again; its unchanged messages are
+    served from the detection cache.
+    """
+    key = chat_key(messages)
+    fingerprint = fingerprint_messages(messages)
+    cached = security_rollups.get(key)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1], cached[2]
+    report = detector.build_report(messages)
+    rollup = SecurityRollup.from_report(report, messages)
+    security_rollups.set(key, (fingerprint, report, rollup))
+    return report, rollup
+
+
+class BaselineStore:
+    """Baseline snapshots per chat in a small local sqlite database"""
+
+    def __init__(self, path: str = SECURITY_BASELINE_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS baselines ("
+                "chat_key TEXT NOT NULL, created_at TEXT NOT NULL, snapshot TEXT NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS baselines_chat ON baselines (chat_key, created_at)"
+            )
+        return self._connection
+
+    def latest(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT snapshot FROM baselines WHERE chat_key = ? ORDER BY created_at DESC LIMIT 1", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, key: str, snapshot: Dict) -> None:
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT INTO baselines (chat_key, created_at, snapshot) VALUES (?, ?, ?)",
+                    (key, snapshot["created_at"], json.dumps(snapshot))
+                )
+                connection.execute(
+                    "DELETE FROM baselines WHERE chat_key = ? AND created_at NOT IN ("
+                    "SELECT created_at FROM baselines WHERE chat_key = ? ORDER BY created_at DESC LIMIT ?)",
+                    (key, key, MAX_BASELINES_PER_CHAT)
+                )
+
+
+baseline_store = BaselineStore()
+
+
+def _change(current: float, previous: float) -> Dict:
+    """Direction and relative change (in percent) from previous to current"""
+    if previous == 0:
+        percentage = 0.0 if current == 0 else 100.0
+    else:
+        percentage = abs(current - previous) / previous * 100
+    if percentage < STABLE_CHANGE_PERCENTAGE:
+        return {"direction": "stable", "changePercentage": 0.0}
+    return {
+        "direction": "increasing" if current > previous else "decreasing",
+        "changePercentage": round(percentage, 1)
+    }
+
+
+def _movement(change: Dict) -> str:
+    if change["direction"] == "stable":
+        return "stable"
+    return f"{change['direction']} by {change['changePercentage']}%"
+
+
+def _rate(totals: Dict[str, int], key: str) -> float:
+    return totals[key] / totals["messages"] if totals["messages"] else 0.0
+
+
+def compute_trends(rollup: SecurityRollup, baseline: Optional[Dict] = None) -> List[Dict]:
+    """
+    Trends of the chat's latest periods against the periods before them,
+    measured back from the chat's last day, and against a stored baseline.
+    Returns SecurityTrend2-shaped dicts.
+    """
+    if not len(rollup.days):
+        return []
+    end = rollup.days[-1] + np.timedelta64(1, "D")
+    trends = []
+
+    # Overall security moves opposite to the rate of findings per message
+    last_week = rollup.window(end - np.timedelta64(7, "D"), end)
+    previous_week = rollup.window(end - np.timedelta64(14, "D"), end - np.timedelta64(7, "D"))
+    change = _change(_rate(last_week, "findings"), _rate(previous_week, "findings"))
+    change["direction"] = {"increasing": "decreasing", "decreasing": "increasing"}.get(change["direction"], "stable")
+    trends.append({
+        "type": "Overall Security",
+        "period": "last 7 days",
+        "description": (
+            "Overall security has been stable over the last week." if change["direction"] == "stable" else
+            f"Overall security has been {change['direction']} over the last week; "
+            f"the rate of findings per message changed by {change['changePercentage']}%."
+        ),
+        **change
+    })
+
+    weekly = rollup.weekly()
+    week_end = weekly.days[-1] + np.timedelta64(1, "W")
+    last_month = weekly.window(week_end - np.timedelta64(4, "W"), week_end)
+    previous_month = weekly.window(week_end - np.timedelta64(8, "W"), week_end - np.timedelta64(4, "W"))
+    if last_month["occurrences"] or previous_month["occurrences"]:
+        change = _change(_rate(last_month, "occurrences"), _rate(previous_month, "occurrences"))
+        trends.append({
+            "type": "Sensitive Data Exposure",
+            "period": "last 4 weeks",
+            "description": f"Sensitive data exposure has been {_movement(change)} over the last month.",
+            **change
+        })
+
+    last_fortnight = rollup.window(end - np.timedelta64(14, "D"), end)
+    previous_fortnight = rollup.window(end - np.timedelta64(28, "D"), end - np.timedelta64(14, "D"))
+    if last_fortnight["high"] or previous_fortnight["high"]:
+        change = _change(last_fortnight["high"], previous_fortnight["high"])
+        trends.append({
+            "type": "High Risk Issues",
+            "period": "last 14 days",
+            "description": f"High risk security issues have been {_movement(change)} over the last two weeks.",
+            **change
+        })
+
+    if baseline and baseline.get("last_day"):
+        # Messages after the baseline's last day against the baseline's own rate
+        since = np.datetime64(baseline["last_day"], "D") + np.timedelta64(1, "D")
+        new = rollup.window(since, end)
+        baseline_rate = baseline["findings"] / baseline["messages"] if baseline["messages"] else 0.0
+        change = _change(_rate(new, "findings"), baseline_rate)
+        trends.append({
+            "type": "Since Baseline",
+            "period": f"since {baseline['last_day']}",
+            "description": (
+                f"{new['findings']} new findings in {new['messages']} messages since the baseline; "
+                f"the finding rate has been {_movement(change)}."
+            ),
+            **change
+        })
+
+    return trends
+
+
+# Reported in place of trends when an analysis becomes the chat's baseline
+BASELINE_TREND = {
+    "type": "Security Baseline",
+    "direction": "stable",
+    "changePercentage": 0,
+    "period": "current",
+    "description": "This is your security baseline. Future analyses will show trends compared to this baseline."
+}
+
+
+def baseline_trends(rollup: SecurityRollup, key: str, compare_with_previous: bool = False,
+                    save_baseline: bool = False) -> List[Dict]:
+    """
+    Trends of a chat's rollup, compared on request with the chat's stored
+    baseline snapshot. The first analysis of a chat becomes its baseline;
+    later ones only when save_baseline is set. Reads and writes the baseline
+    store, so call it off the event loop.
+    """
+    baseline = baseline_store.latest(key)
+    if baseline is None or save_baseline:
+        baseline_store.save(key, rollup.snapshot())
+
+    if compare_with_previous:
+        return compute_trends(rollup, baseline)
+    if baseline is not None and not save_baseline:
+        return compute_trends(rollup)
+    return [dict(BASELINE_TREND)]
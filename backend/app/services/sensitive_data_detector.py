@@ -1,6 +1,17 @@
+import hashlib
+import os
 import re
-from typing import List, Dict, Optional
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, List, Dict, NamedTuple, Optional, Sequence, Tuple
 from app.core.whatsapp_parser import Message
+from app.core.cache import LRUCache
+from app.core.metrics import register_cache, stage
+from app.services.entity_index import EntityIndex
 import nltk
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
@@ -13,84 +24,348 @@ except LookupError:
     nltk.download('punkt')
     nltk.download('stopwords')
 
+# Regular expressions for sensitive data, in detection order.
+# Every quantifier is bounded and adjacent quantifiers never match the same
+# characters, so the work per start position is constant and a scan is
+# linear in the text length (unbounded `[A-Za-z\s,]+` after `\s+` in the old
+# address pattern, and the unbounded email local part, were quadratic).
+PATTERNS = {
+    'email': r'\b[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9.-]{1,255}\.[A-Z|a-z]{2,24}\b',
+    'phone': r'\b(?:\+\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b',
+    'credit_card': r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b',
+    'date': r'\b\d{1,2}[-/]\d{1,2}[-/]\d{2,4}\b',
+    'address': r'\b\d{1,6}\s{1,5}(?:[A-Za-z]{1,30}[\s,]{1,5}){0,5}(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Lane|Ln|Drive|Dr|Court|Ct|Circle|Cir|Way)\b',
+    'location': r'\b(?:in|at|near|from)\s{1,5}([A-Z][a-z]{1,29}(?:\s{1,5}[A-Z][a-z]{1,29}){0,4})\b',
+    'url': r'https?://(?:[-\w.]|%[\da-fA-F]{2}){1,2048}'
+}
+
+# Upper bound on the length of any single match given the caps above
+# (the url pattern is the longest at 8 + 3 * 2048 characters)
+MAX_MATCH_LENGTH = 8_192
+# Texts longer than this are scanned in windows of this many characters
+# (plus MAX_MATCH_LENGTH of lookahead), checking the time budget in between
+SCAN_CHUNK_SIZE = 16_384
+# Per-message time budget for long texts; a scan that runs over stops and
+# records a SCAN_TIMEOUT span instead of pinning the worker. Texts up to
+# SCAN_CHUNK_SIZE are scanned in one pass without a deadline: the patterns
+# are linear-time, so such a scan is bounded by the chunk size alone.
+SCAN_TIME_BUDGET_MS = int(os.getenv("SCAN_TIME_BUDGET_MS", 250))
+SCAN_TIMEOUT = "scan_timeout"
+
+# Compiled once at import. The patterns are kept separate rather than merged
+# into one alternation because matches of different types may overlap
+# (a date inside a phone number) and each type must still report them.
+COMPILED_PATTERNS = [
+    (data_type, re.compile(pattern, re.IGNORECASE).finditer)
+    for data_type, pattern in PATTERNS.items()
+]
+
+# Cheap checks for a character or keyword every match of a pattern must
+# contain. Most chat messages have no digit, "@" or "://", so they skip the
+# expensive patterns (address, phone, ...) entirely.
+PREFILTERS = {
+    'digit': re.compile(r'\d').search,
+    'at_sign': lambda text: '@' in text,
+    'scheme': lambda text: '://' in text,
+    'location_keyword': re.compile(r'\b(?:in|at|near|from)\s', re.IGNORECASE).search,
+}
+
+PATTERN_PREFILTERS = {
+    'email': 'at_sign',
+    'phone': 'digit',
+    'credit_card': 'digit',
+    'date': 'digit',
+    'address': 'digit',
+    'location': 'location_keyword',
+    'url': 'scheme',
+}
+
+# Routed scan plan: (data type, prefilter name, finditer), in pattern order
+SCAN_PLAN = [
+    (data_type, PATTERN_PREFILTERS[data_type], finditer)
+    for data_type, finditer in COMPILED_PATTERNS
+]
+
+# When detected spans overlap, the merged span is labelled with the most
+# sensitive type (lowest number)
+REDACTION_PRIORITY = {
+    'credit_card': 0,
+    'phone': 1,
+    'email': 2,
+    'url': 3,
+    'address': 4,
+    'date': 5,
+    'location': 6,
+}
+
+# Process-wide prefilter counters, shared by every detector instance
+prefilter_stats: Counter = Counter()
+_prefilter_stats_lock = threading.Lock()
+
+# Detection results keyed by a hash of the message content. Shared by every
+# detector instance, so all security endpoints (and repeated requests for the
+# same chat) scan each distinct message once.
+DETECTION_CACHE_SIZE = int(os.getenv("DETECTION_CACHE_SIZE", 200_000))
+detection_cache = LRUCache(maxsize=DETECTION_CACHE_SIZE)
+register_cache("detection", detection_cache)
+
+
+# Incremental security state of live chats, keyed by state id. Evicted
+# states have to be rebuilt by the client from the full history.
+SECURITY_STATE_CACHE_SIZE = int(os.getenv("SECURITY_STATE_CACHE_SIZE", 256))
+SECURITY_STATE_TTL_SECONDS = int(os.getenv("SECURITY_STATE_TTL_SECONDS", 3600))
+security_states = LRUCache(maxsize=SECURITY_STATE_CACHE_SIZE, ttl=SECURITY_STATE_TTL_SECONDS)
+register_cache("security_state", security_states)
+
+
+def content_key(text: str) -> bytes:
+    """Compact cache key for a message content"""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class SensitiveSpan(NamedTuple):
+    """A typed match with character offsets into the scanned text"""
+    type: str
+    start: int
+    end: int
+    value: str
+
+
+# Worker processes for scanning large chats. Below the threshold (distinct
+# uncached messages) shipping contents to the pool costs more than it saves.
+DETECTION_WORKERS = int(os.getenv("DETECTION_WORKERS", os.cpu_count() or 1))
+PARALLEL_DETECTION_THRESHOLD = int(os.getenv("PARALLEL_DETECTION_THRESHOLD", 20_000))
+# Upper bound on messages per task sent to a worker
+MAX_DETECTION_BATCH = 5_000
+
+_detection_pool: Optional[ProcessPoolExecutor] = None
+_detection_pool_lock = threading.Lock()
+
+
+def get_detection_pool() -> ProcessPoolExecutor:
+    """The process-wide detection pool, started on first use"""
+    global _detection_pool
+    with _detection_pool_lock:
+        if _detection_pool is None:
+            _detection_pool = ProcessPoolExecutor(max_workers=DETECTION_WORKERS)
+        return _detection_pool
+
+
+def _discard_detection_pool() -> None:
+    global _detection_pool
+    with _detection_pool_lock:
+        if _detection_pool is not None:
+            _detection_pool.shutdown(wait=False, cancel_futures=True)
+            _detection_pool = None
+
+
+def _route(text: str) -> Tuple[List[Tuple[str, object]], List[str]]:
+    """Split the scan plan into (routed (type, finditer) pairs, skipped types) for text"""
+    passed = {name: bool(check(text)) for name, check in PREFILTERS.items()}
+    routed = []
+    skipped = []
+    for data_type, prefilter, finditer in SCAN_PLAN:
+        if passed[prefilter]:
+            routed.append((data_type, finditer))
+        else:
+            skipped.append(data_type)
+    return routed, skipped
+
+
+def _find_spans(text: str, routed: List[Tuple[str, object]]) -> Tuple[SensitiveSpan, ...]:
+    if len(text) <= SCAN_CHUNK_SIZE:
+        return tuple(
+            SensitiveSpan(data_type, match.start(), match.end(), match.group())
+            for data_type, finditer in routed
+            for match in finditer(text)
+        )
+    return _find_spans_chunked(text, routed)
+
+
+def _find_spans_chunked(text: str, routed: List[Tuple[str, object]]) -> Tuple[SensitiveSpan, ...]:
+    """
+    Scan a long text window by window. Each window extends MAX_MATCH_LENGTH
+    past its chunk, so every match starting in the chunk ends inside the
+    window and the spans are exactly those of a whole-text scan.
+    """
+    deadline = time.perf_counter() + SCAN_TIME_BUDGET_MS / 1000
+    spans = []
+    for data_type, finditer in routed:
+        # Resume after the previous match, as finditer over the whole text would
+        position = 0
+        for chunk_start in range(0, len(text), SCAN_CHUNK_SIZE):
+            if time.perf_counter() > deadline:
+                spans.append(SensitiveSpan(SCAN_TIMEOUT, 0, 0, ""))
+                return tuple(spans)
+            chunk_end = chunk_start + SCAN_CHUNK_SIZE
+            for match in finditer(text, max(position, chunk_start), chunk_end + MAX_MATCH_LENGTH):
+                if match.start() >= chunk_end:
+                    break
+                spans.append(SensitiveSpan(data_type, match.start(), match.end(), match.group()))
+                position = match.end()
+    return tuple(spans)
+
+
+def _timed_out(spans: Sequence[SensitiveSpan]) -> bool:
+    return bool(spans) and spans[-1].type == SCAN_TIMEOUT
+
+
+def _scan_batch(batch: List[Tuple[int, str]]) -> List[Tuple[int, Tuple[Tuple[str, int, int], ...]]]:
+    """
+    Pool worker: scan (index, content) pairs.
+    Only messages with matches are returned, as (index, ((type, start, end), ...));
+    the parent slices the values back out of the content it already holds.
+    """
+    results = []
+    for idx, text in batch:
+        spans = _find_spans(text, _route(text)[0])
+        if spans:
+            results.append((idx, tuple(span[:3] for span in spans)))
+    return results
+
+
 class SensitiveDataDetector:
     def __init__(self):
         # Regular expressions for sensitive data
-        self.patterns = {
-            'email': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-            'phone': r'\b(?:\+\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b',
-            'credit_card': r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b',
-            'date': r'\b\d{1,2}[-/]\d{1,2}[-/]\d{2,4}\b',
-            'address': r'\b\d+\s+[A-Za-z\s,]+(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Lane|Ln|Drive|Dr|Court|Ct|Circle|Cir|Way)\b',
-            'location': r'\b(?:in|at|near|from)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b',
-            'url': r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+'
-        }
+        self.patterns = dict(PATTERNS)
         
         # Load stopwords
         self.stop_words = set(stopwords.words('english'))
 
+    def scan(self, text: str) -> List[SensitiveSpan]:
+        """
+        Scan text once with the precompiled patterns that could match it.
+        Returns typed spans grouped by type (in pattern order), each group in
+        text order. A scan that exceeded SCAN_TIME_BUDGET_MS ends with a
+        zero-width SCAN_TIMEOUT span; such partial results are not cached.
+        """
+        routed = self._prefilter(text)
+        # Messages no pattern can match are cheaper to prefilter than to cache
+        if not routed:
+            return []
+
+        key = content_key(text)
+        spans = detection_cache.get(key)
+        if spans is None:
+            spans = _find_spans(text, routed)
+            if not _timed_out(spans):
+                detection_cache.set(key, spans)
+        return list(spans)
+
+    @staticmethod
+    def _prefilter(text: str) -> List[Tuple[str, object]]:
+        """Route text through the prefilters, recording what was skipped"""
+        routed, skipped = _route(text)
+        with _prefilter_stats_lock:
+            prefilter_stats["messages_scanned"] += 1
+            if not routed:
+                prefilter_stats["messages_skipped"] += 1
+            for data_type in skipped:
+                prefilter_stats[f"{data_type}_skipped"] += 1
+        return routed
+
+    @stage("detection_scan")
+    def scan_many(self, texts: Sequence[str]) -> List[List[SensitiveSpan]]:
+        """
+        Scan many texts, returning their spans in input order.
+        Prefiltering and cache lookups happen here; the distinct uncached
+        texts are scanned in the process pool when there are at least
+        PARALLEL_DETECTION_THRESHOLD of them, and serially otherwise.
+        """
+        results: List[Tuple[SensitiveSpan, ...]] = [()] * len(texts)
+        # content key -> positions of every text with that content
+        pending: Dict[bytes, List[int]] = {}
+        for pos, text in enumerate(texts):
+            if not self._prefilter(text):
+                continue
+            key = content_key(text)
+            positions = pending.get(key)
+            if positions is not None:
+                positions.append(pos)
+                continue
+            spans = detection_cache.get(key)
+            if spans is None:
+                pending[key] = [pos]
+            else:
+                results[pos] = spans
+
+        if pending:
+            keys = list(pending)
+            contents = [texts[pending[key][0]] for key in keys]
+            for key, spans in zip(keys, self._scan_uncached(contents)):
+                if not _timed_out(spans):
+                    detection_cache.set(key, spans)
+                for pos in pending[key]:
+                    results[pos] = spans
+
+        return [list(spans) for spans in results]
+
+    def _scan_uncached(self, contents: List[str]) -> List[Tuple[SensitiveSpan, ...]]:
+        """Scan contents without touching the cache, in parallel when worthwhile"""
+        if DETECTION_WORKERS > 1 and len(contents) >= PARALLEL_DETECTION_THRESHOLD:
+            # Compact wire form: (index, content) out, (index, offsets) back
+            batch_size = min(MAX_DETECTION_BATCH, -(-len(contents) // (DETECTION_WORKERS * 4)))
+            batches = [
+                list(enumerate(contents[start:start + batch_size], start))
+                for start in range(0, len(contents), batch_size)
+            ]
+            try:
+                scanned = list(get_detection_pool().map(_scan_batch, batches))
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool
+                # next time and finish this request serially
+                _discard_detection_pool()
+            else:
+                results: List[Tuple[SensitiveSpan, ...]] = [()] * len(contents)
+                for batch in scanned:
+                    for idx, offsets in batch:
+                        text = contents[idx]
+                        results[idx] = tuple(
+                            SensitiveSpan(data_type, start, end, text[start:end])
+                            for data_type, start, end in offsets
+                        )
+                return results
+
+        return [_find_spans(text, _route(text)[0]) for text in contents]
+
+    @staticmethod
+    def get_cache_stats() -> Dict[str, int]:
+        """Hit/miss counters and size of the shared detection cache"""
+        return detection_cache.stats()
+
+    @staticmethod
+    def get_prefilter_stats() -> Dict[str, int]:
+        """
+        Prefilter counters: messages scanned, messages skipped by every
+        detector, and per-type "<type>_skipped" counts
+        """
+        with _prefilter_stats_lock:
+            return dict(prefilter_stats)
+
     def detect_sensitive_data(self, text: str) -> Dict[str, List[str]]:
         """Detect sensitive data in text"""
         findings = {}
-        
-        # Check each pattern
-        for data_type, pattern in self.patterns.items():
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            matches = list(matches)
-            if matches:
-                findings[data_type] = [m.group() for m in matches]
-        
+        for span in self.scan(text):
+            if span.type != SCAN_TIMEOUT:
+                findings.setdefault(span.type, []).append(span.value)
         return findings
 
+    def build_report(self, messages: Iterable[Message]) -> "SecurityReport":
+        """Walk the messages once and collect everything the security endpoints need"""
+        return self.update_report(SecurityReport(self), messages)
+
+    @stage("security_report")
+    def update_report(self, report: "SecurityReport", messages: Iterable[Message]) -> "SecurityReport":
+        """Append messages to a report; only the new messages are scanned"""
+        messages = list(messages)
+        scanned = iter(self.scan_many([msg.content for msg in messages if msg.message_type == "text"]))
+        for msg in messages:
+            report.add(msg, next(scanned) if msg.message_type == "text" else ())
+        return report
+
     def analyze_security(self, messages: List[Message]) -> Dict:
         """Analyze messages for security concerns"""
-        findings = []
-        sensitive_data_count = 0
-        risk_levels = {"high": 0, "medium": 0, "low": 0}
-        
-        for idx, msg in enumerate(messages):
-            if msg.message_type != "text":
-                continue
-                
-            # Detect sensitive data
-            sensitive_data = self.detect_sensitive_data(msg.content)
-            
-            if sensitive_data:
-                sensitive_data_count += sum(len(items) for items in sensitive_data.values())
-                
-                # Assess risk level
-                risk_level = self._assess_risk_level(sensitive_data)
-                risk_levels[risk_level] += 1
-                
-                # Create finding with the new format
-                finding = {
-                    "type": "sensitive_data_exposure",
-                    "risk_level": risk_level,
-                    "message": msg.dict(),
-                    "description": f"Found sensitive data: {', '.join(sensitive_data.keys())}",
-                    "message_index": idx,
-                    "sender": msg.sender,
-                    "timestamp": msg.timestamp.isoformat() if hasattr(msg.timestamp, 'isoformat') else str(msg.timestamp)
-                }
-                findings.append(finding)
-        
-        # Calculate security score
-        total_messages = len([msg for msg in messages if msg.message_type == "text"])
-        if total_messages == 0:
-            security_score = 100
-        else:
-            # Score based on sensitive data ratio and risk levels
-            sensitive_ratio = sensitive_data_count / total_messages
-            risk_score = (risk_levels["high"] * 3 + risk_levels["medium"] * 2 + risk_levels["low"]) / total_messages
-            security_score = max(0, min(100, 100 - (sensitive_ratio * 50 + risk_score * 50)))
-        
-        return {
-            "security_score": round(security_score, 2),
-            "total_findings": len(findings),
-            "findings": findings,
-            "risk_levels": risk_levels,
-            "recommendations": self._generate_recommendations(findings)
-        }
+        return self.build_report(messages).to_analysis()
 
     def _assess_risk_level(self, sensitive_data: Dict[str, List[str]]) -> str:
         """Assess risk level based on sensitive data types"""
@@ -100,15 +375,16 @@ class SensitiveDataDetector:
             return "medium"
         return "low"
 
-    def _generate_recommendations(self, findings: List[Dict]) -> List[Dict]:
+    def _generate_recommendations(self, findings: List[Dict], sensitive_types: Optional[set] = None) -> List[Dict]:
         """Generate security recommendations based on findings"""
         recommendations = []
         
         # Check for sensitive data types
-        sensitive_types = set()
-        for finding in findings:
-            if finding["type"] == "sensitive_data_exposure":
-                sensitive_types.update(finding["message"].get("sensitive_data", {}).keys())
+        if sensitive_types is None:
+            sensitive_types = set()
+            for finding in findings:
+                if finding["type"] == "sensitive_data_exposure":
+                    sensitive_types.update(finding["message"].get("sensitive_data", {}).keys())
         
         # Generate recommendations based on sensitive data types
         if "credit_card" in sensitive_types:
@@ -149,14 +425,208 @@ class SensitiveDataDetector:
         
         return recommendations
 
+    @staticmethod
+    def merge_spans(spans: Iterable[SensitiveSpan]) -> List[Tuple[int, int, str]]:
+        """
+        Merge overlapping spans into disjoint (start, end, type) ranges in
+        text order, keeping the highest-priority type for each merged range
+        """
+        merged: List[Tuple[int, int, str]] = []
+        for span in sorted(spans, key=lambda span: (span.start, -span.end)):
+            if span.type == SCAN_TIMEOUT:
+                continue
+            if merged and span.start < merged[-1][1]:
+                start, end, data_type = merged[-1]
+                if REDACTION_PRIORITY[span.type] < REDACTION_PRIORITY[data_type]:
+                    data_type = span.type
+                merged[-1] = (start, max(end, span.end), data_type)
+            else:
+                merged.append((span.start, span.end, span.type))
+        return merged
+
+    def redact_spans(self, text: str, spans: Iterable[SensitiveSpan]) -> str:
+        """Rebuild text in one pass with every span replaced by its redaction tag"""
+        parts = []
+        position = 0
+        for start, end, data_type in self.merge_spans(spans):
+            parts.append(text[position:start])
+            parts.append(f"[REDACTED {data_type.upper()}]")
+            position = end
+        parts.append(text[position:])
+        return "".join(parts)
+
     def redact_sensitive_data(self, text: str) -> str:
         """Redact sensitive data from text"""
-        redacted = text
-        
-        # Detect and redact each type of sensitive data
-        sensitive_data = self.detect_sensitive_data(text)
-        for data_type, items in sensitive_data.items():
-            for item in items:
-                redacted = redacted.replace(item, f"[REDACTED {data_type.upper()}]")
-        
-        return redacted 
\ No newline at end of file
+        spans = self.scan(text)
+        if not spans:
+            return text
+        return self.redact_spans(text, spans)
+
+    def redact_messages(self, messages: Iterable[Message]) -> Iterator[Tuple[int, Message, str]]:
+        """
+        Lazily redact a whole chat.
+        Yields (index, message, redacted_content) for each text message that
+        contained sensitive data; nothing else is held in memory.
+        """
+        for idx, msg in enumerate(messages):
+            if msg.message_type != "text":
+                continue
+            spans = self.scan(msg.content)
+            if spans:
+                yield idx, msg, self.redact_spans(msg.content, spans)
+
+
+class SecurityReport:
+    """
+    Single-pass security analysis of a chat.
+    Risk levels, per-type counts, unique examples and the score are
+    accumulated as messages are added; findings, recommendations and
+    redactions are projected from the stored per-message spans on demand.
+    A report can be kept in security_states and extended as a chat grows.
+    """
+
+    def __init__(self, detector: SensitiveDataDetector):
+        self.detector = detector
+        self.state_id = uuid.uuid4().hex
+        # Serializes updates when a stored report is extended concurrently
+        self.lock = threading.Lock()
+        self.message_count = 0
+        self.text_message_count = 0
+        self.sensitive_data_count = 0
+        self.risk_levels = {"high": 0, "medium": 0, "low": 0}
+        # Occurrences per data type, in first-seen order
+        self.type_counts: Dict[str, int] = {}
+        # Unique values per data type, in first-seen order
+        self._examples: Dict[str, Dict[str, None]] = {}
+        # (message index, message, spans, risk level) for each message with sensitive data
+        self.entries: List[Tuple[int, Message, Tuple[SensitiveSpan, ...], str]] = []
+        # (message index, message) for each message whose scan hit the time budget
+        self.timed_out: List[Tuple[int, Message]] = []
+        # How many entries and timeouts new_findings() has already returned
+        self._reported_entries = 0
+        self._reported_timeouts = 0
+        self._entity_index: Optional[EntityIndex] = None
+
+    def add(self, msg: Message, spans: Iterable[SensitiveSpan]) -> None:
+        """Add the next message of the chat with its detected spans"""
+        idx = self.message_count
+        self.message_count += 1
+        if msg.message_type != "text":
+            return
+        self.text_message_count += 1
+
+        spans = tuple(spans)
+        if spans and spans[-1].type == SCAN_TIMEOUT:
+            self.timed_out.append((idx, msg))
+            spans = spans[:-1]
+        if not spans:
+            return
+
+        self.sensitive_data_count += len(spans)
+        for span in spans:
+            self.type_counts[span.type] = self.type_counts.get(span.type, 0) + 1
+            self._examples.setdefault(span.type, {})[span.value] = None
+
+        risk_level = self.detector._assess_risk_level({span.type for span in spans})
+        self.risk_levels[risk_level] += 1
+        self.entries.append((idx, msg, spans, risk_level))
+
+    @property
+    def entity_index(self) -> EntityIndex:
+        """Normalized entity index, built on first use and kept up to date with new entries"""
+        if self._entity_index is None:
+            self._entity_index = EntityIndex()
+        return self._entity_index.update(self.entries)
+
+    @property
+    def examples(self) -> Dict[str, List[str]]:
+        """Unique detected values per data type"""
+        return {data_type: list(values) for data_type, values in self._examples.items()}
+
+    @property
+    def security_score(self) -> float:
+        if self.text_message_count == 0:
+            return 100
+        # Score based on sensitive data ratio and risk levels
+        sensitive_ratio = self.sensitive_data_count / self.text_message_count
+        risk_score = (
+            self.risk_levels["high"] * 3 + self.risk_levels["medium"] * 2 + self.risk_levels["low"]
+        ) / self.text_message_count
+        return max(0, min(100, 100 - (sensitive_ratio * 50 + risk_score * 50)))
+
+    @staticmethod
+    def _finding(idx: int, msg: Message, finding_type: str, risk_level: str, description: str) -> Dict:
+        return {
+            "type": finding_type,
+            "risk_level": risk_level,
+            "message": msg.dict(),
+            "description": description,
+            "message_index": idx,
+            "sender": msg.sender,
+            "timestamp": msg.timestamp.isoformat() if hasattr(msg.timestamp, 'isoformat') else str(msg.timestamp)
+        }
+
+    @property
+    def total_findings(self) -> int:
+        return len(self.entries) + len(self.timed_out)
+
+    @property
+    def findings(self) -> List[Dict]:
+        return self._findings(self.entries, self.timed_out)
+
+    def new_findings(self) -> List[Dict]:
+        """Findings added since the previous call, in message order"""
+        findings = self._findings(self.entries[self._reported_entries:], self.timed_out[self._reported_timeouts:])
+        self._reported_entries = len(self.entries)
+        self._reported_timeouts = len(self.timed_out)
+        return findings
+
+    def _findings(
+        self,
+        entries: List[Tuple[int, Message, Tuple[SensitiveSpan, ...], str]],
+        timed_out: List[Tuple[int, Message]]
+    ) -> List[Dict]:
+        findings = [
+            self._finding(
+                idx, msg, "sensitive_data_exposure", risk_level,
+                f"Found sensitive data: {', '.join(dict.fromkeys(span.type for span in spans))}"
+            )
+            for idx, msg, spans, risk_level in entries
+        ]
+        if timed_out:
+            # Unscanned text may hold anything, but these findings are not
+            # counted in risk_levels or the score
+            findings.extend(
+                self._finding(
+                    idx, msg, SCAN_TIMEOUT, "medium",
+                    "Sensitive data scan timed out; the message was only partially checked"
+                )
+                for idx, msg in timed_out
+            )
+            findings.sort(key=lambda finding: finding["message_index"])
+        return findings
+
+    def recommendations(self) -> List[Dict]:
+        # Only the detected types and whether anything was found at all
+        # matter, so the findings themselves are not materialized
+        return self.detector._generate_recommendations(self.entries or self.timed_out, set(self.type_counts))
+
+    def redacted(self) -> Iterator[Tuple[int, Message, str]]:
+        """Yield (index, message, redacted content) for every message with sensitive data"""
+        for idx, msg, spans, _ in self.entries:
+            yield idx, msg, self.detector.redact_spans(msg.content, spans)
+
+    def to_analysis(self) -> Dict:
+        """The analyze_security result"""
+        findings = self.findings
+        return {
+            "security_score": round(self.security_score, 2),
+            "total_findings": len(findings),
+            "findings": findings,
+            "risk_levels": dict(self.risk_levels),
+            "recommendations": self.recommendations()
+        }
+
+
+# The detector shared by the routes and background jobs
+detector = SensitiveDataDetector()
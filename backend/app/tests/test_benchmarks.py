@@ -0,0 +1,31 @@
+from benchmarks.run import check_results
+from benchmarks.synthetic_chat import generate_chat
+from app.core.whatsapp_parser import WhatsAppParser
+
+
+def test_synthetic_chat_is_seeded_and_parses():
+    chat = generate_chat(500, seed=7, multiline_ratio=0.2, hindi_ratio=0.3)
+    assert chat == generate_chat(500, seed=7, multiline_ratio=0.2, hindi_ratio=0.3)
+    assert chat != generate_chat(500, seed=8, multiline_ratio=0.2, hindi_ratio=0.3)
+
+    # Continuation lines of multi-line messages
+    assert chat.count("\n") + 1 > 500
+
+    parser = WhatsAppParser()
+    messages = parser.parse_chat(chat)
+    assert len(messages) == 500
+    assert parser.get_statistics()["total_messages"] == 500
+    assert any(msg.language == "hi_en" for msg in messages)
+    assert any(msg.message_type != "text" for msg in messages)
+
+
+def test_check_results_flags_budget_and_baseline_regressions():
+    def run(seconds):
+        return {"results": {"parse": {"1000": {"median_seconds": seconds, "us_per_message": seconds * 1000}}}}
+
+    thresholds = {"regression_tolerance": 0.25, "noise_floor_seconds": 0.005, "max_us_per_message": {"parse": 100}}
+    assert check_results(run(0.05), thresholds, baseline=run(0.045)) == []
+    assert len(check_results(run(0.05), thresholds, baseline=run(0.03))) == 1
+    assert len(check_results(run(0.2), thresholds)) == 1
+    # Below the noise floor only the absolute budget applies
+    assert check_results(run(0.004), thresholds, baseline=run(0.001)) == []
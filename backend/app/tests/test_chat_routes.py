@@ -0,0 +1,42 @@
+import orjson
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import app.api.routes.chat as chat
+from app.services.chat_sessions import get_session
+
+CHAT_TEXT = """[10/09/2023, 1:04:31 PM] Meet Bhanushali: 6 for?
+[10/09/2023, 1:05:02 PM] Dhruv: 7 works
+[10/09/2023, 2:12:54 PM] Dhruv: Hello
+[10/09/2023, 2:13:10 PM] Meet Bhanushali: see you there"""
+
+
+def make_client() -> TestClient:
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/api/chat")
+    return TestClient(app)
+
+
+def test_process_streams_ndjson_when_accepted(monkeypatch):
+    monkeypatch.setattr(chat, "STREAM_CHUNK_MESSAGES", 3)
+    client = make_client()
+
+    response = client.post("/api/chat/process", json={"chat_text": CHAT_TEXT},
+                           headers={"accept": chat.NDJSON_MEDIA_TYPE})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(chat.NDJSON_MEDIA_TYPE)
+    lines = [orjson.loads(line) for line in response.content.splitlines()]
+    assert [line["type"] for line in lines] == ["header", "messages", "messages", "summary"]
+    assert [len(line["messages"]) for line in lines[1:3]] == [3, 1]
+
+    summary = lines[-1]
+    assert summary["total_messages"] == 4
+    assert summary["statistics"]["participant_stats"]["Dhruv"]["message_count"] == 2
+    streamed = [msg["content"] for line in lines[1:3] for msg in line["messages"]]
+    assert streamed == [msg.content for msg in get_session(summary["chat_id"]).messages]
+
+    # Same chat as a plain JSON response, and without the messages
+    plain = client.post("/api/chat/process", json={"chat_text": CHAT_TEXT}).json()
+    assert plain["statistics"] == summary["statistics"]
+    response = client.post("/api/chat/process", json={"chat_text": CHAT_TEXT, "include_messages": False},
+                           headers={"accept": chat.NDJSON_MEDIA_TYPE})
+    assert [orjson.loads(line)["type"] for line in response.content.splitlines()] == ["header", "summary"]
@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+from app.api.dependencies import resolve_messages
+from app.api.models import AnalyzeSecurityRequest, EntityIndexRequest
+from app.core.cache import LRUCache
+from app.core.whatsapp_parser import Message
+from app.services.chat_sessions import ChatSession, create_session
+
+
+def make_messages(n: int) -> list:
+    return [
+        Message(timestamp=datetime(2023, 9, 10), sender="Dhruv", content=f"message {i}", message_type="text")
+        for i in range(n)
+    ]
+
+
+def test_chat_id_resolves_to_the_session_messages():
+    messages = make_messages(3)
+    session = create_session(messages)
+    assert asyncio.run(resolve_messages(AnalyzeSecurityRequest(chat_id=session.chat_id))) is messages
+    # The stateless form keeps working
+    assert len(asyncio.run(resolve_messages(AnalyzeSecurityRequest(messages=[m.dict() for m in messages])))) == 3
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(resolve_messages(AnalyzeSecurityRequest(chat_id="unknown")))
+    assert error.value.status_code == 410
+
+
+def test_requests_need_exactly_one_message_source():
+    with pytest.raises(ValidationError):
+        AnalyzeSecurityRequest()
+    with pytest.raises(ValidationError):
+        AnalyzeSecurityRequest(messages=[m.dict() for m in make_messages(1)], chat_id="abc")
+    # An explicitly empty list still names the source; the routes reject it
+    assert AnalyzeSecurityRequest(messages=[]).messages == []
+    assert EntityIndexRequest(state_id="abc").state_id == "abc"
+
+
+def test_sessions_are_evicted_by_byte_budget():
+    small, large = ChatSession(make_messages(10)), ChatSession(make_messages(1000))
+    store = LRUCache(maxsize=100, max_bytes=large.estimated_bytes, sizeof=lambda s: s.estimated_bytes)
+    store.set(small.chat_id, small)
+    store.set(large.chat_id, large)
+    assert small.chat_id not in store
+    assert large.chat_id in store
+
+
+def test_sessions_of_other_workers_load_from_the_shared_store(tmp_path, monkeypatch):
+    import app.services.chat_sessions as module
+    from app.core.shared_store import SharedStore
+
+    monkeypatch.setattr(module, "shared_store", SharedStore(str(tmp_path)))
+    messages = make_messages(5)
+    chat_id = module.create_session(messages).chat_id
+    # Another worker: the chat is only in the shared store
+    monkeypatch.setattr(module, "chat_sessions", LRUCache(maxsize=10))
+    session = asyncio.run(module.load_session(chat_id))
+    assert session.messages == messages and session.messages is not messages
+    assert module.chat_sessions.get(chat_id) is session
@@ -0,0 +1,32 @@
+import asyncio
+import contextvars
+import threading
+import pytest
+from app.core.executors import ExecutorSaturated, WorkloadExecutor
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def test_bounded_queue_rejects_and_propagates_context():
+    executor = WorkloadExecutor("test", workers=1, queue_size=1)
+    release = threading.Event()
+
+    async def scenario():
+        request_id.set("abc")
+        blocked = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(request_id.get))
+        await asyncio.sleep(0.05)
+        assert executor.stats()["running"] == 1
+        assert executor.stats()["queued"] == 1
+
+        with pytest.raises(ExecutorSaturated) as error:
+            await executor.run(request_id.get)
+        assert error.value.retry_after >= 1
+
+        release.set()
+        await blocked
+        return await queued
+
+    assert asyncio.run(scenario()) == "abc"
+    stats = executor.stats()
+    assert (stats["queued"], stats["running"], stats["completed"], stats["rejected"]) == (0, 0, 2, 1)
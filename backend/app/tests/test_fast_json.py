@@ -0,0 +1,86 @@
+import gzip
+from datetime import datetime
+import orjson
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from app.api.columnar import COLUMNAR_MEDIA_TYPE, from_columnar, to_columnar
+from app.api.fast_json import FastJSONRoute
+from app.api.models import MessagesRequest
+from app.core.metrics import LATENCY_BUCKETS_MS, LatencyHistogram, PayloadLatencyMiddleware, payload_latency
+from app.core.whatsapp_parser import Message
+
+
+def make_client() -> TestClient:
+    router = APIRouter(route_class=FastJSONRoute)
+
+    @router.post("/echo")
+    async def echo(request: MessagesRequest):
+        return [
+            {"timestamp": msg.timestamp.isoformat(), "sender": msg.sender, "url": msg.url}
+            for msg in request.messages
+        ]
+
+    app = FastAPI()
+    app.add_middleware(PayloadLatencyMiddleware)
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_orjson_decode_keeps_validation():
+    client = make_client()
+    body = {"messages": [
+        {"timestamp": "2023-09-10T14:30:00", "sender": "Dhruv", "content": "hi", "message_type": "text"},
+        {"timestamp": "2023-09-10T14:31:00", "sender": "Priya", "content": "x", "message_type": "link",
+         "url": "https://example.com"},
+    ]}
+    response = client.post("/echo", json=body)
+    assert response.status_code == 200
+    assert response.json() == [
+        {"timestamp": "2023-09-10T14:30:00", "sender": "Dhruv", "url": None},
+        {"timestamp": "2023-09-10T14:31:00", "sender": "Priya", "url": "https://example.com"},
+    ]
+
+    assert client.post("/echo", json={"messages": [{"sender": "Dhruv"}]}).status_code == 422
+    assert client.post("/echo", content=b"{not json").status_code == 422
+    counts = {labels: counts for labels, counts, _ in payload_latency.collect()}
+    assert counts[("/echo", "<10KB")][-1] >= 3
+
+
+def test_latency_histogram_buckets_by_payload_size():
+    histogram = LatencyHistogram(register=False)
+    histogram.observe_request("/api/chat/process", 500, 0.002)
+    histogram.observe_request("/api/chat/process", 5_000_000, 0.3)
+    with histogram.time("/api/chat/process", "<10MB"):
+        pass
+    counts = {labels: counts for labels, counts, _ in histogram.collect()}
+    assert counts[("/api/chat/process", "<10KB")][-1] == 1
+    large = dict(zip(list(LATENCY_BUCKETS_MS) + ["+Inf"], counts[("/api/chat/process", "<10MB")]))
+    assert large[250] == 1
+    assert large[1000] == 2
+    assert large["+Inf"] == 2
+
+
+def test_columnar_round_trip_and_compressed_body():
+    messages = [
+        Message(timestamp=datetime(2023, 9, 10, 14, 30), sender="Dhruv", content="hi", message_type="text"),
+        Message(timestamp=datetime(2023, 9, 10, 14, 31, 5, 250000), sender="Priya", content="x",
+                message_type="link", url="https://example.com"),
+        Message(timestamp=datetime(2023, 9, 10, 15, 0), sender="Dhruv", content="ok", message_type="text"),
+    ]
+    payload = to_columnar(messages)
+    assert payload["dictionaries"]["sender"] == ["Dhruv", "Priya"]
+    assert "duration" not in payload["columns"]
+    assert [Message(**item) for item in from_columnar(payload)] == messages
+
+    client = make_client()
+    body = gzip.compress(orjson.dumps({"messages": payload}))
+    response = client.post("/echo", content=body, headers={
+        "content-type": COLUMNAR_MEDIA_TYPE, "content-encoding": "gzip"
+    })
+    assert response.status_code == 200
+    assert [item["url"] for item in response.json()] == [None, "https://example.com", None]
+
+    del payload["columns"]["sender"]
+    response = client.post("/echo", content=orjson.dumps({"messages": payload}),
+                           headers={"content-type": COLUMNAR_MEDIA_TYPE})
+    assert response.status_code == 400
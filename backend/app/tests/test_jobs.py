@@ -0,0 +1,161 @@
+import asyncio
+from app.services.jobs import JobQueue
+
+
+async def wait_for(queue: JobQueue, job_id: str, statuses) -> dict:
+    for _ in range(500):
+        job = await queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job stuck in {job['status']}")
+
+
+def test_job_runs_with_progress_and_partial_results(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+
+    @queue.handler("count")
+    async def count(context, params, payload):
+        seen = []
+        for i, value in enumerate(payload.split(b",")):
+            seen.append(int(value))
+            await context.progress(100 * (i + 1) / 3, f"{i + 1} of 3", partial=seen)
+        return {"total": sum(seen)}
+
+    async def scenario():
+        await queue.start(workers=1)
+        try:
+            job = await queue.submit("count", {}, b"1,2,3")
+            assert job["status"] in ("queued", "running")
+            job = await wait_for(queue, job["job_id"], ("succeeded", "failed"))
+        finally:
+            await queue.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"total": 6}
+    assert job["partial_result"] == [1, 2, 3]
+    assert job["progress"] == 100
+    assert job["message"] == "3 of 3"
+
+
+def test_cancel_and_recover_jobs(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    queue = JobQueue(path)
+    started = []
+
+    @queue.handler("slow")
+    async def slow(context, params, payload):
+        started.append(context.job_id)
+        while True:
+            await context.progress(10)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        queued = await queue.submit("slow", {}, b"")
+        assert (await queue.cancel(queued["job_id"]))["status"] == "cancelled"
+
+        await queue.start(workers=1)
+        try:
+            running = await queue.submit("slow", {}, b"")
+            await wait_for(queue, running["job_id"], ("running",))
+            while not started:
+                await asyncio.sleep(0.01)
+            await queue.cancel(running["job_id"])
+            return await wait_for(queue, running["job_id"], ("cancelled",))
+        finally:
+            await queue.stop()
+
+    assert asyncio.run(scenario())["status"] == "cancelled"
+
+    # A job left running by a process that no longer exists is queued again
+    job = asyncio.run(queue.submit("slow", {}, b""))
+    queue._execute("UPDATE jobs SET status = 'running', worker_pid = ? WHERE id = ?", (2 ** 22 + 12345, job["job_id"]))
+    JobQueue(path).recover()
+    assert queue._get(job["job_id"])["status"] == "queued"
+
+    # Finished jobs past their retention are dropped
+    queue._execute("UPDATE jobs SET finished_at = 0 WHERE status = 'cancelled'")
+    JobQueue(path).recover()
+    assert queue._execute("SELECT status, COUNT(*) FROM jobs GROUP BY status") == [("queued", 1)]
+
+
+def test_job_endpoints_run_each_kind(tmp_path, monkeypatch):
+    import time
+    from contextlib import asynccontextmanager
+    from datetime import datetime, timedelta
+    from types import SimpleNamespace
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import app.api.routes.jobs as jobs
+    import app.services.search_service as search_service
+
+    async def generate(operation, prompt):
+        return SimpleNamespace(text=f"{operation} of {prompt.count('Dhruv:') + prompt.count('Part ')} lines")
+
+    monkeypatch.setattr(jobs.job_queue, "path", str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(jobs.job_queue, "_connection", None)
+    monkeypatch.setattr(jobs, "JOB_SUMMARY_CHUNK_MESSAGES", 4)
+    monkeypatch.setattr(search_service, "_generate", generate)
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+
+    def make_client(workers: int) -> TestClient:
+        @asynccontextmanager
+        async def lifespan(app):
+            await jobs.job_queue.start(workers)
+            yield
+            await jobs.job_queue.stop()
+
+        app = FastAPI(lifespan=lifespan)
+        app.include_router(jobs.router, prefix="/api/jobs")
+        return TestClient(app)
+
+    start = datetime(2023, 9, 10, 13, 0)
+    contents = ["call me on 555-123-4567", "mail a.b@example.com", "coffee at the cafe tomorrow",
+                "coffee tomorrow at the cafe", "see you at the cafe for coffee", "ok"]
+    body = {"messages": [
+        {"timestamp": (start + timedelta(minutes=i)).isoformat(), "sender": "Dhruv",
+         "content": content, "message_type": "text"}
+        for i, content in enumerate(contents)
+    ]}
+
+    # Without workers jobs stay queued until cancelled
+    with make_client(workers=0) as client:
+        response = client.post("/api/jobs", json={**body, "kind": "summary"})
+        assert response.status_code == 202 and response.json()["status"] == "queued"
+        job_id = response.json()["job_id"]
+        assert client.get(f"/api/jobs/{job_id}").json()["status"] == "queued"
+        assert client.delete(f"/api/jobs/{job_id}").json()["status"] == "cancelled"
+        assert client.get("/api/jobs/unknown").status_code == 404
+        assert client.delete("/api/jobs/unknown").status_code == 404
+        assert client.post("/api/jobs", json={**body, "kind": "unknown"}).status_code == 422
+        assert client.post("/api/jobs", json={"messages": [], "kind": "summary"}).status_code == 400
+
+    def run(client: TestClient, kind: str) -> dict:
+        job_id = client.post("/api/jobs", json={**body, "kind": kind}).json()["job_id"]
+        for _ in range(500):
+            job = client.get(f"/api/jobs/{job_id}").json()
+            if job["status"] not in ("queued", "running"):
+                return job
+            time.sleep(0.01)
+        raise AssertionError(f"{kind} job stuck in {job['status']}")
+
+    with make_client(workers=1) as client:
+        job = run(client, "security_insights")
+        assert job["status"] == "succeeded" and job["progress"] == 100
+        counts = job["partial_result"]["sensitive_data_counts"]
+        assert counts["phone"] == counts["email"] == 1
+        assert job["result"]["sensitiveData"]["email"]["examples"] == ["a.b@example.com"]
+
+        job = run(client, "summary")
+        assert job["status"] == "succeeded"
+        # Two parts of four and two messages, then the summary of both part summaries
+        assert job["result"]["part_summaries"] == ["summary of 4 lines", "summary of 2 lines"]
+        assert job["result"]["summary"] == "summary of 2 lines"
+        assert job["result"]["message_count"] == 6
+
+        job = run(client, "topic_clusters")
+        assert job["status"] == "succeeded"
+        assert job["result"] and len(job["partial_result"]) == len(job["result"])
+        assert all(topic["summary"].startswith("insights of") for topic in job["result"])
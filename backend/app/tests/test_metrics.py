@@ -0,0 +1,56 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from app.api.fast_json import FastJSONRoute
+from app.core.cache import LRUCache
+from app.core.metrics import Histogram, PayloadLatencyMiddleware, content_length, register_cache, render_metrics, stage
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_seconds", "Test histogram", ("stage",), buckets=(0.1, 1), register=False)
+    histogram.observe(0.05, "parse")
+    histogram.observe(0.5, "parse")
+    histogram.observe(5, "parse")
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP test_seconds Test histogram", "# TYPE test_seconds histogram"]
+    assert 'test_seconds_bucket{stage="parse",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="parse",le="1"} 2' in lines
+    assert 'test_seconds_bucket{stage="parse",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="parse"} 3' in lines
+    assert 'test_seconds_sum{stage="parse"} 5.55' in lines
+
+
+def test_metrics_cover_stages_requests_and_caches():
+    cache = LRUCache(maxsize=4)
+    register_cache("test_cache", cache)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+
+    router = APIRouter(route_class=FastJSONRoute)
+
+    @router.post("/items/{item_id}")
+    async def item(item_id: int):
+        with stage("test_stage"):
+            return {"item_id": item_id}
+
+    app = FastAPI()
+    app.add_middleware(PayloadLatencyMiddleware)
+    app.include_router(router)
+    client = TestClient(app)
+    assert client.post("/items/1").status_code == 200
+    assert client.post("/items/2").status_code == 200
+    assert client.post("/items/x").status_code == 422
+
+    text = render_metrics()
+    assert 'chatlore_requests_total{route="/items/{item_id}",method="POST",status="200"} 2' in text
+    assert 'chatlore_requests_total{route="/items/{item_id}",method="POST",status="422"} 1' in text
+    assert 'chatlore_stage_duration_seconds_count{stage="test_stage"} 2' in text
+    assert 'chatlore_cache_hits_total{cache="test_cache"} 1' in text
+    assert 'chatlore_cache_misses_total{cache="test_cache"} 1' in text
+
+
+def test_malformed_content_length_counts_as_empty():
+    assert content_length({"headers": [(b"content-length", b"123")]}) == 123
+    assert content_length({"headers": [(b"content-length", b"12, 12")]}) == 0
+    assert content_length({"headers": [(b"content-length", b"")]}) == 0
+    assert content_length({"headers": []}) == 0
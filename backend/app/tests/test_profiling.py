@@ -0,0 +1,60 @@
+import os
+import time
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from app.api.fast_json import FastJSONRoute
+from app.core.executors import offload
+from app.core.metrics import stage
+from app.core.profiling import RequestProfilingMiddleware, server_timing
+
+
+def busy(seconds: float) -> int:
+    with stage("busy"):
+        deadline = time.perf_counter() + seconds
+        total = 0
+        while time.perf_counter() < deadline:
+            total += 1
+        return total
+
+
+def make_client(tmp_path, enabled: bool) -> TestClient:
+    router = APIRouter(route_class=FastJSONRoute)
+
+    @router.post("/work/{name}")
+    async def work(name: str):
+        with stage("decode"):
+            pass
+        return {"loops": await offload("parsing", busy, 0.05)}
+
+    app = FastAPI()
+    app.add_middleware(RequestProfilingMiddleware, enabled=enabled, directory=str(tmp_path))
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_server_timing_sums_stages():
+    assert server_timing([("parse", 0.01), ("rank", 0.002), ("parse", 0.005)], 0.02) == \
+        "parse;dur=15.00, rank;dur=2.00, total;dur=20.00"
+
+
+def test_profile_written_only_when_enabled_and_requested(tmp_path):
+    client = make_client(tmp_path, enabled=True)
+    response = client.post("/work/a")
+    assert "busy;dur=" in response.headers["server-timing"]
+    assert "decode;dur=" in response.headers["server-timing"]
+    assert "x-profile-id" not in response.headers
+    assert os.listdir(tmp_path) == []
+
+    response = client.post("/work/a?profile=1", json={"x": 1})
+    profile_id = response.headers["x-profile-id"]
+    files = sorted(os.listdir(tmp_path))
+    assert len(files) == 2
+    assert files[0].endswith(f"_POST_work-name_lt10KB_{profile_id}.folded")
+    stacks = (tmp_path / files[0]).read_text()
+    # Samples from the executor thread reach into the offloaded function
+    assert "busy (tests/test_profiling.py" in stacks
+
+    disabled = make_client(tmp_path / "off", enabled=False)
+    response = disabled.post("/work/a", headers={"X-ChatLore-Profile": "1"})
+    assert "x-profile-id" not in response.headers
+    assert not (tmp_path / "off").exists()
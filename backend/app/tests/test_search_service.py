@@ -0,0 +1,138 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from app.core.whatsapp_parser import Message
+from app.services.search_service import InvalidCursorError, SearchService, decode_cursor, encode_cursor
+from app.services.ngram_index import TrigramIndex, substring_edit_distance
+
+CONTENTS = [
+    "Meeting tomorrow at the coffee shop",
+    "kal milte hain bhai",
+    "Check https://docs.example.com/roadmap before the meeting",
+    "‎image omitted",
+    "coffee meeting moved to friday",
+    "Restaurant booking confirmed",
+]
+
+
+def make_messages(contents):
+    start = datetime(2023, 9, 10, 13, 0, 0)
+    return [
+        Message(
+            timestamp=start + timedelta(minutes=i),
+            sender="Dhruv" if i % 2 else "Meet Bhanushali",
+            content=content,
+            message_type="image" if "omitted" in content else "text"
+        )
+        for i, content in enumerate(contents)
+    ]
+
+
+def make_service(contents=CONTENTS, build_tfidf=True):
+    service = SearchService()
+    asyncio.run(service.initialize(make_messages(contents), build_tfidf=build_tfidf))
+    return service
+
+
+def test_substring_edit_distance():
+    assert substring_edit_distance("resturant", "restaurant booking") == 1
+    assert substring_edit_distance("roadmap", "docs.example.com/roadmap") == 0
+
+
+def test_trigram_substring_search_verifies_candidates():
+    index = TrigramIndex(["abcdef", "defabc", "xyz"])
+    assert index.substring_search("bcd").tolist() == [0]
+    assert index.substring_search("ABC").tolist() == [0, 1]
+    assert index.substring_search("y").tolist() == [2]
+
+
+def test_substring_mode_matches_partial_urls():
+    service = make_service(build_tfidf=False)
+    results = asyncio.run(service.semantic_search("example.com/road", mode="substring"))
+    assert [r.message.content for r in results] == [CONTENTS[2]]
+
+
+def test_fuzzy_mode_tolerates_typos():
+    service = make_service(build_tfidf=False)
+    results = asyncio.run(service.semantic_search("resturant", min_similarity=0.8, mode="fuzzy"))
+    assert results[0].message.content == "Restaurant booking confirmed"
+    assert 0.8 <= results[0].similarity < 1
+
+
+def test_fuzzy_mode_ranks_exact_matches_first():
+    service = make_service(build_tfidf=False)
+    results = asyncio.run(service.semantic_search("milte hain", mode="fuzzy"))
+    assert results[0].message.content == "kal milte hain bhai"
+    assert results[0].similarity == 1
+
+
+def test_fuzzy_search_verifies_candidates_in_rounds(monkeypatch):
+    import app.services.ngram_index as module
+
+    monkeypatch.setattr(module, "MAX_FUZZY_CANDIDATES", 2)
+    index = TrigramIndex(["meeting tomorow", "meeting tommorow", "meeting tomorrowx", "a tomorrow", "xyz"])
+    # The exact matches fill the first round; a limit of 3 needs the second
+    rows, similarities, truncated = index.fuzzy_search("tomorrow", min_similarity=0.5, limit=3)
+    assert sorted(rows.tolist()) == [0, 1, 2, 3] and not truncated
+    rows, _, truncated = index.fuzzy_search("tomorrow", min_similarity=0.5, limit=2)
+    assert sorted(rows.tolist()) == [2, 3] and not truncated
+
+    rows, _, truncated = index.fuzzy_search("tomorrow", min_similarity=0.5)
+    assert sorted(rows.tolist()) == [2, 3] and truncated
+
+
+def test_pagination_serves_later_pages_from_cursor():
+    contents = [f"coffee break number {i}" for i in range(25)]
+    service = make_service(contents)
+    results, ranking, cursor = asyncio.run(service.search_page("coffee", min_similarity=0, page_size=10))
+    assert len(ranking) == 25
+    assert len(results) == 10
+
+    seen = [r.message.content for r in results]
+    first_cursor = cursor
+    while cursor:
+        results, _, cursor = asyncio.run(SearchService.next_page(cursor, page_size=10))
+        seen.extend(r.message.content for r in results)
+    assert sorted(seen) == sorted(contents)
+
+    ranking_id = decode_cursor(first_cursor)[0]
+    for offset in (-1, 26):
+        with pytest.raises(InvalidCursorError):
+            asyncio.run(SearchService.next_page(encode_cursor(ranking_id, offset)))
+
+
+def test_filters_are_applied_before_scoring_and_facets_returned():
+    service = make_service()
+    filters = {"senders": ["Meet Bhanushali"], "start_date": datetime(2023, 9, 10, 13, 3)}
+    results, ranking, _ = asyncio.run(service.search_page("meeting", min_similarity=0, filters=filters))
+    assert [r.message.content for r in results] == ["coffee meeting moved to friday"]
+    assert ranking.facets["senders"] == {"Meet Bhanushali": 1}
+    assert ranking.facets["months"] == {"2023-09": 1}
+
+
+def test_filters_apply_to_substring_mode():
+    service = make_service(build_tfidf=False)
+    results = asyncio.run(service.semantic_search(
+        "meeting", mode="substring",
+        filters={"senders": ["Meet Bhanushali"], "end_date": datetime(2023, 9, 10, 13, 2)}
+    ))
+    assert [r.message.content for r in results] == [CONTENTS[0], CONTENTS[2]]
+
+
+def test_similar_messages_use_minhash_index_once_per_chat():
+    forwarded = "Forwarded: free recharge offer, click the link and share with 10 groups"
+    contents = [forwarded, "lunch at 2?", forwarded.replace("10", "20"), "see you tomorrow", forwarded]
+    service = make_service(contents, build_tfidf=False)
+    results = asyncio.run(service.get_similar_messages(forwarded.replace("free", "fre"), min_similarity=0.5))
+    assert {r.message.content for r in results} == {forwarded, contents[2]}
+
+    again = make_service(contents, build_tfidf=False)
+    again._get_minhash_index()
+    assert again.minhash_index is service.minhash_index
+
+
+def test_duplicate_groups():
+    forwarded = "Forwarded: free recharge offer, click the link and share with 10 groups"
+    contents = ["ok", forwarded, "ok", "lunch at 2?", forwarded, forwarded + "!!"]
+    service = make_service(contents, build_tfidf=False)
+    assert service.get_duplicate_groups() == [[1, 4, 5]]
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from app.core.whatsapp_parser import Message
+from app.services.sensitive_data_detector import SensitiveDataDetector
+from app.services.security_trends import BaselineStore, SecurityRollup, compute_trends
+
+detector = SensitiveDataDetector()
+
+
+def make_chat(days: int, leaks_per_day) -> list:
+    """Ten messages a day; the first leaks_per_day(day) of them contain a phone number"""
+    start = datetime(2023, 1, 1)
+    messages = []
+    for day in range(days):
+        for i in range(10):
+            content = f"call 555-123-{day:02d}{i:02d}" if i < leaks_per_day(day) else "see you later"
+            messages.append(Message(
+                timestamp=start + timedelta(days=day, hours=i), sender="Dhruv",
+                content=content, message_type="text"
+            ))
+    return messages
+
+
+def test_rollup_counts_per_day_and_week():
+    messages = make_chat(14, lambda day: 1 if day < 7 else 3)
+    report = detector.build_report(messages)
+    rollup = SecurityRollup.from_report(report, messages)
+
+    assert len(rollup.days) == 14
+    assert rollup.messages.tolist() == [10] * 14
+    assert rollup.risks["high"].tolist() == [1] * 7 + [3] * 7
+    assert rollup.data_types["phone"].sum() == report.type_counts["phone"]
+    assert rollup.weekly().messages.sum() == 140
+
+
+def test_trends_follow_the_data_and_the_baseline(tmp_path):
+    messages = make_chat(28, lambda day: 1 if day < 21 else 3)
+    rollup = SecurityRollup.from_report(detector.build_report(messages), messages)
+    trends = {trend["type"]: trend for trend in compute_trends(rollup)}
+
+    # Findings tripled in the last week, so security went down by 200%
+    assert trends["Overall Security"]["direction"] == "decreasing"
+    assert trends["Overall Security"]["changePercentage"] == 200.0
+    assert trends["High Risk Issues"]["direction"] == "increasing"
+
+    store = BaselineStore(str(tmp_path / "baselines.db"))
+    earlier = make_chat(21, lambda day: 1)
+    store.save("chat", SecurityRollup.from_report(detector.build_report(earlier), earlier).snapshot())
+    baseline = store.latest("chat")
+    trends = {trend["type"]: trend for trend in compute_trends(rollup, baseline)}
+    assert trends["Since Baseline"]["direction"] == "increasing"
+    assert trends["Since Baseline"]["period"] == "since 2023-01-21"
+
+
+def test_rollups_are_reused_and_baselines_saved_once(tmp_path, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import app.api.routes.security as security
+    import app.services.security_trends as security_trends
+    from app.services.security_trends import analyze_chat
+
+    messages = make_chat(3, lambda day: 1)
+    report, rollup = analyze_chat(detector, messages)
+    assert analyze_chat(detector, list(messages)) == (report, rollup)
+    assert analyze_chat(detector, messages + make_chat(1, lambda day: 2))[0] is not report
+
+    store = BaselineStore(str(tmp_path / "baselines.db"))
+    monkeypatch.setattr(security_trends, "baseline_store", store)
+    app = FastAPI()
+    app.include_router(security.router)
+    client = TestClient(app)
+    body = {"messages": [msg.model_dump(mode="json") for msg in messages]}
+
+    def baselines() -> int:
+        return store._connect().execute("SELECT COUNT(*) FROM baselines").fetchone()[0]
+
+    trends = client.post("/security-insight-2", json=body).json()["trends"]
+    assert [trend["type"] for trend in trends] == ["Security Baseline"] and baselines() == 1
+    trends = client.post("/security-insight-2", json={**body, "compare_with_previous": True}).json()["trends"]
+    assert "Since Baseline" in [trend["type"] for trend in trends] and baselines() == 1
+    client.post("/security-insight-2", json=body)
+    assert baselines() == 1
+    client.post("/security-insight-2", json={**body, "save_baseline": True})
+    assert baselines() == 2
@@ -0,0 +1,227 @@
+from app.services.sensitive_data_detector import SensitiveDataDetector, SensitiveSpan
+
+detector = SensitiveDataDetector()
+
+TEXT = "Call me on 555-123-4567 or mail a.b@example.com, see https://example.com/x"
+
+
+def test_scan_returns_typed_spans_with_offsets():
+    spans = detector.scan(TEXT)
+    assert SensitiveSpan("phone", 11, 23, "555-123-4567") in spans
+    for span in spans:
+        assert TEXT[span.start:span.end] == span.value
+
+
+def test_detect_sensitive_data_groups_values_by_type():
+    assert detector.detect_sensitive_data(TEXT) == {
+        "email": ["a.b@example.com"],
+        "phone": ["555-123-4567"],
+        "url": ["https://example.com"],
+    }
+
+
+def test_overlapping_types_are_all_reported():
+    found = detector.detect_sensitive_data("flat 12 near Baker Street")
+    assert found["address"] == ["12 near Baker Street"]
+    assert found["location"] == ["near Baker Street"]
+
+
+def test_prefilter_skips_messages_that_cannot_match():
+    before = detector.get_prefilter_stats()
+    assert detector.scan("see you tomorrow then") == []
+    after = detector.get_prefilter_stats()
+    assert after["messages_skipped"] == before.get("messages_skipped", 0) + 1
+    assert after["address_skipped"] == before.get("address_skipped", 0) + 1
+
+
+def test_prefilter_still_routes_uppercase_urls():
+    assert detector.detect_sensitive_data("HTTPS://EXAMPLE.COM") == {"url": ["HTTPS://EXAMPLE.COM"]}
+
+
+def test_redaction_merges_overlapping_spans():
+    redacted = detector.redact_sensitive_data("flat 12 near Baker Street, call 555-123-4567")
+    assert redacted == "flat [REDACTED ADDRESS], call [REDACTED PHONE]"
+
+
+def test_redaction_does_not_rematch_replacement_tags():
+    redacted = detector.redact_sensitive_data("mail bob@example.com or bob@example.com")
+    assert redacted == "mail [REDACTED EMAIL] or [REDACTED EMAIL]"
+
+
+def test_redact_messages_yields_only_changed_text_messages():
+    from datetime import datetime
+    from app.core.whatsapp_parser import Message
+
+    messages = [
+        Message(timestamp=datetime(2023, 9, 10), sender="Dhruv", content=content, message_type=message_type)
+        for content, message_type in [
+            ("hello", "text"),
+            ("call 555-123-4567", "text"),
+            ("‎image omitted", "image"),
+        ]
+    ]
+    assert [(idx, redacted) for idx, _, redacted in detector.redact_messages(messages)] == [
+        (1, "call [REDACTED PHONE]")
+    ]
+
+
+def test_detection_cache_is_shared_between_detectors():
+    text = "cache check: reach me at carol@example.org"
+    detector.scan(text)
+    hits = detector.get_cache_stats()["hits"]
+    assert SensitiveDataDetector().detect_sensitive_data(text) == {
+        "email": ["carol@example.org"],
+        "location": ["at carol"],
+    }
+    assert detector.get_cache_stats()["hits"] == hits + 1
+
+
+def test_security_report_projects_every_view_from_one_pass():
+    from datetime import datetime
+    from app.core.whatsapp_parser import Message
+
+    messages = [
+        Message(timestamp=datetime(2023, 9, 10), sender=sender, content=content, message_type="text")
+        for sender, content in [
+            ("Dhruv", "call 555-123-4567"),
+            ("Asha", "see you soon"),
+            ("Asha", "again 555-123-4567 or mail a.b@example.com"),
+        ]
+    ]
+    report = detector.build_report(messages)
+    assert report.examples == {"phone": ["555-123-4567"], "email": ["a.b@example.com"]}
+    assert report.type_counts == {"phone": 2, "email": 1}
+    assert [idx for idx, _, _ in report.redacted()] == [0, 2]
+
+    analysis = report.to_analysis()
+    assert analysis == detector.analyze_security(messages)
+    assert [f["message_index"] for f in analysis["findings"]] == [0, 2]
+    assert analysis["findings"][1]["description"] == "Found sensitive data: email, phone"
+    assert analysis["risk_levels"] == {"high": 2, "medium": 0, "low": 0}
+    # Type-specific recommendations follow the detected types
+    titles = [rec["title"] for rec in analysis["recommendations"]]
+    assert any("phone" in title.lower() for title in titles)
+
+
+def test_parallel_scan_matches_serial_scan(monkeypatch):
+    import app.services.sensitive_data_detector as module
+
+    texts = [f"parallel {i}: call 555-123-{i:04d} or mail p{i}@example.com" for i in range(40)]
+    texts += ["nothing to see", texts[3]]
+    expected = [module._find_spans(text, module._route(text)[0]) for text in texts]
+
+    monkeypatch.setattr(module, "DETECTION_WORKERS", 2)
+    monkeypatch.setattr(module, "PARALLEL_DETECTION_THRESHOLD", 10)
+    assert [tuple(spans) for spans in detector.scan_many(texts)] == expected
+
+
+# Inputs that made the old address and email patterns backtrack
+# quadratically (~100s each at this size); linear patterns take well under
+# a second on any machine
+ADVERSARIAL_INPUTS = {
+    "address_whitespace": "1" + " " * 100_000 + "!",
+    "address_words": ("1 " + "ab " * 50) * 2_000,
+    "email_local_part": "a." * 50_000 + "@",
+    "email_domain": "a@" + "a." * 50_000,
+    "location_words": "in " + "Aa " * 50_000,
+}
+
+
+def test_adversarial_inputs_scan_in_linear_time():
+    import time
+    import app.services.sensitive_data_detector as module
+
+    for name, text in ADVERSARIAL_INPUTS.items():
+        started = time.perf_counter()
+        spans = module._find_spans(text, module._route(text)[0])
+        elapsed = time.perf_counter() - started
+        assert elapsed < 1.0, f"{name} took {elapsed:.2f}s"
+        assert all(span.type != module.SCAN_TIMEOUT for span in spans), name
+
+
+def test_chunked_scan_matches_whole_text_scan(monkeypatch):
+    import app.services.sensitive_data_detector as module
+
+    # Equivalence only; the budget is covered by its own test
+    monkeypatch.setattr(module, "SCAN_TIME_BUDGET_MS", 60_000)
+
+    text = "near 12 Main Street a.b@x.com 555-123-4567 http://x.io/ " * 3_000
+    routed = module._route(text)[0]
+    whole = tuple(
+        SensitiveSpan(data_type, match.start(), match.end(), match.group())
+        for data_type, finditer in routed
+        for match in finditer(text)
+    )
+    assert len(text) > module.SCAN_CHUNK_SIZE
+    assert module._find_spans(text, routed) == whole
+
+
+def test_scan_over_time_budget_is_reported(monkeypatch):
+    from datetime import datetime
+    from app.core.whatsapp_parser import Message
+    import app.services.sensitive_data_detector as module
+
+    monkeypatch.setattr(module, "SCAN_TIME_BUDGET_MS", 0)
+    # Cut-off scans must not be cached, or the timeout would outlive the budget
+    monkeypatch.setattr(module, "detection_cache", module.LRUCache(maxsize=16))
+    content = "timeout check 555-123-4567 " * 2_000
+    spans = detector.scan(content)
+    assert spans[-1].type == module.SCAN_TIMEOUT
+    assert detector.redact_sensitive_data(content) == content
+    assert detector.scan_many([content])[0][-1].type == module.SCAN_TIMEOUT
+    assert module.detection_cache.stats()["size"] == 0
+
+    # Texts up to SCAN_CHUNK_SIZE are scanned in one pass, without a deadline
+    assert [span.type for span in detector.scan("call 555-123-4567")] == ["phone"]
+
+    message = Message(timestamp=datetime(2023, 9, 10), sender="Dhruv", content=content, message_type="text")
+    analysis = detector.analyze_security([message])
+    assert [finding["type"] for finding in analysis["findings"]] == [module.SCAN_TIMEOUT]
+    assert analysis["security_score"] == 100
+
+
+def test_extended_report_matches_full_analysis_and_diffs_findings():
+    from datetime import datetime
+    from app.core.whatsapp_parser import Message
+
+    messages = [
+        Message(timestamp=datetime(2023, 9, 10, hour), sender="Dhruv", content=content, message_type="text")
+        for hour, content in enumerate([
+            "call 555-123-4567",
+            "see you soon",
+            "mail a.b@example.com",
+            "flat 12 near Baker Street",
+        ])
+    ]
+    report = detector.build_report(messages[:2])
+    assert [f["message_index"] for f in report.new_findings()] == [0]
+
+    detector.update_report(report, messages[2:])
+    assert [f["message_index"] for f in report.new_findings()] == [2, 3]
+    assert report.new_findings() == []
+
+    assert report.to_analysis() == detector.analyze_security(messages)
+
+
+def test_entity_index_groups_spellings_of_the_same_value():
+    from datetime import datetime
+    from app.core.whatsapp_parser import Message
+
+    messages = [
+        Message(timestamp=datetime(2023, 9, 10, hour), sender=sender, content=content, message_type="text")
+        for hour, (sender, content) in enumerate([
+            ("Dhruv", "call 555-123-4567"),
+            ("Asha", "or (555) 123-4567, mail Bob@Example.com"),
+            ("Asha", "bob@example.com again"),
+        ])
+    ]
+    report = detector.build_report(messages)
+    phone = report.entity_index.lookup("phone", "555.123.4567")
+    assert phone.value == "5551234567"
+    assert len(phone.variants) == 2
+    assert [idx for idx, _, _ in phone.occurrences] == [0, 1]
+    assert phone.summary()["senders"] == {"Dhruv": 1, "Asha": 1}
+
+    email = report.entity_index.lookup("email", "BOB@example.com")
+    assert email.count == 2
+    assert [entity.type for entity in report.entity_index.top(min_count=2)] == ["phone", "email"]
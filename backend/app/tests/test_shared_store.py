@@ -0,0 +1,46 @@
+import gc
+import os
+from datetime import datetime
+import numpy as np
+from app.core.shared_store import SharedStore
+from app.core.whatsapp_parser import Message
+from app.services.chat_sessions import messages_from_arrays, messages_to_arrays
+from app.services.minhash_index import MinHashIndex
+
+
+def test_entries_are_mapped_and_released(tmp_path):
+    store = SharedStore(str(tmp_path), max_bytes=10_000_000, ttl=60)
+    store.put("a", {"x": np.arange(10), "y": np.ones((2, 3), dtype=np.uint64)}, {"name": "a"})
+    arrays, meta = store.get("a")
+    assert meta == {"name": "a"}
+    assert arrays["x"].sum() == 45 and not arrays["x"].flags.writeable
+    assert store.stats()["holders"] == 1
+
+    # Replacing an entry keeps the old mapping readable until it is released
+    store.put("a", {"x": np.arange(3)})
+    assert store.get("a")[0]["x"].tolist() == [0, 1, 2]
+    assert arrays["x"].sum() == 45
+    del arrays
+    gc.collect()
+    store.evict()
+    assert store.stats() == {"entries": 1, "bytes": store.stats()["bytes"], "retired": 0, "holders": 0}
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".bin")]) == 1
+    assert store.get("missing") is None
+
+
+def test_chats_and_indexes_round_trip(tmp_path):
+    messages = [
+        Message(timestamp=datetime(2023, 9, 10, 14, 30), sender="Dhruv", content="Hello there, how are you?", message_type="text"),
+        Message(timestamp=datetime(2023, 9, 10, 14, 31), sender="Priya", content="नमस्ते", message_type="text", language="hi_en"),
+        Message(timestamp=datetime(2023, 9, 10, 14, 32), sender="Dhruv", content="", message_type="voice_call", duration="5 min"),
+        Message(timestamp=datetime(2023, 9, 10, 14, 33), sender="Priya", content="hello there, how are you?", message_type="text"),
+    ]
+    store = SharedStore(str(tmp_path))
+    store.put("chat", *messages_to_arrays(messages))
+    assert messages_from_arrays(*store.get("chat")) == messages
+
+    index = MinHashIndex([msg.content for msg in messages], range(len(messages)))
+    store.put("index", index.to_arrays())
+    shared = MinHashIndex.from_arrays(store.get("index")[0])
+    assert shared.duplicate_groups(min_length=5) == index.duplicate_groups(min_length=5) == [[0, 3]]
+    assert [rows.tolist() for rows in shared.query("Hello there")] == [rows.tolist() for rows in index.query("Hello there")]
@@ -0,0 +1,37 @@
+from app.core.text_analysis import analyze_text, tokenize, lemmatize, text_key, token_stream_cache
+
+
+def test_tokenize_keeps_alphanumeric_runs():
+    assert tokenize("Meet @ 10:30, ok?") == ["meet", "10", "30", "ok"]
+
+
+def test_tokenize_splits_on_punctuation_and_drops_single_characters():
+    # Pinned behaviour: unlike NLTK's word_tokenize there is no contraction
+    # handling, and like TfidfVectorizer's default one-character tokens are dropped
+    assert tokenize("I don't know, it's 5 pm") == ["don", "know", "it", "pm"]
+    assert analyze_text("I don't know, it's 5 pm") == ("know", "pm")
+
+
+def test_tokenize_keeps_devanagari_words_whole():
+    assert tokenize("कल मिलते हैं") == ["कल", "मिलते", "हैं"]
+
+
+def test_analyze_text_drops_stopwords():
+    tokens = analyze_text("We are meeting at the cafe")
+    assert "we" not in tokens
+    assert "the" not in tokens
+    assert "cafe" in tokens
+
+
+def test_analyze_text_is_cached():
+    text = "Cached token stream for the search index"
+    first = analyze_text(text)
+    assert analyze_text(text) is first
+    assert text_key(text) in token_stream_cache
+
+
+def test_lemmatize_is_memoized():
+    lemmatize("meetings")
+    hits = lemmatize.cache_info().hits
+    lemmatize("meetings")
+    assert lemmatize.cache_info().hits == hits + 1
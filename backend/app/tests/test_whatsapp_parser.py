@@ -1,5 +1,5 @@
 import pytest
-from app.core.whatsapp_parser import WhatsAppParser
+from app.core.whatsapp_parser import WhatsAppParser, ChatStatistics
 
 SAMPLE_CHAT = """[10/09/2023, 1:04:31 PM] Meet Bhanushali: ‎Messages and calls are end-to-end encrypted. No one outside of this chat, not even WhatsApp, can read or listen to them.
 [10/09/2023, 1:04:31 PM] Meet Bhanushali: 6 for?
@@ -27,4 +27,20 @@ def test_whatsapp_parser():
     stats = parser.get_statistics()
     assert stats["total_messages"] == 3
     assert "Meet Bhanushali" in stats["participants"]
-    assert "Dhruv" in stats["participants"] 
\ No newline at end of file
+    assert "Dhruv" in stats["participants"] 
+
+
+def test_iter_messages_matches_parse_chat():
+    parser = WhatsAppParser()
+    lazy = parser.iter_messages(SAMPLE_CHAT + "\n")
+    first = next(lazy)
+    assert first.sender == "Meet Bhanushali"
+    messages = [first, *lazy]
+    assert messages == WhatsAppParser().parse_chat(SAMPLE_CHAT)
+
+    stats = ChatStatistics()
+    for msg in messages:
+        stats.add(msg)
+    parser.parse_chat(SAMPLE_CHAT)
+    assert stats.to_dict() == parser.get_statistics()
+    assert stats.to_dict()["participant_stats"]["Meet Bhanushali"]["message_count"] == 1
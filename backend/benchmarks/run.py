@@ -0,0 +1,345 @@
+"""
+Benchmark suite over seeded synthetic chats.
+
+Times every pipeline stage (parse, statistics, detection, redaction, index
+builds, queries, clustering) and every non-LLM HTTP endpoint in-process,
+writes the results as JSON and checks them against thresholds.json and,
+optionally, a previous results file. Exits non-zero on a regression.
+
+    python -m benchmarks.run --sizes 1000 10000
+    python -m benchmarks.run --sizes 100000 --only parse detection --baseline benchmarks/results/main.json
+
+Result caches (detection, token streams, rankings, MinHash indexes,
+security states) are cleared before every timed run, so each number is a
+cold computation rather than a cache hit.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+# Must be set before the app modules read them
+os.environ.setdefault("SECURITY_BASELINE_DB", os.path.join(tempfile.mkdtemp(prefix="chatlore-bench-"), "baselines.db"))
+os.environ.setdefault("GEMINI_API_KEY", "")
+
+from benchmarks.synthetic_chat import ChatProfile, iter_chat_lines
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_THRESHOLDS = os.path.join(BENCHMARK_DIR, "thresholds.json")
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, "results", "latest.json")
+
+
+@dataclass
+class Benchmark:
+    name: str
+    # Called with the workload before each timed run; returns the timed callable
+    prepare: Callable[["Workload"], Callable[[], object]]
+    # Larger chats are skipped (quadratic or memory-bound stages)
+    max_messages: Optional[int] = None
+
+
+class Workload:
+    """A generated chat and the objects benchmarks share, built lazily"""
+
+    def __init__(self, profile: ChatProfile):
+        self.profile = profile
+        self.text = "\n".join(iter_chat_lines(profile))
+        self._messages = None
+        self._search = None
+        self._client = None
+        self._chat_id = None
+
+    @property
+    def messages(self):
+        if self._messages is None:
+            from app.core.whatsapp_parser import WhatsAppParser
+            self._messages = WhatsAppParser().parse_chat(self.text)
+        return self._messages
+
+    @property
+    def search(self):
+        """SearchService with every index built"""
+        if self._search is None:
+            from app.services.search_service import SearchService
+            service = SearchService()
+            service.messages = self.messages
+            service._fit_embeddings()
+            service._get_ngram_index()
+            service._get_facet_index()
+            service._get_minhash_index()
+            self._search = service
+        return self._search
+
+    @property
+    def client(self):
+        if self._client is None:
+            from fastapi.testclient import TestClient
+            from app.main import app
+            self._client = TestClient(app)
+        return self._client
+
+    @property
+    def chat_id(self) -> str:
+        """Session id of the chat, uploaded once through /api/chat/process"""
+        if self._chat_id is None:
+            response = self.client.post("/api/chat/process", json={"chat_text": self.text, "include_messages": False})
+            response.raise_for_status()
+            self._chat_id = response.json()["chat_id"]
+        return self._chat_id
+
+
+def clear_caches() -> None:
+    from app.core.text_analysis import lemmatize, token_stream_cache
+    from app.services.search_service import minhash_index_cache, ranking_cache
+    from app.services.sensitive_data_detector import detection_cache, security_states
+    for cache in (token_stream_cache, ranking_cache, minhash_index_cache, detection_cache, security_states):
+        cache.clear()
+    lemmatize.cache_clear()
+
+
+def _parse(workload: Workload):
+    from app.core.whatsapp_parser import WhatsAppParser
+    return lambda: list(WhatsAppParser().iter_messages(workload.text))
+
+
+def _statistics(workload: Workload):
+    from app.core.whatsapp_parser import ChatStatistics
+    messages = workload.messages
+
+    def run():
+        stats = ChatStatistics()
+        for msg in messages:
+            stats.add(msg)
+        return stats.to_dict()
+    return run
+
+
+def _detection(workload: Workload):
+    from app.services.sensitive_data_detector import SensitiveDataDetector
+    messages = workload.messages
+    return lambda: SensitiveDataDetector().build_report(messages)
+
+
+def _redaction(workload: Workload):
+    from app.services.sensitive_data_detector import SensitiveDataDetector
+    messages = workload.messages
+    return lambda: list(SensitiveDataDetector().redact_messages(messages))
+
+
+def _fresh_search(workload: Workload):
+    from app.services.search_service import SearchService
+    service = SearchService()
+    service.messages = workload.messages
+    return service
+
+
+def _index_tfidf(workload: Workload):
+    return _fresh_search(workload)._fit_embeddings
+
+
+def _index_trigram(workload: Workload):
+    return _fresh_search(workload)._get_ngram_index
+
+
+def _index_facets(workload: Workload):
+    return _fresh_search(workload)._get_facet_index
+
+
+def _index_minhash(workload: Workload):
+    return _fresh_search(workload)._get_minhash_index
+
+
+def _query(mode: str, query: str):
+    def prepare(workload: Workload):
+        service = workload.search
+        return lambda: service.rank(query, 0.3, mode)
+    return prepare
+
+
+def _query_similar(workload: Workload):
+    index = workload.search.minhash_index
+    return lambda: index.query("meeting tomorrow coffee project", 0.3)
+
+
+def _clustering(workload: Workload):
+    from sklearn.cluster import DBSCAN
+    matrix = workload.search.tfidf_matrix
+    return lambda: DBSCAN(eps=0.3, min_samples=2).fit(matrix)
+
+
+def _http(method: str, path: str, body: Optional[Dict] = None, with_chat: bool = True):
+    def prepare(workload: Workload):
+        client = workload.client
+        payload = dict(body or {})
+        if with_chat:
+            payload["chat_id"] = workload.chat_id
+
+        def run():
+            response = client.request(method, path, json=payload)
+            response.raise_for_status()
+            return response
+        return run
+    return prepare
+
+
+def _http_process(workload: Workload):
+    client = workload.client
+    payload = {"chat_text": workload.text}
+
+    def run():
+        response = client.post("/api/chat/process", json=payload)
+        response.raise_for_status()
+        return response
+    return run
+
+
+BENCHMARKS: List[Benchmark] = [
+    Benchmark("parse", _parse),
+    Benchmark("statistics", _statistics),
+    Benchmark("detection", _detection),
+    Benchmark("redaction", _redaction),
+    Benchmark("index_tfidf", _index_tfidf),
+    Benchmark("index_trigram", _index_trigram),
+    Benchmark("index_facets", _index_facets),
+    Benchmark("index_minhash", _index_minhash),
+    Benchmark("query_semantic", _query("semantic", "coffee meeting tomorrow")),
+    Benchmark("query_fuzzy", _query("fuzzy", "cofee meting")),
+    Benchmark("query_substring", _query("substring", "example.com")),
+    Benchmark("query_similar", _query_similar),
+    Benchmark("clustering", _clustering, max_messages=50_000),
+    Benchmark("http_chat_process", _http_process),
+    Benchmark("http_security_analyze", _http("POST", "/api/security/analyze")),
+    Benchmark("http_security_incremental", _http("POST", "/api/security/analyze/incremental")),
+    Benchmark("http_security_entities", _http("POST", "/api/security/entities")),
+    Benchmark("http_security_sensitive_data", _http("POST", "/api/security/sensitive-data")),
+    Benchmark("http_security_redacted", _http("POST", "/api/security/redacted")),
+    Benchmark("http_security_insights", _http("POST", "/api/security/insights")),
+    Benchmark("http_security_insight_2", _http("POST", "/api/security/security-insight-2")),
+    Benchmark("http_search_semantic", _http("POST", "/api/search/semantic", {"query": "coffee meeting tomorrow"})),
+    Benchmark("http_search_semantic_page", _http("POST", "/api/search/semantic/page", {"query": "coffee meeting"})),
+    Benchmark("http_search_similar", _http("POST", "/api/search/similar", {"message": "meeting tomorrow coffee"})),
+    Benchmark("http_search_duplicates", _http("POST", "/api/search/duplicates")),
+    Benchmark("http_search_topics", _http("POST", "/api/search/topics"), max_messages=50_000),
+]
+
+
+def run_benchmark(benchmark: Benchmark, workload: Workload, repeats: int) -> Dict:
+    timings = []
+    for _ in range(repeats):
+        clear_caches()
+        func = benchmark.prepare(workload)
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    median = statistics.median(timings)
+    return {
+        "repeats": repeats,
+        "min_seconds": round(min(timings), 6),
+        "median_seconds": round(median, 6),
+        "us_per_message": round(median / workload.profile.messages * 1e6, 3),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def check_results(results: Dict, thresholds: Dict, baseline: Optional[Dict] = None) -> List[str]:
+    """
+    Failures of results against the per-message budgets in thresholds and,
+    when given, against the median timings of a baseline run
+    """
+    failures = []
+    budgets = thresholds.get("max_us_per_message", {})
+    tolerance = thresholds.get("regression_tolerance", 0.25)
+    noise_floor = thresholds.get("noise_floor_seconds", 0.005)
+    for name, sizes in results["results"].items():
+        for size, result in sizes.items():
+            budget = budgets.get(name)
+            if budget is not None and result["us_per_message"] > budget:
+                failures.append(f"{name}@{size}: {result['us_per_message']}us/message exceeds the {budget}us budget")
+
+            previous = (baseline or {}).get("results", {}).get(name, {}).get(size)
+            if previous is None or result["median_seconds"] < noise_floor:
+                continue
+            limit = previous["median_seconds"] * (1 + tolerance)
+            if result["median_seconds"] > limit:
+                failures.append(
+                    f"{name}@{size}: {result['median_seconds']}s is more than {tolerance:.0%} slower "
+                    f"than the baseline {previous['median_seconds']}s"
+                )
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the ChatLore benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000],
+                        help="chat sizes in messages (1k to 10M)")
+    parser.add_argument("--only", nargs="+", help="benchmark names to run (default: all)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--participants", type=int, default=ChatProfile.participants)
+    parser.add_argument("--pii-density", type=float, default=ChatProfile.pii_density)
+    parser.add_argument("--hindi-ratio", type=float, default=ChatProfile.hindi_ratio)
+    parser.add_argument("--seed", type=int, default=ChatProfile.seed)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS)
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    args = parser.parse_args(argv)
+
+    selected = [b for b in BENCHMARKS if not args.only or b.name in args.only]
+    unknown = set(args.only or ()) - {b.name for b in BENCHMARKS}
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results: Dict = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "profile": {"participants": args.participants, "pii_density": args.pii_density,
+                    "hindi_ratio": args.hindi_ratio, "seed": args.seed},
+        "results": {},
+    }
+    for size in args.sizes:
+        workload = Workload(ChatProfile(messages=size, participants=args.participants, pii_density=args.pii_density,
+                                        hindi_ratio=args.hindi_ratio, seed=args.seed))
+        for benchmark in selected:
+            if benchmark.max_messages is not None and size > benchmark.max_messages:
+                continue
+            result = run_benchmark(benchmark, workload, args.repeats)
+            results["results"].setdefault(benchmark.name, {})[str(size)] = result
+            print(f"{benchmark.name:32} {size:>10}  {result['median_seconds']:>10.4f}s  "
+                  f"{result['us_per_message']:>10.2f}us/msg", flush=True)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    with open(args.thresholds) as f:
+        thresholds = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failures = check_results(results, thresholds, baseline)
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
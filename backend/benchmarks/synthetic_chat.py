@@ -0,0 +1,135 @@
+"""
+Seeded synthetic WhatsApp exports for the benchmark suite.
+
+The same arguments always produce the same chat, so timings from different
+runs (and machines) are measured on identical input.
+
+    python -m benchmarks.synthetic_chat 100000 --pii-density 0.1 > chat.txt
+"""
+import argparse
+import random
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterator, List
+
+FIRST_NAMES = ["Meet", "Dhruv", "Priya", "Aarav", "Ananya", "Rohan", "Isha", "Kabir", "Sara", "Alex", "Neha", "Vikram"]
+LAST_NAMES = ["Bhanushali", "Sharma", "Patel", "Iyer", "Khan", "Singh", "Mehta", "Rao", "Das", "Kapoor"]
+
+ENGLISH_WORDS = (
+    "meeting tomorrow coffee project deadline lunch call later code review party weekend travel train "
+    "flight hotel money pay rent movie dinner office report client launch release bug fix gym match "
+    "birthday gift plan ticket booking weather traffic exam notes slides budget invoice"
+).split()
+HINDI_WORDS = "कल मिलते हैं आज शाम खाना घर चलो ठीक है बहुत अच्छा धन्यवाद काम पैसे ट्रेन टिकट".split()
+HINGLISH_WORDS = "haan nahi kal aaj chalo theek hai yaar bhai accha kya scene".split()
+
+MEDIA_LINES = [
+    "‎image omitted",
+    "‎video omitted",
+    "‎sticker omitted",
+    "‎document omitted",
+    "‎GIF omitted",
+    "‎Voice call, ‎12 min",
+    "‎Video call, ‎3 min",
+]
+
+SYSTEM_LINE = "‎Messages and calls are end-to-end encrypted. No one outside of this chat, not even WhatsApp, can read or listen to them."
+
+
+@dataclass
+class ChatProfile:
+    """Shape of a generated chat; ratios are per-message probabilities"""
+    messages: int = 1000
+    participants: int = 4
+    multiline_ratio: float = 0.05
+    media_ratio: float = 0.08
+    hindi_ratio: float = 0.1
+    pii_density: float = 0.05
+    url_ratio: float = 0.03
+    seed: int = 0
+
+
+def _participants(rng: random.Random, count: int) -> List[str]:
+    names = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+    return rng.sample(names, min(count, len(names)))
+
+
+def _pii(rng: random.Random, sender: str) -> str:
+    kind = rng.randrange(6)
+    if kind == 0:
+        return f"mail me at {sender.split()[0].lower()}{rng.randrange(100)}@example.com"
+    if kind == 1:
+        return f"call me on +91 98{rng.randrange(10**8):08d}"
+    if kind == 2:
+        return f"my number is {rng.randrange(200, 999)}-{rng.randrange(200, 999)}-{rng.randrange(10**4):04d}"
+    if kind == 3:
+        return f"card 4111 1111 1111 {rng.randrange(10**4):04d} exp {rng.randrange(1, 13):02d}/29"
+    if kind == 4:
+        return f"I live at {rng.randrange(1, 999)} Main Street, Mumbai"
+    return f"passport {rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ')}{rng.randrange(10**7):07d}"
+
+
+def _text(rng: random.Random, profile: ChatProfile, sender: str) -> str:
+    roll = rng.random()
+    if roll < profile.pii_density:
+        return _pii(rng, sender)
+    roll -= profile.pii_density
+    if roll < profile.url_ratio:
+        return f"check this https://example.com/{rng.choice(ENGLISH_WORDS)}/{rng.randrange(10**6)}"
+    roll -= profile.url_ratio
+    if roll < profile.hindi_ratio:
+        words = HINDI_WORDS if rng.random() < 0.5 else HINDI_WORDS + ENGLISH_WORDS
+        return " ".join(rng.choice(words) for _ in range(rng.randint(2, 8)))
+    words = ENGLISH_WORDS if rng.random() < 0.8 else ENGLISH_WORDS + HINGLISH_WORDS
+    return " ".join(rng.choice(words) for _ in range(rng.randint(1, 14)))
+
+
+def _timestamp(moment: datetime) -> str:
+    hour = moment.hour % 12 or 12
+    return f"[{moment:%d/%m/%Y}, {hour}:{moment:%M:%S} {'AM' if moment.hour < 12 else 'PM'}]"
+
+
+def iter_chat_lines(profile: ChatProfile) -> Iterator[str]:
+    """Lines of the export, one message (possibly spanning several lines) at a time"""
+    rng = random.Random(profile.seed)
+    senders = _participants(rng, profile.participants)
+    moment = datetime(2023, 1, 1, 9, 0, 0)
+
+    yield f"{_timestamp(moment)} {senders[0]}: {SYSTEM_LINE}"
+    for _ in range(profile.messages - 1):
+        moment += timedelta(seconds=rng.randint(1, 900))
+        sender = rng.choice(senders)
+        if rng.random() < profile.media_ratio:
+            yield f"{_timestamp(moment)} {sender}: {rng.choice(MEDIA_LINES)}"
+            continue
+        yield f"{_timestamp(moment)} {sender}: {_text(rng, profile, sender)}"
+        if rng.random() < profile.multiline_ratio:
+            for _ in range(rng.randint(1, 4)):
+                yield _text(rng, profile, sender)
+
+
+def generate_chat(messages: int = 1000, **options) -> str:
+    """A synthetic export with the given number of messages (see ChatProfile for options)"""
+    return "\n".join(iter_chat_lines(ChatProfile(messages=messages, **options)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic WhatsApp export to stdout")
+    parser.add_argument("messages", type=int)
+    parser.add_argument("--participants", type=int, default=ChatProfile.participants)
+    parser.add_argument("--multiline-ratio", type=float, default=ChatProfile.multiline_ratio)
+    parser.add_argument("--media-ratio", type=float, default=ChatProfile.media_ratio)
+    parser.add_argument("--hindi-ratio", type=float, default=ChatProfile.hindi_ratio)
+    parser.add_argument("--pii-density", type=float, default=ChatProfile.pii_density)
+    parser.add_argument("--url-ratio", type=float, default=ChatProfile.url_ratio)
+    parser.add_argument("--seed", type=int, default=ChatProfile.seed)
+    args = parser.parse_args()
+
+    # Streamed, so 10M-message exports don't have to fit in memory twice
+    for line in iter_chat_lines(ChatProfile(**vars(args))):
+        sys.stdout.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,13 @@ import os
 load_dotenv()
 
 if __name__ == "__main__":
+    # Worker processes share parsed chats and indexes through app.core.shared_store
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=int(os.getenv("PORT", 8000)),
-        reload=True,
-        workers=1
-    ) 
\ No newline at end of file
+        # Reloading only supports a single worker
+        reload=workers == 1,
+        workers=workers
+    ) 